@@ -77,7 +77,9 @@ const healthLogSchema = new mongoose.Schema({
         type: String,
         default: ''
     },
+    // Legacy: new interactions live in HealthLogBucket (see services/healthLogStore.js)
     history: [interactionSchema],
+    interaction_count: { type: Number, default: 0 },
     summaries: [summarySchema],
     created_at: {
         type: Date,
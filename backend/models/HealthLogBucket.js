@@ -0,0 +1,22 @@
+const mongoose = require('mongoose');
+
+// ─── One document per user per day (or per HEALTHLOG_BUCKET_SIZE interactions) ─
+// Written by both the Python RAG API (python/health_buckets.py) and the voice
+// route, so interactions are stored loosely rather than with a strict schema.
+const healthLogBucketSchema = new mongoose.Schema({
+    // ObjectId for live buckets, "<user_key>|<day>|m<n>" string for migrated ones
+    _id: { type: mongoose.Schema.Types.Mixed },
+    user_key: { type: String, required: true },    // "phone:+91..." | "email:..."
+    day: { type: String, required: true },         // UTC "YYYY-MM-DD"
+    count: { type: Number, default: 0 },
+    first_ts: { type: Date },
+    last_ts: { type: Date },
+    interactions: { type: Array, default: [] },
+    migrated: { type: Boolean }                    // set by the migration; live writes skip these
+}, { collection: 'healthlogbuckets', strict: false, versionKey: false });
+
+healthLogBucketSchema.index({ user_key: 1, day: 1 });
+healthLogBucketSchema.index({ user_key: 1, last_ts: 1, first_ts: 1 });
+healthLogBucketSchema.index({ last_ts: 1 });
+
+module.exports = mongoose.model('HealthLogBucket', healthLogBucketSchema);
@@ -0,0 +1,203 @@
+"""Admission control and end-to-end deadlines for /ask and /ask/stream.
+
+At most ASK_MAX_CONCURRENCY requests run at once. Up to ASK_QUEUE_SIZE more
+wait for a slot, voice calls ahead of website traffic, for at most
+ASK_QUEUE_TIMEOUT. Past that a request is rejected with Overloaded, which
+the API turns into 503 + Retry-After (estimated from recent service times).
+Both limits are for the whole server; under serve.py each worker takes its
+SERVE_WORKER_SHARE of them.
+
+Every request also gets a deadline, measured from arrival: ASK_DEADLINE,
+or ASK_DEADLINE_VOICE for source == "voice_call", whose caller (Twilio via
+the Node voice route) gives up after ~15 s end to end. The deadline lives
+in a contextvar, so every stage can consult it without threading it
+through each signature:
+
+    remaining()              seconds left (None outside a request)
+    expired()
+    bounded(agen, stage)     stop a stream at the deadline (the answer is cut short)
+
+Stages past the deadline are skipped (translation passes the text through,
+LLM calls are not started) or cut short (generation), and DeadlineExceeded
+is raised where nothing useful can be returned. Background jobs (clinical
+extraction, saves) run outside the request context and have no deadline.
+"""
+import os
+import math
+import time
+import heapq
+import asyncio
+import itertools
+import contextvars
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Optional
+
+from observability import get_logger, ADMISSIONS, DEADLINES
+
+log = get_logger("admission")
+
+# ─── Configuration ───────────────────────────────────────────────────────────
+# Share of the server-wide limits this process takes; serve.py sets 1 / workers
+SERVE_WORKER_SHARE = float(os.getenv("SERVE_WORKER_SHARE", "1"))
+ASK_MAX_CONCURRENCY = max(1, int(int(os.getenv("ASK_MAX_CONCURRENCY", "32")) * SERVE_WORKER_SHARE))
+ASK_QUEUE_SIZE = int(int(os.getenv("ASK_QUEUE_SIZE", "64")) * SERVE_WORKER_SHARE)
+ASK_QUEUE_TIMEOUT = float(os.getenv("ASK_QUEUE_TIMEOUT", "5"))
+ASK_DEADLINE = float(os.getenv("ASK_DEADLINE", "25"))
+ASK_DEADLINE_VOICE = float(os.getenv("ASK_DEADLINE_VOICE", "8"))
+_EWMA_ALPHA = 0.2
+
+_deadline: contextvars.ContextVar = contextvars.ContextVar("request_deadline", default=None)
+
+
+class Overloaded(Exception):
+    def __init__(self, retry_after: int):
+        super().__init__(f"overloaded, retry after {retry_after}s")
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    """The request's deadline passed before `stage` could produce anything."""
+
+    def __init__(self, stage: str):
+        super().__init__(f"deadline exceeded at {stage}")
+        self.stage = stage
+
+
+# ─── Deadlines ───────────────────────────────────────────────────────────────
+def deadline_for(source: str) -> float:
+    """Absolute (monotonic) deadline for a request arriving now."""
+    return time.monotonic() + (ASK_DEADLINE_VOICE if source == "voice_call" else ASK_DEADLINE)
+
+
+@contextmanager
+def deadline_scope(deadline_at: float):
+    token = _deadline.set(deadline_at)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    at = _deadline.get()
+    return None if at is None else at - time.monotonic()
+
+
+def expired() -> bool:
+    left = remaining()
+    return left is not None and left <= 0
+
+
+def check(stage: str):
+    """Raise DeadlineExceeded if the deadline has passed before `stage`."""
+    if expired():
+        DEADLINES.inc(stage=stage)
+        raise DeadlineExceeded(stage)
+
+
+async def bounded(agen: AsyncIterator, stage: str) -> AsyncIterator:
+    """Yield from `agen` until the deadline, then close it and stop.
+    Raises DeadlineExceeded if nothing was yielded in time."""
+    yielded = False
+    try:
+        while True:
+            left = remaining()
+            try:
+                item = await (agen.__anext__() if left is None else asyncio.wait_for(agen.__anext__(), left))
+            except StopAsyncIteration:
+                return
+            yielded = True
+            yield item
+    except asyncio.TimeoutError:
+        DEADLINES.inc(stage=stage)
+        if not yielded:
+            raise DeadlineExceeded(stage)
+        log.info("deadline.cut_short", stage=stage)
+    finally:
+        await agen.aclose()
+
+
+# ─── Admission ───────────────────────────────────────────────────────────────
+class AdmissionController:
+    def __init__(self, limit: int = ASK_MAX_CONCURRENCY, queue_size: int = ASK_QUEUE_SIZE,
+                 queue_timeout: float = ASK_QUEUE_TIMEOUT):
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: list = []            # heap of (rank, seq, future); voice ranks first
+        self._seq = itertools.count()
+        self._service_time = 1.0            # EWMA of seconds a request holds its slot
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "timed_out": 0}
+
+    def retry_after(self) -> int:
+        """Seconds until the queue ahead of a new request would drain."""
+        return max(1, math.ceil(self._service_time * (len(self._waiters) + 1) / self.limit))
+
+    def _reject(self, outcome: str):
+        self.stats[outcome] += 1
+        ADMISSIONS.inc(outcome=outcome)
+        raise Overloaded(self.retry_after())
+
+    def check(self):
+        """Fail fast (Overloaded) if a request arriving now could not even queue."""
+        if self.in_flight >= self.limit and len(self._waiters) >= self.queue_size:
+            self._reject("rejected")
+
+    async def acquire(self, voice: bool = False):
+        if self.in_flight < self.limit and not self._waiters:
+            self.in_flight += 1
+            self.stats["admitted"] += 1
+            ADMISSIONS.inc(outcome="admitted")
+            return
+        self.check()
+
+        future = asyncio.get_running_loop().create_future()
+        entry = (0 if voice else 1, next(self._seq), future)
+        heapq.heappush(self._waiters, entry)
+        self.stats["queued"] += 1
+        ADMISSIONS.inc(outcome="queued")
+        timeout = self.queue_timeout
+        left = remaining()
+        if left is not None:
+            timeout = max(0.0, min(timeout, left))
+        try:
+            await asyncio.wait({future}, timeout=timeout)
+        finally:
+            if future.done() and not future.cancelled():
+                if asyncio.current_task().cancelling():
+                    self.release(0.0)          # handed a slot we can no longer use
+            else:
+                future.cancel()
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+        if future.cancelled():
+            self._reject("timed_out")
+
+    def release(self, service_time: float):
+        if service_time:
+            self._service_time += _EWMA_ALPHA * (service_time - self._service_time)
+        while self._waiters:
+            _, _, future = heapq.heappop(self._waiters)
+            if not future.done():
+                future.set_result(None)        # the slot passes straight to the waiter
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self, voice: bool = False):
+        await self.acquire(voice)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def snapshot(self) -> dict:
+        return {
+            **self.stats,
+            "in_flight": self.in_flight,
+            "waiting": len(self._waiters),
+            "limit": self.limit,
+            "retry_after_s": self.retry_after(),
+        }
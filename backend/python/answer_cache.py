@@ -0,0 +1,156 @@
+import os
+import re
+from collections import OrderedDict
+from typing import Optional
+
+import numpy as np
+
+# ─── Configuration ───────────────────────────────────────────────────────────
+ANSWER_CACHE_SIZE = int(os.getenv("ANSWER_CACHE_SIZE", "2000"))
+ANSWER_CACHE_THRESHOLD = float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.93"))
+
+# Conditions that change what a safe answer looks like. Two patients only share
+# cached answers when they agree on trimester and on every flag below.
+_CONDITION_TERMS = {
+    "allergy": ("allerg",),
+    "diabetes": ("diabet", "gdm", "sugar"),
+    "hypertension": ("hypertens", "blood pressure", "bp ", "preeclampsia", "pre-eclampsia"),
+    "anemia": ("anemi", "anaemi", "low hb", "low haemoglobin", "low hemoglobin"),
+    "thyroid": ("thyroid",),
+    "multiple": ("twin", "triplet"),
+    "bleeding": ("bleed", "spotting"),
+}
+# A query that opens with these or names one of the references below leans on
+# the conversation so far ("and what about at night?", "is that normal?")
+_FOLLOW_UP_OPENERS = {"and", "also", "so", "then", "but", "or"}
+_FOLLOW_UP_PAIRS = {("what", "about"), ("how", "about"), ("what", "else"), ("tell", "more"), ("more", "about")}
+_REFERENCES = {"that", "this", "those", "these", "they", "them", "their", "he", "she", "her", "him", "same",
+               "above", "again", "earlier", "previous", "instead", "else"}
+# "it" is a reference unless it introduces what follows ("is it safe to ...")
+_DUMMY_IT_TAIL = {"to", "if", "that", "when", "for"}
+_WORD = re.compile(r"[a-z']+")
+_WEEK = re.compile(r"(\d{1,2})\s*(?:st|nd|rd|th)?\s*week")
+_MONTH = re.compile(r"(\d)\s*(?:st|nd|rd|th)?\s*month")
+
+
+def patient_context_key(patient_data: str) -> str:
+    """Coarse, cacheable view of `patient_data`: trimester + condition flags.
+
+    Phone numbers, names and free text are deliberately dropped so that e.g.
+    every voice caller in the same situation maps to the same key.
+    """
+    text = (patient_data or "").lower()
+    trimester = "?"
+    week = _WEEK.search(text)
+    month = _MONTH.search(text)
+    if week:
+        w = int(week.group(1))
+        trimester = "1" if w <= 13 else "2" if w <= 27 else "3"
+    elif month:
+        m = int(month.group(1))
+        trimester = "1" if m <= 3 else "2" if m <= 6 else "3"
+    flags = sorted(name for name, terms in _CONDITION_TERMS.items() if any(t in text for t in terms))
+    return f"t{trimester}|{','.join(flags)}"
+
+
+def is_follow_up(query: str) -> bool:
+    """True if the English query only makes sense after the earlier turns.
+
+    The cache is keyed on the query alone, so such a query is answered
+    fresh; a standalone one ("is papaya safe in pregnancy?") can be served
+    from the cache even to a caller with session history.
+    """
+    words = _WORD.findall((query or "").lower())
+    if len(words) <= 2:
+        return True                       # "why?", "how much?"
+    if words[0] in _FOLLOW_UP_OPENERS or tuple(words[:2]) in _FOLLOW_UP_PAIRS:
+        return True
+    if any(w in _REFERENCES for w in words):
+        return True
+    return any(w == "it" and not _DUMMY_IT_TAIL.intersection(words[i + 1:]) for i, w in enumerate(words))
+
+
+class SemanticAnswerCache:
+    """Bounded LRU of (query embedding, patient context) → English answer.
+
+    Embeddings live in one preallocated float32 matrix so a lookup is a single
+    matrix-vector product over all slots; evicted slots are reused in place.
+    """
+
+    def __init__(self, dim: int, capacity: int = ANSWER_CACHE_SIZE, threshold: float = ANSWER_CACHE_THRESHOLD):
+        self.dim = dim
+        self.capacity = capacity
+        self.threshold = threshold
+        self.index_version = None
+        self._vectors = np.zeros((capacity, dim), dtype=np.float32)
+        self._contexts = [None] * capacity
+        self._answers = [None] * capacity
+        self._lru: "OrderedDict[int, None]" = OrderedDict()   # slot -> None, oldest first
+        self._free = list(range(capacity - 1, -1, -1))
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0}
+
+    @staticmethod
+    def _normalize(embedding) -> np.ndarray:
+        v = np.asarray(embedding, dtype=np.float32)
+        norm = np.linalg.norm(v)
+        return v / norm if norm else v
+
+    def sync_index_version(self, version):
+        """Drop everything if the vector index was rebuilt since we cached."""
+        if version != self.index_version:
+            if self.index_version is not None:
+                self.invalidate()
+            self.index_version = version
+
+    def invalidate(self):
+        self._vectors.fill(0)
+        self._contexts = [None] * self.capacity
+        self._answers = [None] * self.capacity
+        self._lru.clear()
+        self._free = list(range(self.capacity - 1, -1, -1))
+        self.stats["invalidations"] += 1
+
+    def lookup(self, embedding, context_key: str) -> Optional[str]:
+        if not self._lru:
+            self.stats["misses"] += 1
+            return None
+        q = self._normalize(embedding)
+        sims = self._vectors @ q
+        best_slot, best_sim = None, self.threshold
+        # Only the top handful can pass the threshold; check context on those.
+        for slot in np.argsort(-sims)[:8]:
+            slot = int(slot)
+            if sims[slot] < best_sim:
+                break
+            if self._answers[slot] is not None and self._contexts[slot] == context_key:
+                best_slot, best_sim = slot, float(sims[slot])
+                break
+        if best_slot is None:
+            self.stats["misses"] += 1
+            return None
+        self._lru.move_to_end(best_slot)
+        self.stats["hits"] += 1
+        return self._answers[best_slot]
+
+    def store(self, embedding, context_key: str, answer: str):
+        if not answer:
+            return
+        if self._free:
+            slot = self._free.pop()
+        else:
+            slot, _ = self._lru.popitem(last=False)
+            self.stats["evictions"] += 1
+        self._vectors[slot] = self._normalize(embedding)
+        self._contexts[slot] = context_key
+        self._answers[slot] = answer
+        self._lru[slot] = None
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._lru),
+            "capacity": self.capacity,
+            "threshold": self.threshold,
+            "hit_rate": round(self.stats["hits"] / lookups, 4) if lookups else 0.0,
+        }
@@ -1,5 +1,5 @@
 import sys, os
-# Force UTF-8 output on Windows to handle emoji/Indic characters in print()
+# Force UTF-8 output on Windows to handle Indic characters in log lines
 if sys.stdout.encoding and sys.stdout.encoding.lower() != 'utf-8':
     sys.stdout.reconfigure(encoding='utf-8', errors='replace')
 if sys.stderr.encoding and sys.stderr.encoding.lower() != 'utf-8':
@@ -7,16 +7,37 @@ if sys.stderr.encoding and sys.stderr.encoding.lower() != 'utf-8':
 
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, JSONResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import List, Optional
-from rag_service import PregnancyRAGService
-from langchain_core.messages import HumanMessage, AIMessage
+from rag_service import PregnancyRAGService, RAG_INDEX_BUNDLE
+from sarvam_client import SarvamClient
+from translation_cache import TranslationCache, normalize_text
+from hedging import Hedge, FALLBACK, BACKUP_WON
+from llm_scheduler import (scheduler as llm_scheduler, estimate_tokens, LLMRateLimited,
+                           VOICE, WEBSITE, TRANSLATION, CLINICAL, BATCH)
+from admission import (AdmissionController, Overloaded, DeadlineExceeded, deadline_for, deadline_scope, bounded,
+                       expired, remaining as deadline_remaining, check as check_deadline)
+from language_detect import route_query, LANG_DETECT
+from clinical_extractor import extract_clinical, CLINICAL_EXTRACTION, CLINICAL_LLM_MIN_CONFIDENCE
+from answer_cache import SemanticAnswerCache, patient_context_key, is_follow_up
+from background_jobs import JobQueue
+from mongo_batcher import HealthLogBatcher
+from health_buckets import ensure_indexes as ensure_bucket_indexes, user_key_for
+from sessions import (SessionStore, recent_turns, ensure_indexes as ensure_session_indexes, SESSIONS,
+                      SESSION_HISTORY_TOKENS, SESSION_SUMMARY_TOKENS)
+from observability import (get_logger, render_metrics, MetricsMiddleware, STAGE_SECONDS, CACHE_LOOKUPS,
+                           TRANSLATIONS, FALLBACKS, ERRORS, COMPONENT_STATE, LANGUAGE_ROUTES, DEADLINES)
+from langchain_core.messages import HumanMessage, AIMessage, SystemMessage
 from dotenv import load_dotenv
 from motor.motor_asyncio import AsyncIOMotorClient
 from datetime import datetime
 from langchain_groq import ChatGroq
-import httpx
+import asyncio
+import contextlib
 import json
+import re
+import time
 
 from pathlib import Path
 # Load .env from parent dir (backend/) or current dir
@@ -27,8 +48,17 @@ else:
     load_dotenv()  # fallback: current directory
 
 SARVAM_API_KEY = os.getenv("SARVAM_API_KEY")
+log = get_logger("api")
+
+# /ask/batch: generations + translations in flight across all batch requests
+# (interactive /ask traffic is not counted against this), queries embedded and
+# retrieved per chunk, and the largest accepted batch.
+ASK_BATCH_CONCURRENCY = int(os.getenv("ASK_BATCH_CONCURRENCY", "4"))
+ASK_BATCH_CHUNK = int(os.getenv("ASK_BATCH_CHUNK", "64"))
+ASK_BATCH_MAX_QUERIES = int(os.getenv("ASK_BATCH_MAX_QUERIES", "1000"))
 
 app = FastAPI(title="Janani Voice RAG API")
+app.add_middleware(MetricsMiddleware)
 
 # Enable CORS
 app.add_middleware(
@@ -47,11 +77,21 @@ MONGO_URI = os.getenv(
 mongo_client = AsyncIOMotorClient(MONGO_URI)
 db = mongo_client.get_default_database("test")
 health_logs_collection = db["healthlogs"]
+health_log_batcher = None
+session_store = None
 
 # ─── Deferred Initialization (set during startup) ───────────────────────────
 service = None
 translator_llm = None
 clinical_llm = None
+sarvam_client = None
+translation_cache = None
+translation_hedge = None
+answer_cache = None
+job_queue = None
+batch_slots = None
+admission = None
+_rag_init_task = None
 
 
 # ─── Pydantic Models ─────────────────────────────────────────────────────────
@@ -68,11 +108,25 @@ class QueryRequest(BaseModel):
     user_email: Optional[str] = None
     user_name:  Optional[str] = None
     source: str = "website"  # "website" | "voice_call"
+    session_id: Optional[str] = None  # defaults to "phone:<user_phone>" / "email:<user_email>"
+
+
+class BatchQuery(BaseModel):
+    id: Optional[str] = None
+    query: str
+    language_code: str = "hi-IN"
+    patient_data: str = "Mother is 2nd week of pregnancy, general wellness query."
+
+
+class BatchRequest(BaseModel):
+    queries: List[BatchQuery]
+    use_cache: bool = True   # False for regression runs that must hit the LLM
 
 
 # ─── Sarvam Translate (with Groq fallback) ───────────────────────────────────
 async def translate_text_indic(text: str, source_lang: str, target_lang: str) -> str:
-    """Translate via Sarvam AI first; fall back to Groq on failure."""
+    """Translate via Sarvam AI, hedged with Groq (see hedging.py): Groq starts
+    when Sarvam is slower than its recent p90, or at once if Sarvam fails."""
     if not text or not text.strip():
         return text
 
@@ -80,6 +134,9 @@ async def translate_text_indic(text: str, source_lang: str, target_lang: str) ->
     t = target_lang.lower().strip()
     if s == t or (s.startswith('en') and t.startswith('en')):
         return text   # nothing to do
+    if expired():
+        DEADLINES.inc(stage="translate")
+        return text   # no time left in the request: pass through
 
     LANG_MAP = {
         'hindi': 'hi-IN', 'punjabi': 'pa-IN', 'marathi': 'mr-IN', 'bengali': 'bn-IN',
@@ -93,40 +150,45 @@ async def translate_text_indic(text: str, source_lang: str, target_lang: str) ->
     if src_code.lower().startswith('en'): src_code = 'en-IN'
     if tgt_code.lower().startswith('en'): tgt_code = 'en-IN'
 
-    # 1️⃣  Try Sarvam Translate
-    try:
-        print(f"🌐 Sarvam Translate: {src_code} → {tgt_code}")
-        async with httpx.AsyncClient(timeout=15) as client:
-            r = await client.post(
-                "https://api.sarvam.ai/translate",
-                json={
-                    "input": text,
-                    "source_language_code": src_code,
-                    "target_language_code": tgt_code,
-                    "speaker_gender": "Female",
-                    "mode": "formal"
-                },
-                headers={"api-subscription-key": SARVAM_API_KEY, "Content-Type": "application/json"}
-            )
-            if r.status_code == 200:
-                print("✅ Sarvam Translate success")
-                return r.json().get("translated_text", text)
-            else:
-                print(f"⚠️ Sarvam Translate HTTP {r.status_code}: {r.text[:120]}")
-    except Exception as e:
-        print(f"⚠️ Sarvam Translate exception: {e}")
+    cached = await translation_cache.get(text, src_code, tgt_code)
+    CACHE_LOOKUPS.inc(cache="translation", result="hit" if cached is not None else "miss")
+    if cached is not None:
+        TRANSLATIONS.inc(provider="cache")
+        log.debug("translate.cache_hit", src=src_code, tgt=tgt_code)
+        return cached
 
-    # 2️⃣  Groq Fallback
-    try:
+    # 1️⃣  Sarvam Translate (pooled client; fails fast while the breaker is open)
+    async def via_sarvam():
+        return await sarvam_client.translate(text, src_code, tgt_code)
+
+    # 2️⃣  Groq, as the hedge or the fallback
+    async def via_groq():
         lang_label = target_lang if not tgt_code.startswith('en') else 'English'
-        print(f"🤖 Groq fallback translation → {lang_label}")
-        resp = translator_llm.invoke(
-            f"Translate the following to {lang_label} using native script only. "
-            f"Provide ONLY the translation, nothing else:\n\n{text}"
-        )
+        prompt = (f"Translate the following to {lang_label} using native script only. "
+                  f"Provide ONLY the translation, nothing else:\n\n{text}")
+        resp = await llm_scheduler.run(translator_llm.model_name, TRANSLATION, estimate_tokens(prompt),
+                                       lambda: translator_llm.ainvoke(prompt))
         return resp.content.strip()
+
+    try:
+        translated, outcome = await asyncio.wait_for(translation_hedge.run(via_sarvam, via_groq),
+                                                     deadline_remaining())
+        TRANSLATIONS.inc(provider="groq" if outcome in (FALLBACK, BACKUP_WON) else "sarvam")
+        if outcome == FALLBACK:
+            FALLBACKS.inc(kind="translate_sarvam_to_groq")
+            log.info("translate.groq_fallback", src=src_code, tgt=tgt_code, breaker=sarvam_client.breaker.state)
+        await translation_cache.set(text, src_code, tgt_code, translated)
+        return translated
+    except asyncio.TimeoutError:
+        DEADLINES.inc(stage="translate")
+        TRANSLATIONS.inc(provider="passthrough")
+        log.warning("translate.deadline", src=src_code, tgt=tgt_code)
+        return text
     except Exception as groq_err:
-        print(f"❌ Groq translation also failed: {groq_err}")
+        TRANSLATIONS.inc(provider="passthrough")
+        FALLBACKS.inc(kind="translate_passthrough")
+        ERRORS.inc(stage="translate")
+        log.error("translate.failed", src=src_code, tgt=tgt_code, error=repr(groq_err))
         return text   # last resort: return original
 
 async def translate_text(text: str, target_lang: str, source_lang: str = "en-IN") -> str:
@@ -134,9 +196,47 @@ async def translate_text(text: str, target_lang: str, source_lang: str = "en-IN"
     return await translate_text_indic(text, source_lang, target_lang)
 
 
+async def query_to_english(query: str, language_code: str) -> str:
+    """Inbound translation for a user query. Local detection (language_detect.py)
+    skips the round-trip for queries that are already English or romanized
+    Hindi the local gloss covers, and picks the source language from the
+    script when it contradicts `language_code`."""
+    source = language_code
+    if LANG_DETECT:
+        decision, script, value = route_query(query, language_code)
+        LANGUAGE_ROUTES.inc(script=script, decision=decision)
+        if decision != "translate":
+            log.debug("translate_in.skipped", decision=decision, declared=language_code)
+            return value
+        source = value
+    elif language_code.lower().startswith("en"):
+        return query
+    with STAGE_SECONDS.time(stage="translate_in"):
+        return await translate_text_indic(query, source, "en-IN")
+
+
 # ─── Clinical Data Extraction ────────────────────────────────────────────────
 async def extract_clinical_data(transcript: str, medical_context: str = "") -> dict:
-    """Extract structured clinical data using Groq."""
+    """Extract structured clinical data for the turn.
+
+    CLINICAL_EXTRACTION=local|hybrid uses the lexicon extractor in
+    clinical_extractor.py (no LLM call); hybrid sends turns it is unsure
+    about (confidence < CLINICAL_LLM_MIN_CONFIDENCE) to Groq, and llm always
+    uses Groq. Only `transcript` (the user's words) is scanned locally.
+    """
+    local = None
+    if CLINICAL_EXTRACTION != "llm":
+        with STAGE_SECONDS.time(stage="extract"):
+            local, confidence = extract_clinical(transcript)
+        if CLINICAL_EXTRACTION == "local" or confidence >= CLINICAL_LLM_MIN_CONFIDENCE:
+            return local
+        FALLBACKS.inc(kind="clinical_llm")
+        log.info("extract.llm_fallback", confidence=confidence)
+    return await extract_clinical_data_llm(transcript, medical_context, fallback=local)
+
+
+async def extract_clinical_data_llm(transcript: str, medical_context: str = "", fallback: dict = None) -> dict:
+    """Extract structured clinical data using Groq; `fallback` (or defaults) on failure."""
     try:
         prompt = f"""Extract clinical data from this maternal health conversation.
 
@@ -153,14 +253,20 @@ Return ONLY valid JSON (no markdown):
   "severity": 1-10,
   "summary": "one sentence clinical summary"
 }}"""
-        response = clinical_llm.invoke(prompt)
+        with STAGE_SECONDS.time(stage="extract_llm"):
+            response = await llm_scheduler.run(clinical_llm.model_name, CLINICAL, estimate_tokens(prompt),
+                                               lambda: clinical_llm.ainvoke(prompt))
         text = response.content.strip()
         # Strip markdown if present
         if "```" in text:
             text = text.split("```")[1].replace("json", "").strip()
         return json.loads(text)
     except Exception as e:
-        print(f"⚠️ Clinical extraction error: {e}")
+        ERRORS.inc(stage="extract")
+        log.warning("extract.failed", error=repr(e))
+        if fallback is not None:
+            return fallback
+        FALLBACKS.inc(kind="clinical_default")
         return {
             "symptoms": [], "medications": [],
             "relief_noted": False, "relief_details": "",
@@ -194,132 +300,680 @@ async def save_to_mongodb(request: QueryRequest, eng_query: str, eng_answer: str
         "_language": request.language_code
     }
 
-    update = {
-        "$push": {"history": interaction},
-        "$set": {"updated_at": datetime.utcnow()},
-        "$setOnInsert": {
-            "phone_number": request.user_phone or "",
-            "user_email": request.user_email or "",
-            "created_at": datetime.utcnow()
-        }
-    }
-    await health_logs_collection.update_one(filter_query, update, upsert=True)
-    print(f"💾 Saved for {user_identifier} | symptoms: {len(clinical.get('symptoms', []))}")
+    # Coalesced with other interactions into one bulk_write by the batcher
+    try:
+        with STAGE_SECONDS.time(stage="save"):
+            await health_log_batcher.add(filter_query, interaction, {
+                "phone_number": request.user_phone or "",
+                "user_email": request.user_email or "",
+            })
+    except Exception:
+        ERRORS.inc(stage="save")
+        raise
+    log.info("save.done", user=user_identifier, symptoms=len(clinical.get("symptoms", [])))
+
+
+# ─── Shared /ask helpers ─────────────────────────────────────────────────────
+DEFAULT_CLINICAL = {
+    "symptoms": [], "medications": [], "relief_noted": False,
+    "relief_details": "", "fetal_movement": "Unknown", "severity": 5, "summary": ""
+}
+
+def session_key(request: QueryRequest) -> Optional[str]:
+    if request.session_id:
+        return request.session_id
+    if request.user_phone:
+        return user_key_for({"phone_number": request.user_phone})
+    if request.user_email:
+        return user_key_for({"user_email": request.user_email})
+    return None
+
+
+async def load_session(request: QueryRequest):
+    """The caller's server-side session (sessions.py), or None for anonymous callers."""
+    key = session_key(request)
+    if session_store is None or key is None:
+        return None
+    session = await session_store.get(key)
+    CACHE_LOOKUPS.inc(cache="session", result="hit" if session.turns or session.summary else "miss")
+    return session
+
+
+def build_history_messages(request: QueryRequest, session=None) -> list:
+    """LangChain messages for the prompt: the session's rolling summary plus
+    its newest turns within SESSION_HISTORY_TOKENS. Clients that still send
+    `history` get that instead, under the same budget."""
+    if request.history:
+        turns, summary = [{"role": m.role, "content": m.content} for m in request.history], ""
+    elif session is not None:
+        turns, summary = session.turns, session.summary
+    else:
+        return []
+    history_msgs = [SystemMessage(content=f"Summary of the earlier conversation: {summary}")] if summary else []
+    for turn in recent_turns(turns, SESSION_HISTORY_TOKENS):
+        if turn["role"] == "user":
+            history_msgs.append(HumanMessage(content=turn["content"]))
+        else:
+            history_msgs.append(AIMessage(content=turn["content"]))
+    return history_msgs
+
+
+async def summarize_history(summary: str, turns: list) -> str:
+    """Fold `turns` into a session's rolling summary (Groq, background priority)."""
+    transcript = "\n".join(f"{t['role']}: {t['content']}" for t in turns)
+    prompt = f"""Update the running summary of a maternal health conversation.
+
+CURRENT SUMMARY: {summary or "None"}
+NEW TURNS:
+{transcript}
+
+Return ONLY the updated summary, under {SESSION_SUMMARY_TOKENS * 3 // 4} words. Keep the mother's
+pregnancy stage, symptoms, medications and the advice already given; drop pleasantries."""
+    resp = await llm_scheduler.run(clinical_llm.model_name, CLINICAL, estimate_tokens(prompt),
+                                   lambda: clinical_llm.ainvoke(prompt))
+    return resp.content
+
+
+async def record_turn(session, english_query: str, english_answer: str):
+    """Add the turn to the session now and write it through in the background."""
+    if session is None:
+        return
+    session_store.append(session, english_query, english_answer)
+    job_queue.submit("save_session", session_store.save, session, summarize_history)
+
+
+# Sentence ends at . ! ? or the Devanagari danda, followed by whitespace.
+# Decimal points ("2.5 mg") are not followed by whitespace, so they never split.
+_SENTENCE_END = re.compile(r'(?<=[.!?।])\s+')
+
+def pop_complete_sentences(buffer: str):
+    """Split off every finished sentence in `buffer`.
+
+    Returns (sentences, remainder) where `remainder` is the trailing text that
+    has not been terminated yet and must wait for more tokens.
+    """
+    parts = _SENTENCE_END.split(buffer)
+    if len(parts) == 1:
+        return [], buffer
+    sentences = [p.strip() for p in parts[:-1] if p.strip()]
+    return sentences, parts[-1]
+
+
+async def answer_chunks(request: QueryRequest, english_query: str, history_msgs: list, meta: dict):
+    """Yield the English answer, from the semantic answer cache when possible.
+
+    Sets meta["cache_hit"], meta["retrieval_timings"] (per-stage ms of the
+    hybrid retrieval) and meta["context_stats"] (prompt context size and
+    tokens saved by budgeting); both are empty on a cache hit. A turn with
+    history is only served from or stored in the cache when the query
+    stands on its own (see answer_cache.is_follow_up); a follow-up's answer
+    depends on that history. Generation stops at the request
+    deadline; meta["cut_short"] is then True and the partial answer is not
+    cached.
+    """
+    meta["cache_hit"] = False
+    meta["cut_short"] = False
+    meta["retrieval_timings"] = {}
+    meta["context_stats"] = {}
+    check_deadline("retrieve")
+    use_cache = answer_cache is not None and not (history_msgs and is_follow_up(english_query))
+    embedding = None
+    if use_cache:
+        answer_cache.sync_index_version(service.index_version)
+        context_key = patient_context_key(request.patient_data)
+        embedding = await service.aembed_query(english_query)
+        cached = answer_cache.lookup(embedding, context_key)
+        CACHE_LOOKUPS.inc(cache="answer", result="hit" if cached is not None else "miss")
+        if cached is not None:
+            log.debug("answer.cache_hit")
+            meta["cache_hit"] = True
+            yield cached
+            return
+
+    answer = ""
+    priority = VOICE if request.source == "voice_call" else WEBSITE
+    async for chunk in bounded(service.aask_stream(english_query, request.patient_data, history_msgs, embedding,
+                                                    meta["retrieval_timings"], meta["context_stats"], priority),
+                               "generate"):
+        answer += chunk
+        yield chunk
+    meta["cut_short"] = expired()
+    if use_cache and not meta["cut_short"]:
+        answer_cache.store(embedding, context_key, answer.strip())
+
+
+async def finalize_interaction(request: QueryRequest, english_query: str, english_answer: str, final_answer: str):
+    """Background job for steps 5 + 6 of /ask.
+
+    Clinical extraction is best-effort (falls back to DEFAULT_CLINICAL). The
+    MongoDB save runs here rather than as a queued job: a worker waiting on
+    the queue it drains can deadlock it. A failed save is queued on its own,
+    so only the write is retried.
+    """
+    clinical_data = dict(DEFAULT_CLINICAL)
+    try:
+        clinical_data = await extract_clinical_data(english_query, english_answer)
+    except Exception as e:
+        log.warning("extract.skipped", error=repr(e))
+
+    args = (request, english_query, english_answer, final_answer, clinical_data)
+    try:
+        await save_to_mongodb(*args)
+    except Exception as e:
+        log.warning("save.retrying", error=repr(e))
+        job_queue.submit("save_to_mongodb", save_to_mongodb, *args)
 
 
 # ─── /ask Endpoint ───────────────────────────────────────────────────────────
+def overloaded_error(e: Overloaded) -> HTTPException:
+    return HTTPException(status_code=503, detail="Too many requests in flight. Please try again shortly.",
+                         headers={"Retry-After": str(e.retry_after)})
+
+
 @app.post("/ask")
 async def ask(request: QueryRequest):
+    """Admission control and the request deadline (see admission.py) around answer_query."""
+    with deadline_scope(deadline_for(request.source)):
+        try:
+            async with admission.slot(voice=request.source == "voice_call"):
+                return await answer_query(request)
+        except Overloaded as e:
+            log.warning("ask.rejected", source=request.source, retry_after=e.retry_after)
+            raise overloaded_error(e)
+
+
+async def answer_query(request: QueryRequest):
     try:
         if service is None:
             raise HTTPException(status_code=503, detail="AI service is still initializing. Please try again in 30 seconds.")
 
-        print(f"\n📥 /ask | lang={request.language_code} | query='{request.query[:60]}'")
+        log.info("ask.start", lang=request.language_code, query=request.query[:60])
 
         # 1. Translate query to English for RAG
-        english_query = request.query
-        if not request.language_code.lower().startswith("en"):
-            english_query = await translate_text_indic(request.query, request.language_code, "en-IN")
-            print(f"✅ Query in English: '{english_query[:80]}'")
-
-        # 2. Build chat history
-        history_msgs = []
-        for msg in (request.history or [])[-5:]:
-            if msg.role == "user":
-                history_msgs.append(HumanMessage(content=msg.content))
-            else:
-                history_msgs.append(AIMessage(content=msg.content))
-
-        # 3. RAG (English in → English out)
-        print("🧠 Querying RAG...")
+        english_query = await query_to_english(request.query, request.language_code)
+
+        # 2. Build chat history (server-side session, or client-supplied history)
+        session = await load_session(request)
+        history_msgs = build_history_messages(request, session)
+
+        # 3. RAG (English in → English out) — retrieval runs on the RAG executor,
+        #    generation streams asynchronously, so the event loop stays free.
         english_answer = ""
-        for chunk in service.ask_stream(english_query, request.patient_data, history_msgs):
+        meta = {}
+        async for chunk in answer_chunks(request, english_query, history_msgs, meta):
             english_answer += chunk
         english_answer = english_answer.strip()
-        print(f"✅ RAG answer: '{english_answer[:80]}...'")
+        if meta["cut_short"]:
+            # Out of time mid-answer: keep the finished sentences
+            sentences, _ = pop_complete_sentences(english_answer + " ")
+            english_answer = " ".join(sentences) or english_answer
 
         # 4. Translate RAG answer to user's language
         final_answer = english_answer
         if not request.language_code.lower().startswith("en"):
-            final_answer = await translate_text_indic(english_answer, "en-IN", request.language_code)
-            print(f"✅ Native answer: '{final_answer[:80]}...'")
+            with STAGE_SECONDS.time(stage="translate_out"):
+                final_answer = await translate_text_indic(english_answer, "en-IN", request.language_code)
+        log.info("ask.done", lang=request.language_code, cache_hit=meta["cache_hit"],
+                 answer_chars=len(english_answer))
 
-        # 5. Clinical extraction (best-effort)
-        clinical_data = {
-            "symptoms": [], "medications": [], "relief_noted": False,
-            "relief_details": "", "fetal_movement": "Unknown", "severity": 5, "summary": ""
-        }
-        try:
-            clinical_data = await extract_clinical_data(english_query, english_answer)
-        except Exception as e:
-            print(f"⚠️ Clinical extraction skipped: {e}")
-
-        # 6. Save to MongoDB (best-effort)
-        try:
-            await save_to_mongodb(request, english_query, english_answer, final_answer, clinical_data)
-        except Exception as e:
-            print(f"⚠️ MongoDB save skipped: {e}")
+        # 5 + 6. Clinical extraction and MongoDB save run on the background job
+        #        queue; the caller only needs the answer.
+        await record_turn(session, english_query, english_answer)
+        job_queue.submit("finalize_interaction", finalize_interaction,
+                         request, english_query, english_answer, final_answer)
 
         return {
             "english_query":   english_query,
             "english_answer":  english_answer,
             "localized_answer": final_answer,
             "verified_language": request.language_code,
+            "cache_hit": meta["cache_hit"],
+            "cut_short": meta["cut_short"],
+            "retrieval_timings": meta["retrieval_timings"],
+            "context_stats": meta["context_stats"],
             "status": "success"
         }
 
     except HTTPException:
         raise
+    except DeadlineExceeded as e:
+        log.warning("ask.deadline", source=request.source, stage=e.stage)
+        raise HTTPException(status_code=504, detail=f"No answer within the request deadline ({e.stage}).")
+    except LLMRateLimited as e:
+        log.warning("ask.shed", source=request.source, retry_after=e.retry_after)
+        raise HTTPException(status_code=503, detail="The assistant is busy. Please try again shortly.",
+                            headers={"Retry-After": str(max(1, round(e.retry_after)))})
     except Exception as e:
-        import traceback; traceback.print_exc()
+        ERRORS.inc(stage="ask")
+        log.exception("ask.failed", error=repr(e))
         raise HTTPException(status_code=500, detail=str(e))
 
 
-# ─── Health Check ────────────────────────────────────────────────────────────
+# ─── /ask/stream Endpoint (NDJSON, sentence by sentence) ─────────────────────
+@app.post("/ask/stream")
+async def ask_streaming(request: QueryRequest):
+    """Same pipeline as /ask, but each sentence is translated and flushed as
+    soon as the LLM finishes it, so TTS can start before generation ends.
+
+    Emits one JSON object per line:
+      {"type": "sentence", "index": 0, "english": "...", "localized": "..."}
+      ...
+      {"type": "done", "english_query": ..., "english_answer": ..., "localized_answer": ..., ...}
+    or {"type": "error", "detail": "..."} if the pipeline fails mid-stream.
+
+    Admission and the deadline work as for /ask; a request that times out
+    in the admission queue gets an error line with "retry_after".
+    """
+    if service is None:
+        raise HTTPException(status_code=503, detail="AI service is still initializing. Please try again in 30 seconds.")
+    try:
+        admission.check()
+    except Overloaded as e:
+        log.warning("ask_stream.rejected", source=request.source, retry_after=e.retry_after)
+        raise overloaded_error(e)
+    deadline_at = deadline_for(request.source)
+
+    log.info("ask_stream.start", lang=request.language_code, query=request.query[:60])
+    needs_translation = not request.language_code.lower().startswith("en")
+
+    async def event_stream():
+        try:
+            english_query = await query_to_english(request.query, request.language_code)
+
+            session = await load_session(request)
+            history_msgs = build_history_messages(request, session)
+            english_sentences, native_sentences = [], []
+
+            async def emit(sentence: str) -> str:
+                localized = sentence
+                if needs_translation:
+                    with STAGE_SECONDS.time(stage="translate_out"):
+                        localized = await translate_text_indic(sentence, "en-IN", request.language_code)
+                event = {"type": "sentence", "index": len(english_sentences),
+                         "english": sentence, "localized": localized}
+                english_sentences.append(sentence)
+                native_sentences.append(localized)
+                return json.dumps(event, ensure_ascii=False) + "\n"
+
+            buffer = ""
+            meta = {}
+            async for chunk in answer_chunks(request, english_query, history_msgs, meta):
+                buffer += chunk
+                sentences, buffer = pop_complete_sentences(buffer)
+                for sentence in sentences:
+                    yield await emit(sentence)
+            if buffer.strip() and not meta["cut_short"]:
+                yield await emit(buffer.strip())
+
+            english_answer = " ".join(english_sentences)
+            final_answer = " ".join(native_sentences)
+            log.info("ask_stream.done", lang=request.language_code, cache_hit=meta["cache_hit"],
+                     sentences=len(english_sentences))
+
+            # Queue before "done" so a client that hangs up right after it
+            # does not cancel the extraction/save.
+            await record_turn(session, english_query, english_answer)
+            job_queue.submit("finalize_interaction", finalize_interaction,
+                             request, english_query, english_answer, final_answer)
+
+            yield json.dumps({
+                "type": "done",
+                "english_query":   english_query,
+                "english_answer":  english_answer,
+                "localized_answer": final_answer,
+                "verified_language": request.language_code,
+                "cache_hit": meta["cache_hit"],
+                "cut_short": meta["cut_short"],
+                "retrieval_timings": meta["retrieval_timings"],
+                "context_stats": meta["context_stats"],
+                "status": "success"
+            }, ensure_ascii=False) + "\n"
+        except DeadlineExceeded as e:
+            log.warning("ask_stream.deadline", source=request.source, stage=e.stage)
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+        except Exception as e:
+            ERRORS.inc(stage="ask_stream")
+            log.exception("ask_stream.failed", error=repr(e))
+            yield json.dumps({"type": "error", "detail": str(e)}) + "\n"
+
+    async def admitted_stream():
+        # The slot is taken inside the stream so it is always released with it
+        with deadline_scope(deadline_at):
+            try:
+                async with admission.slot(voice=request.source == "voice_call"):
+                    async for line in event_stream():
+                        yield line
+            except Overloaded as e:
+                yield json.dumps({"type": "error", "detail": str(e), "retry_after": e.retry_after}) + "\n"
+
+    return StreamingResponse(admitted_stream(), media_type="application/x-ndjson")
+
+
+# ─── /ask/batch Endpoint (NDJSON, one line per unique query) ─────────────────
+@app.post("/ask/batch")
+async def ask_batch(request: BatchRequest):
+    """Answer many queries for evaluation or offline processing.
+
+    Identical queries (same normalized text, language and patient data) are
+    answered once. Queries are embedded in batches of ASK_BATCH_CHUNK and
+    retrieved in one vectorized pass per batch; generation and translation
+    then fan out under ASK_BATCH_CONCURRENCY. Nothing is saved to MongoDB.
+
+    Emits one JSON object per line as answers complete, in completion order:
+      {"type": "result", "indices": [0, 7], "ids": [...], "english_answer": ..., "localized_answer": ..., ...}
+      {"type": "error", "indices": [3], "ids": [...], "detail": "..."}
+      ...
+      {"type": "done", "queries": 120, "unique": 97, "cache_hits": 12, "errors": 0, "timings": {...}, ...}
+    """
+    if service is None:
+        raise HTTPException(status_code=503, detail="AI service is still initializing. Please try again in 30 seconds.")
+    if len(request.queries) > ASK_BATCH_MAX_QUERIES:
+        raise HTTPException(status_code=413, detail=f"At most {ASK_BATCH_MAX_QUERIES} queries per batch.")
+
+    groups = {}
+    for i, item in enumerate(request.queries):
+        key = (normalize_text(item.query), item.language_code.lower(), item.patient_data)
+        groups.setdefault(key, []).append(i)
+    unique = [(request.queries[indices[0]], indices) for indices in groups.values()]
+    log.info("ask_batch.start", queries=len(request.queries), unique=len(unique), use_cache=request.use_cache)
+    return StreamingResponse(_batch_events(request, unique), media_type="application/x-ndjson")
+
+
+async def _batch_events(request: BatchRequest, unique: list):
+    started = time.perf_counter()
+    loop = asyncio.get_running_loop()
+    use_cache = request.use_cache and answer_cache is not None
+    results: asyncio.Queue = asyncio.Queue()
+    timings = {"translate_in_ms": 0.0, "embed_ms": 0.0}
+    stats = {"queries": len(request.queries), "unique": len(unique), "cache_hits": 0, "errors": 0}
+    tasks = []
+
+    async def to_english(item: BatchQuery) -> str:
+        async with batch_slots:
+            return await query_to_english(item.query, item.language_code)
+
+    async def answer(item: BatchQuery, indices: list, english_query: str, embedding, docs, cached):
+        line = {"type": "result", "indices": indices, "ids": [request.queries[i].id for i in indices],
+                "query": item.query, "language_code": item.language_code, "english_query": english_query}
+        try:
+            async with batch_slots:
+                english_answer = cached
+                if english_answer is None:
+                    english_answer = ""
+                    async for chunk in service.astream_answer(english_query, docs, item.patient_data,
+                                                              priority=BATCH):
+                        english_answer += chunk
+                    english_answer = english_answer.strip()
+                    if use_cache:
+                        answer_cache.store(embedding, patient_context_key(item.patient_data), english_answer)
+                final_answer = english_answer
+                if not item.language_code.lower().startswith("en"):
+                    final_answer = await translate_text_indic(english_answer, "en-IN", item.language_code)
+            line.update(english_answer=english_answer, localized_answer=final_answer, cache_hit=cached is not None)
+        except Exception as e:
+            stats["errors"] += 1
+            ERRORS.inc(stage="ask_batch")
+            log.warning("ask_batch.query_failed", indices=indices, error=repr(e))
+            line.update(type="error", detail=str(e))
+        await results.put(line)
+
+    async def produce():
+        try:
+            if use_cache:
+                answer_cache.sync_index_version(service.index_version)
+            for start in range(0, len(unique), ASK_BATCH_CHUNK):
+                chunk = unique[start:start + ASK_BATCH_CHUNK]
+                t0 = time.perf_counter()
+                english = list(await asyncio.gather(*(to_english(item) for item, _ in chunk)))
+                t1 = time.perf_counter()
+                embeddings = await loop.run_in_executor(service.executor, service.embed_queries, english)
+                timings["translate_in_ms"] += (t1 - t0) * 1000
+                timings["embed_ms"] += (time.perf_counter() - t1) * 1000
+
+                cached = [None] * len(chunk)
+                if use_cache:
+                    for j, (item, _) in enumerate(chunk):
+                        cached[j] = answer_cache.lookup(embeddings[j], patient_context_key(item.patient_data))
+                        CACHE_LOOKUPS.inc(cache="answer", result="hit" if cached[j] is not None else "miss")
+                misses = [j for j, c in enumerate(cached) if c is None]
+                stats["cache_hits"] += len(chunk) - len(misses)
+                docs = [None] * len(chunk)
+                retrieved = await loop.run_in_executor(
+                    service.executor, service.retrieve_batch,
+                    [english[j] for j in misses], [embeddings[j] for j in misses], timings
+                )
+                for j, found in zip(misses, retrieved):
+                    docs[j] = found
+
+                for j, (item, indices) in enumerate(chunk):
+                    tasks.append(asyncio.create_task(
+                        answer(item, indices, english[j], embeddings[j], docs[j], cached[j])))
+            await asyncio.gather(*tasks)
+        except Exception as e:
+            stats["errors"] += 1
+            ERRORS.inc(stage="ask_batch")
+            log.exception("ask_batch.failed", error=repr(e))
+            await results.put({"type": "error", "detail": str(e)})
+        finally:
+            await results.put(None)
+
+    producer = asyncio.create_task(produce())
+    try:
+        while (line := await results.get()) is not None:
+            yield json.dumps(line, ensure_ascii=False) + "\n"
+        stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        stats["timings"] = {k: round(v, 1) for k, v in timings.items()}
+        log.info("ask_batch.done", **{k: v for k, v in stats.items() if k != "timings"})
+        yield json.dumps({"type": "done", **stats}) + "\n"
+    finally:
+        # Client hung up: stop the remaining generations
+        for task in [producer, *tasks]:
+            task.cancel()
+
+
+# ─── Startup Phase Tracking ──────────────────────────────────────────────────
+class StartupPhases:
+    """Records status and duration of each startup phase for /health/ready."""
+
+    def __init__(self):
+        self.started_at = time.monotonic()
+        self.phases = {}
+        self.ready_at = None
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        entry = self.phases[name] = {"status": "running", "ms": None}
+        t0 = time.perf_counter()
+        try:
+            yield
+            entry["status"] = "done"
+        except Exception as e:
+            entry["status"] = "failed"
+            entry["error"] = str(e)
+            raise
+        finally:
+            entry["ms"] = round((time.perf_counter() - t0) * 1000, 1)
+
+    def mark_ready(self):
+        self.ready_at = time.monotonic()
+
+    def snapshot(self) -> dict:
+        return {
+            "phases": self.phases,
+            "uptime_s": round(time.monotonic() - self.started_at, 1),
+            "time_to_ready_s": round(self.ready_at - self.started_at, 2) if self.ready_at else None,
+        }
+
+startup_phases = StartupPhases()
+
+
+# ─── Health Checks ───────────────────────────────────────────────────────────
+@app.get("/health/live")
+async def health_live():
+    """Liveness: the process is up and the event loop is responsive."""
+    return {"status": "ok", "service": "python-rag"}
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Readiness: the RAG service is loaded and /ask can be served."""
+    ready = service is not None
+    body = {
+        "status": "ready" if ready else "starting",
+        "index_version": service.index_version if ready else None,
+        **startup_phases.snapshot(),
+    }
+    return JSONResponse(body, status_code=200 if ready else 503)
+
+
 @app.get("/health")
 async def health():
-    return {"status": "ok", "service": "python-rag"}
+    return {
+        "status": "ok",
+        "service": "python-rag",
+        "ready": service is not None,
+        "startup": startup_phases.snapshot(),
+        "translation_cache": translation_cache.snapshot() if translation_cache else None,
+        "translation_hedge": translation_hedge.snapshot() if translation_hedge else None,
+        "llm_scheduler": llm_scheduler.snapshot(),
+        "answer_cache": answer_cache.snapshot() if answer_cache else None,
+        "background_jobs": job_queue.snapshot() if job_queue else None,
+        "mongo_batcher": health_log_batcher.snapshot() if health_log_batcher else None,
+        "sessions": session_store.snapshot() if session_store else None,
+        "admission": admission.snapshot() if admission else None,
+    }
 
 
-# ─── Startup ─────────────────────────────────────────────────────────────────
-@app.on_event("startup")
-async def startup():
-    global service, translator_llm, clinical_llm
+# ─── Metrics ─────────────────────────────────────────────────────────────────
+_BREAKER_STATES = {"closed": 0, "half-open": 1, "open": 2}
+
+
+def _component_state() -> dict:
+    """Sampled into janani_component_state on every scrape."""
+    values = {("rag_service", "ready"): int(service is not None)}
+    if job_queue is not None:
+        jobs = job_queue.snapshot()
+        values[("job_queue", "depth")] = jobs["queue_depth"]
+        values[("job_queue", "in_progress")] = jobs["in_progress"]
+        values[("job_queue", "pending_retries")] = jobs["pending_retries"]
+    if sarvam_client is not None:
+        values[("sarvam_breaker", "state")] = _BREAKER_STATES.get(sarvam_client.breaker.state, -1)
+    if health_log_batcher is not None:
+        values[("mongo_batcher", "pending")] = health_log_batcher.snapshot()["pending"]
+    if translation_cache is not None:
+        values[("translation_cache", "size")] = translation_cache.snapshot()["size"]
+    if answer_cache is not None:
+        values[("answer_cache", "size")] = answer_cache.snapshot()["size"]
+    if session_store is not None:
+        values[("sessions", "size")] = session_store.snapshot()["size"]
+    if admission is not None:
+        state = admission.snapshot()
+        values[("admission", "in_flight")] = state["in_flight"]
+        values[("admission", "waiting")] = state["waiting"]
+    return values
+
 
-    # 1. MongoDB
+COMPONENT_STATE.set_function(_component_state)
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition of this worker's metrics (see observability.py)."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
+# ─── Startup ─────────────────────────────────────────────────────────────────
+def _load_rag_service():
+    """Runs in a worker thread: build the RAG service and warm the embedder."""
+    global service, answer_cache
+    bundle = RAG_INDEX_BUNDLE
+    log.info("rag.init", bundle=bundle or "dev mode: may ingest on first run")
+    svc = PregnancyRAGService(bundle_dir=bundle, phases=startup_phases.phase)
+    with startup_phases.phase("warmup"):
+        dim = len(svc.embeddings.embed_query("warmup"))
+    cache = SemanticAnswerCache(dim)
+    cache.sync_index_version(svc.index_version)
+    answer_cache = cache
+    service = svc                     # publish last: readiness flips here
+    startup_phases.mark_ready()
+    log.info("rag.ready", time_to_ready_s=startup_phases.snapshot()["time_to_ready_s"])
+
+
+async def _init_rag_in_background():
     try:
-        await mongo_client.admin.command("ping")
-        print("✅ MongoDB connected from Python RAG API")
+        await asyncio.get_running_loop().run_in_executor(None, _load_rag_service)
     except Exception as e:
-        print(f"⚠️ MongoDB connection warning: {e}")
+        log.exception("rag.init_failed", error=repr(e))
 
-    # 2. Groq LLMs
+
+@app.on_event("startup")
+async def startup():
+    global translator_llm, clinical_llm, sarvam_client, translation_cache, translation_hedge, job_queue, \
+        health_log_batcher, session_store, batch_slots, admission, _rag_init_task
+
+    # 0. Shared Sarvam HTTP client (keep-alive pool + circuit breaker), translation cache and hedge
+    sarvam_client = SarvamClient(SARVAM_API_KEY)
+    translation_cache = TranslationCache()
+    translation_hedge = Hedge("translate")
+
+    # 0b. Background job queue (clinical extraction + MongoDB persistence)
+    job_queue = JobQueue()
+    job_queue.start()
+    health_log_batcher = HealthLogBatcher(db)
+    if SESSIONS:
+        session_store = SessionStore(db)
+    batch_slots = asyncio.Semaphore(ASK_BATCH_CONCURRENCY)
+    admission = AdmissionController()
+
+    # 1. RAG Service (heaviest) loads in the background so liveness is
+    #    immediate and readiness reports per-phase progress.
+    _rag_init_task = asyncio.create_task(_init_rag_in_background())
+
+    # 2. MongoDB
     try:
-        groq_key = os.getenv("GROQ_API_KEY")
-        print(f"🔑 GROQ_API_KEY present: {bool(groq_key)}")
-        translator_llm = ChatGroq(
-            temperature=0,
-            model_name="llama-3.3-70b-versatile",
-            groq_api_key=groq_key
-        )
-        clinical_llm = ChatGroq(
-            temperature=0.2,
-            model_name="llama-3.3-70b-versatile",
-            groq_api_key=groq_key
-        )
-        print("✅ Groq LLMs initialized")
+        with startup_phases.phase("mongodb"):
+            await mongo_client.admin.command("ping")
+            log.info("mongodb.connected")
+            await ensure_bucket_indexes(db)
+            if SESSIONS:
+                await ensure_session_indexes(db)
     except Exception as e:
-        print(f"❌ Groq LLM init failed: {e}")
-        import traceback; traceback.print_exc()
+        log.warning("mongodb.unavailable", error=repr(e))
 
-    # 3. RAG Service (heaviest — downloads model + ingests health_book.txt)
+    # 3. Groq LLMs
     try:
-        print("🧠 Initializing RAG Service (this may take 1-2 minutes on first run)...")
-        service = PregnancyRAGService()
-        print("✅ RAG Service initialized")
+        with startup_phases.phase("groq_clients"):
+            groq_key = os.getenv("GROQ_API_KEY")
+            translator_llm = ChatGroq(
+                temperature=0,
+                model_name="llama-3.3-70b-versatile",
+                groq_api_key=groq_key,
+                max_retries=0,   # 429s and retries are handled by llm_scheduler
+            )
+            clinical_llm = ChatGroq(
+                temperature=0.2,
+                model_name="llama-3.3-70b-versatile",
+                groq_api_key=groq_key,
+                max_retries=0,
+            )
+            log.info("groq.ready", api_key_present=bool(groq_key))
     except Exception as e:
-        print(f"❌ RAG Service init failed: {e}")
-        import traceback; traceback.print_exc()
+        log.exception("groq.init_failed", error=repr(e))
+
+
+@app.on_event("shutdown")
+async def shutdown():
+    if job_queue is not None:
+        await job_queue.stop()
+    if health_log_batcher is not None:
+        await health_log_batcher.close()
+    if service is not None:
+        service.close()
+    if sarvam_client is not None:
+        await sarvam_client.aclose()
+    if translation_cache is not None:
+        translation_cache.close()
+    mongo_client.close()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,79 @@
+"""Run a file of questions through POST /ask/batch.
+
+    python ask_batch.py questions.txt --language hi-IN --out answers.jsonl
+    python ask_batch.py questions.jsonl --url http://localhost:8000 --no-cache
+
+The input is either plain text (one query per line) or JSONL with a "query"
+field and optional "id", "language_code" and "patient_data". Large files are
+sent in requests of --batch-size queries. Each result line from the API is
+written to --out (default stdout) as soon as it arrives, with the batch
+summary lines on stderr.
+"""
+import sys
+import json
+import argparse
+
+import httpx
+
+
+def read_queries(path: str, language_code: str) -> list:
+    queries = []
+    with open(path, "r", encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            line = line.strip()
+            if not line:
+                continue
+            if line.startswith("{"):
+                item = json.loads(line)
+            else:
+                item = {"query": line}
+            item.setdefault("id", str(n))
+            item.setdefault("language_code", language_code)
+            queries.append(item)
+    return queries
+
+
+def run(queries: list, url: str, use_cache: bool, batch_size: int, out) -> int:
+    """Stream every batch's results into `out`. Returns the number of failed queries."""
+    failed = 0
+    with httpx.Client(base_url=url, timeout=httpx.Timeout(None, connect=10.0)) as client:
+        for start in range(0, len(queries), batch_size):
+            batch = queries[start:start + batch_size]
+            with client.stream("POST", "/ask/batch", json={"queries": batch, "use_cache": use_cache}) as r:
+                if r.status_code != 200:
+                    r.read()
+                    raise SystemExit(f"❌ /ask/batch returned HTTP {r.status_code}: {r.text[:200]}")
+                for line in r.iter_lines():
+                    if not line:
+                        continue
+                    event = json.loads(line)
+                    if event["type"] == "done":
+                        print(f"✅ {start + len(batch)}/{len(queries)}: {event['unique']} unique, "
+                              f"{event['cache_hits']} cached, {event['errors']} failed in "
+                              f"{event['elapsed_ms'] / 1000:.1f}s", file=sys.stderr)
+                        continue
+                    if event["type"] == "error":
+                        failed += len(event.get("indices", [])) or 1
+                    out.write(line + "\n")
+                    out.flush()
+    return failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a file of queries via the /ask/batch endpoint.")
+    parser.add_argument("input", help="text file (one query per line) or JSONL with a 'query' field")
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--language", default="en-IN", help="language_code for lines that don't set one")
+    parser.add_argument("--no-cache", action="store_true", help="bypass the semantic answer cache")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--out", help="output JSONL (default: stdout)")
+    args = parser.parse_args()
+
+    queries = read_queries(args.input, args.language)
+    out = open(args.out, "w", encoding="utf-8") if args.out else sys.stdout
+    try:
+        failed = run(queries, args.url, not args.no_cache, args.batch_size, out)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    sys.exit(1 if failed else 0)
@@ -0,0 +1,127 @@
+import os
+import time
+import asyncio
+from typing import Awaitable, Callable
+
+from observability import get_logger, ERRORS, JOBS_DROPPED
+
+log = get_logger("jobs")
+
+# ─── Configuration ───────────────────────────────────────────────────────────
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_QUEUE_SIZE = int(os.getenv("JOB_QUEUE_SIZE", "1000"))
+JOB_MAX_RETRIES = int(os.getenv("JOB_MAX_RETRIES", "3"))
+JOB_RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", "0.5"))
+JOB_DRAIN_TIMEOUT = float(os.getenv("JOB_DRAIN_TIMEOUT", "20"))
+
+
+class _Job:
+    __slots__ = ("name", "fn", "args", "kwargs", "attempt", "enqueued_at")
+
+    def __init__(self, name, fn, args, kwargs):
+        self.name = name
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.attempt = 0
+        self.enqueued_at = time.monotonic()
+
+
+class JobQueue:
+    """In-process async job queue with a fixed worker pool.
+
+    Failed jobs are re-queued with exponential backoff up to `max_retries`
+    times. `stop()` lets workers drain what is already queued before exiting.
+
+    `submit()` never waits: it is called on the request path and from jobs
+    themselves, and a worker blocked putting into the queue it drains would
+    deadlock it. A job that finds the queue full is dropped and counted.
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, maxsize: int = JOB_QUEUE_SIZE,
+                 max_retries: int = JOB_MAX_RETRIES, base_delay: float = JOB_RETRY_BASE_DELAY):
+        self.workers = workers
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._tasks = []
+        self._retry_timers = set()
+        self.stats = {"submitted": 0, "completed": 0, "failed": 0, "retried": 0, "dropped": 0,
+                      "in_progress": 0, "last_lag_ms": 0.0, "max_lag_ms": 0.0}
+
+    def start(self):
+        for i in range(self.workers):
+            self._tasks.append(asyncio.create_task(self._worker(i), name=f"job-worker-{i}"))
+        log.info("jobs.started", workers=self.workers)
+
+    def submit(self, name: str, fn: Callable[..., Awaitable], *args, **kwargs) -> bool:
+        """Enqueue `await fn(*args, **kwargs)`. Returns False, dropping the job,
+        if the queue is full."""
+        try:
+            self._queue.put_nowait(_Job(name, fn, args, kwargs))
+        except asyncio.QueueFull:
+            self.stats["dropped"] += 1
+            JOBS_DROPPED.inc(job=name)
+            log.error("jobs.dropped", job=name, queue_size=self._queue.maxsize)
+            return False
+        self.stats["submitted"] += 1
+        return True
+
+    async def _worker(self, worker_id: int):
+        while True:
+            job = await self._queue.get()
+            lag_ms = (time.monotonic() - job.enqueued_at) * 1000
+            self.stats["last_lag_ms"] = round(lag_ms, 1)
+            self.stats["max_lag_ms"] = round(max(self.stats["max_lag_ms"], lag_ms), 1)
+            self.stats["in_progress"] += 1
+            try:
+                await job.fn(*job.args, **job.kwargs)
+                self.stats["completed"] += 1
+            except Exception as e:
+                self._schedule_retry(job, e)
+            finally:
+                self.stats["in_progress"] -= 1
+                self._queue.task_done()
+
+    def _schedule_retry(self, job: _Job, error: Exception):
+        if job.attempt >= self.max_retries:
+            self.stats["failed"] += 1
+            ERRORS.inc(stage="background_job")
+            log.error("jobs.failed", job=job.name, attempts=job.attempt + 1, error=repr(error))
+            return
+        delay = self.base_delay * (2 ** job.attempt)
+        job.attempt += 1
+        self.stats["retried"] += 1
+        log.warning("jobs.retry", job=job.name, attempt=job.attempt, max_retries=self.max_retries,
+                    delay_s=round(delay, 1), error=repr(error))
+
+        async def _requeue():
+            await asyncio.sleep(delay)
+            job.enqueued_at = time.monotonic()
+            await self._queue.put(job)
+
+        timer = asyncio.create_task(_requeue())
+        self._retry_timers.add(timer)
+        timer.add_done_callback(self._retry_timers.discard)
+
+    async def stop(self, timeout: float = JOB_DRAIN_TIMEOUT):
+        """Drain queued jobs (and pending retries) for up to `timeout` seconds, then stop workers."""
+        pending = self._queue.qsize() + len(self._retry_timers)
+        if pending:
+            log.info("jobs.draining", pending=pending)
+        try:
+            async def _drain():
+                while self._retry_timers or not self._queue.empty() or self.stats["in_progress"]:
+                    if self._retry_timers:
+                        await asyncio.gather(*self._retry_timers, return_exceptions=True)
+                    await self._queue.join()
+            await asyncio.wait_for(_drain(), timeout)
+        except asyncio.TimeoutError:
+            log.warning("jobs.drain_timeout", dropped=self._queue.qsize())
+        for t in list(self._retry_timers) + self._tasks:
+            t.cancel()
+        await asyncio.gather(*self._retry_timers, *self._tasks, return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "queue_depth": self._queue.qsize(),
+                "pending_retries": len(self._retry_timers), "workers": self.workers}
@@ -0,0 +1,201 @@
+"""Local stand-ins for the external services, used by benchmark.py.
+
+- Groq: the OpenAI-compatible /openai/v1/chat/completions endpoint, with
+  and without SSE streaming (point ChatGroq at it with GROQ_API_BASE).
+  Clinical-extraction prompts get a JSON answer, translation prompts get
+  the input text back, everything else a short canned answer.
+- Sarvam: POST /translate, echoing the input (SARVAM_BASE_URL).
+- MongoDB: `FakeMongoClient`, an in-process replacement for the Motor
+  client that implements what the API uses (ping, create_index, bulk_write).
+
+Each service has a base latency, a relative jitter and an error rate.
+
+    python bench_fakes.py --port 9100 --groq-ttft-ms 150 --sarvam-latency-ms 120
+"""
+import time
+import json
+import uuid
+import random
+import asyncio
+from dataclasses import dataclass
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+from pymongo.errors import AutoReconnect
+
+
+@dataclass
+class FakeLatency:
+    latency_ms: float = 0.0
+    jitter: float = 0.2          # ± fraction of latency_ms
+    error_rate: float = 0.0
+
+    async def wait(self, extra_ms: float = 0.0):
+        base = self.latency_ms * random.uniform(1 - self.jitter, 1 + self.jitter) + extra_ms
+        if base > 0:
+            await asyncio.sleep(base / 1000)
+
+    def fails(self) -> bool:
+        return self.error_rate > 0 and random.random() < self.error_rate
+
+
+_CANNED_ANSWER = ("Drink a glass of water and rest on your left side for an hour. "
+                  "Eat a handful of roasted chana with jaggery for iron. "
+                  "If the tiredness comes with dizziness or bleeding, call your doctor today.")
+_CANNED_CLINICAL = {
+    "symptoms": ["fatigue"], "medications": ["iron supplement"],
+    "relief_noted": False, "relief_details": "",
+    "fetal_movement": "Unknown", "severity": 4,
+    "summary": "Patient reports fatigue; advised rest, hydration and iron-rich food.",
+}
+
+
+def _completion_text(messages: list) -> str:
+    prompt = str(messages[-1].get("content", "")) if messages else ""
+    if "Extract clinical data" in prompt:
+        return json.dumps(_CANNED_CLINICAL)
+    if prompt.startswith("Translate the following"):
+        return prompt.split("\n\n", 1)[-1]
+    return _CANNED_ANSWER
+
+
+def create_app(groq: FakeLatency, groq_token_ms: float, sarvam: FakeLatency) -> FastAPI:
+    """`groq.latency_ms` is time to first token; each further token adds groq_token_ms."""
+    app = FastAPI(title="Janani benchmark fakes")
+    stats = {"groq_requests": 0, "groq_errors": 0, "sarvam_requests": 0, "sarvam_errors": 0}
+
+    @app.post("/openai/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        stats["groq_requests"] += 1
+        await groq.wait()
+        if groq.fails():
+            stats["groq_errors"] += 1
+            return JSONResponse({"error": {"message": "injected failure", "type": "server_error"}}, status_code=503)
+
+        model = body.get("model", "fake")
+        text = _completion_text(body.get("messages", []))
+        tokens = text.split(" ")
+        cid, created = f"chatcmpl-{uuid.uuid4().hex[:12]}", int(time.time())
+        usage = {"prompt_tokens": 200, "completion_tokens": len(tokens), "total_tokens": 200 + len(tokens)}
+
+        if not body.get("stream"):
+            await asyncio.sleep(groq_token_ms * len(tokens) / 1000)
+            return {
+                "id": cid, "object": "chat.completion", "created": created, "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text},
+                             "logprobs": None, "finish_reason": "stop"}],
+                "usage": usage, "system_fingerprint": None,
+            }
+
+        async def events():
+            def chunk(delta, finish=None, **extra):
+                return "data: " + json.dumps({
+                    "id": cid, "object": "chat.completion.chunk", "created": created, "model": model,
+                    "system_fingerprint": None,
+                    "choices": [{"index": 0, "delta": delta, "logprobs": None, "finish_reason": finish}],
+                    **extra,
+                }) + "\n\n"
+
+            for i, tok in enumerate(tokens):
+                if i:
+                    await asyncio.sleep(groq_token_ms / 1000)
+                yield chunk({"role": "assistant", "content": (" " if i else "") + tok})
+            yield chunk({}, "stop", x_groq={"id": cid, "usage": usage})
+            yield "data: [DONE]\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/translate")
+    async def translate(request: Request):
+        body = await request.json()
+        stats["sarvam_requests"] += 1
+        await sarvam.wait()
+        if sarvam.fails():
+            stats["sarvam_errors"] += 1
+            return JSONResponse({"error": "injected failure"}, status_code=503)
+        return {"request_id": uuid.uuid4().hex, "translated_text": body.get("input", ""),
+                "source_language_code": body.get("source_language_code")}
+
+    @app.get("/stats")
+    async def get_stats():
+        return stats
+
+    return app
+
+
+# ─── MongoDB stand-in ────────────────────────────────────────────────────────
+class _BulkWriteResult:
+    def __init__(self, n: int):
+        self.upserted_count = 0
+        self.modified_count = n
+
+
+class FakeCollection:
+    def __init__(self, name: str, latency: FakeLatency, op_us: float, stats: dict):
+        self.name = name
+        self.latency = latency
+        self.op_us = op_us
+        self.stats = stats
+
+    async def bulk_write(self, ops: list, ordered: bool = True):
+        await self.latency.wait(extra_ms=len(ops) * self.op_us / 1000)
+        self.stats["bulk_writes"] += 1
+        if self.latency.fails():
+            self.stats["errors"] += 1
+            raise AutoReconnect("injected failure")
+        self.stats["ops"] += len(ops)
+        return _BulkWriteResult(len(ops))
+
+    async def create_index(self, keys, **kwargs):
+        return "_".join(f"{k}_{d}" for k, d in keys) if isinstance(keys, list) else str(keys)
+
+
+class FakeDatabase:
+    def __init__(self, latency: FakeLatency, op_us: float, stats: dict):
+        self._args = (latency, op_us, stats)
+        self._collections = {}
+
+    def __getitem__(self, name: str) -> FakeCollection:
+        if name not in self._collections:
+            self._collections[name] = FakeCollection(name, *self._args)
+        return self._collections[name]
+
+    async def command(self, cmd, *args, **kwargs):
+        await self._args[0].wait()
+        return {"ok": 1.0}
+
+
+class FakeMongoClient:
+    """Stands in for AsyncIOMotorClient: `latency` applies per call, plus
+    `op_us` microseconds per bulk-write op; failures raise AutoReconnect."""
+
+    def __init__(self, latency: FakeLatency, op_us: float = 20.0):
+        self.stats = {"bulk_writes": 0, "ops": 0, "errors": 0}
+        self._db = FakeDatabase(latency, op_us, self.stats)
+        self.admin = self._db
+
+    def get_default_database(self, default: str = None) -> FakeDatabase:
+        return self._db
+
+    def close(self):
+        pass
+
+
+if __name__ == "__main__":
+    import argparse
+    import uvicorn
+    parser = argparse.ArgumentParser(description="Serve fake Groq + Sarvam APIs for benchmarking.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--groq-ttft-ms", type=float, default=150)
+    parser.add_argument("--groq-token-ms", type=float, default=4)
+    parser.add_argument("--groq-error-rate", type=float, default=0.0)
+    parser.add_argument("--sarvam-latency-ms", type=float, default=120)
+    parser.add_argument("--sarvam-error-rate", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    args = parser.parse_args()
+
+    app = create_app(FakeLatency(args.groq_ttft_ms, args.jitter, args.groq_error_rate), args.groq_token_ms,
+                     FakeLatency(args.sarvam_latency_ms, args.jitter, args.sarvam_error_rate))
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
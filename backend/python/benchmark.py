@@ -0,0 +1,372 @@
+"""Offline end-to-end benchmark for /ask.
+
+Starts the fake Groq/Sarvam server (bench_fakes.py) and the API in child
+processes, with MongoDB replaced by an in-process stand-in, then drives
+/ask at fixed concurrency levels (closed loop: `c` clients, each sending its
+next request as soon as the previous one returns). For every level it
+reports throughput, errors and p50/p95/p99 of each pipeline stage:
+
+    translate_query → retrieve → generate → translate_answer → extract → save
+    (end_to_end is measured by the client; extract and save run on the
+    background job queue, and the level waits for the queue to drain)
+
+Results are written as JSON to bench_results/<timestamp>-<git sha>.json;
+`--baseline` compares against an earlier file and exits 1 when any stage's
+p95 regressed by more than --max-regression.
+
+    python benchmark.py --concurrency 1 4 16 --requests 200
+    python benchmark.py --baseline bench_results/<earlier>.json
+
+The RAG index is the real one (RAG_INDEX_BUNDLE or dev-mode vectordb), so
+embedding and retrieval cost is measured for real; only the network
+services are faked. The answer cache is disabled unless --answer-cache.
+"""
+import os
+import sys
+import json
+import math
+import time
+import socket
+import asyncio
+import platform
+import subprocess
+from collections import defaultdict
+
+import httpx
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RESULTS_DIR = os.path.join(HERE, "bench_results")
+STAGES = ["translate_query", "retrieve", "generate", "translate_answer", "extract", "save", "end_to_end"]
+QUERIES = [
+    "I feel very tired all day, what should I eat?",
+    "My feet are swollen in the evening, is that normal?",
+    "I have a headache and blurred vision since morning.",
+    "How much iron should I take in the second trimester?",
+    "I have not felt the baby move much today.",
+    "What exercise is safe in the third trimester?",
+    "I vomit every morning and cannot keep food down.",
+    "My blood sugar was high in the last test, what should I avoid?",
+]
+
+
+def percentile(values: list, p: float) -> float:
+    """Nearest-rank percentile."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(p / 100 * len(ordered)) - 1)]
+
+
+def summarize(values: list) -> dict:
+    return {"count": len(values),
+            "mean": round(sum(values) / len(values), 2) if values else 0.0,
+            "p50": round(percentile(values, 50), 2),
+            "p95": round(percentile(values, 95), 2),
+            "p99": round(percentile(values, 99), 2)}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ─── API child process ───────────────────────────────────────────────────────
+def serve_api(port: int, mongo_latency_ms: float, mongo_error_rate: float, jitter: float, answer_cache: bool):
+    """Run api.py with fake MongoDB and per-stage timing wrappers.
+
+    Adds GET /__bench/stages (returns and clears the stage samples) and
+    POST /__bench/drain (waits for the background job queue to empty).
+    """
+    import contextvars
+    import uvicorn
+    from fastapi import Body
+    from bench_fakes import FakeMongoClient, FakeLatency
+    import api
+
+    fake_mongo = FakeMongoClient(FakeLatency(mongo_latency_ms, jitter, mongo_error_rate))
+    api.mongo_client = fake_mongo
+    api.db = fake_mongo.get_default_database("test")
+    api.health_logs_collection = api.db["healthlogs"]
+
+    samples = defaultdict(list)
+    current = contextvars.ContextVar("bench_request", default=None)
+
+    def record(stage: str, ms: float):
+        samples[stage].append(ms)
+        request_stages = current.get()
+        if request_stages is not None:
+            request_stages[stage] = ms
+
+    def timed(stage_of, fn):
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                record(stage_of(*args), (time.perf_counter() - started) * 1000)
+        return wrapper
+
+    translate = api.translate_text_indic
+    api.translate_text_indic = timed(
+        lambda text, src, tgt: "translate_answer" if src.lower().startswith("en") else "translate_query", translate)
+    api.extract_clinical_data = timed(lambda *a: "extract", api.extract_clinical_data)
+    api.save_to_mongodb = timed(lambda *a: "save", api.save_to_mongodb)
+
+    answer_chunks = api.answer_chunks
+
+    async def timed_answer_chunks(*args, **kwargs):
+        stages = {}
+        token = current.set(stages)
+        started = time.perf_counter()
+        try:
+            async for chunk in answer_chunks(*args, **kwargs):
+                yield chunk
+        finally:
+            total = (time.perf_counter() - started) * 1000
+            samples["generate"].append(total - stages.get("retrieve", 0.0))
+            current.reset(token)
+    api.answer_chunks = timed_answer_chunks
+
+    load_rag_service = api._load_rag_service
+
+    def load_and_instrument():
+        load_rag_service()
+        api.service.aretrieve = timed(lambda *a: "retrieve", api.service.aretrieve)
+        if not answer_cache:
+            api.answer_cache = None
+    api._load_rag_service = load_and_instrument
+
+    @api.app.get("/__bench/stages")
+    async def bench_stages():
+        out = {k: list(v) for k, v in samples.items()}
+        samples.clear()
+        return {"stages": out, "mongo": dict(fake_mongo.stats)}
+
+    @api.app.post("/__bench/drain")
+    async def bench_drain(timeout: float = Body(60.0, embed=True)):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            await api.health_log_batcher.flush()
+            s = api.job_queue.snapshot()
+            if not (s["queue_depth"] or s["in_progress"] or s["pending_retries"]):
+                return {"drained": True}
+            await asyncio.sleep(0.1)
+        return {"drained": False}
+
+    uvicorn.run(api.app, host="127.0.0.1", port=port, log_level="warning")
+
+
+# ─── Load generator ──────────────────────────────────────────────────────────
+async def run_level(client: httpx.AsyncClient, concurrency: int, n_requests: int, warmup: int,
+                    language_code: str, counter: list) -> dict:
+    async def one(lat: list, errors: list):
+        n = counter[0]
+        counter[0] += 1
+        # Unique text per request, so the translation cache never hits
+        query = f"{QUERIES[n % len(QUERIES)]} ({n})"
+        started = time.perf_counter()
+        try:
+            r = await client.post("/ask", json={"query": query, "language_code": language_code,
+                                                "user_phone": f"+9190000{n % 500:05d}"})
+            if r.status_code != 200:
+                errors.append(r.status_code)
+                return
+        except httpx.HTTPError as e:
+            errors.append(type(e).__name__)
+            return
+        lat.append((time.perf_counter() - started) * 1000)
+
+    async def drive(total: int, lat: list, errors: list):
+        remaining = [total]
+
+        async def worker():
+            while remaining[0] > 0:
+                remaining[0] -= 1
+                await one(lat, errors)
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+    await drive(warmup, [], [])
+    await client.post("/__bench/drain", json={"timeout": 120})
+    await client.get("/__bench/stages")          # discard warmup samples
+
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await drive(n_requests, latencies, errors)
+    elapsed = time.perf_counter() - started
+    drained = (await client.post("/__bench/drain", json={"timeout": 120})).json()["drained"]
+    server = (await client.get("/__bench/stages")).json()
+
+    stages = {name: summarize(server["stages"].get(name, [])) for name in STAGES[:-1]}
+    stages["end_to_end"] = summarize(latencies)
+    return {
+        "concurrency": concurrency,
+        "requests": n_requests,
+        "errors": len(errors),
+        "error_kinds": sorted({str(e) for e in errors}),
+        "duration_s": round(elapsed, 2),
+        "throughput_rps": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+        "background_drained": drained,
+        "stages": stages,
+    }
+
+
+def _git_sha() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], cwd=HERE,
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+def _wait_ready(url: str, proc: subprocess.Popen, timeout: float):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"{url} process exited with {proc.returncode}")
+        try:
+            if httpx.get(url, timeout=1.0).status_code == 200:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.5)
+    raise TimeoutError(f"{url} not ready after {timeout:.0f}s")
+
+
+def compare(result: dict, baseline: dict, max_regression: float) -> bool:
+    """Print p95 deltas per level/stage; return False if any exceeds max_regression."""
+    ok = True
+    base_levels = {lvl["concurrency"]: lvl for lvl in baseline["levels"]}
+    print(f"\nvs. baseline {baseline['meta']['git_sha']} ({baseline['meta']['timestamp']}):")
+    for lvl in result["levels"]:
+        base = base_levels.get(lvl["concurrency"])
+        if base is None:
+            continue
+        for stage in STAGES:
+            new, old = lvl["stages"][stage]["p95"], base["stages"].get(stage, {}).get("p95", 0)
+            if not old:
+                continue
+            delta = (new - old) / old
+            flag = ""
+            if delta > max_regression:
+                flag, ok = "  ❌ REGRESSION", False
+            print(f"  c={lvl['concurrency']:<3} {stage:<17} p95 {old:8.1f} → {new:8.1f} ms ({delta:+.0%}){flag}")
+        rps_old, rps_new = base["throughput_rps"], lvl["throughput_rps"]
+        print(f"  c={lvl['concurrency']:<3} {'throughput':<17}     {rps_old:8.2f} → {rps_new:8.2f} rps")
+    return ok
+
+
+def main(args) -> int:
+    fakes_port, api_port = _free_port(), _free_port()
+    fakes_url, api_url = f"http://127.0.0.1:{fakes_port}", f"http://127.0.0.1:{api_port}"
+    env = {
+        **os.environ,
+        "GROQ_API_BASE": fakes_url, "GROQ_API_KEY": "bench",
+        "SARVAM_BASE_URL": fakes_url, "SARVAM_API_KEY": "bench",
+        # Never resolved or contacted: the child swaps in FakeMongoClient at import
+        "MONGO_URI": "mongodb://127.0.0.1:1/?connect=false",
+        "TRANSLATION_CACHE_DB": os.path.join(RESULTS_DIR, ".bench-translation-cache.sqlite3"),
+    }
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    if os.path.exists(env["TRANSLATION_CACHE_DB"]):
+        os.remove(env["TRANSLATION_CACHE_DB"])
+
+    fakes = subprocess.Popen([sys.executable, "bench_fakes.py", "--port", str(fakes_port),
+                              "--groq-ttft-ms", str(args.groq_ttft_ms), "--groq-token-ms", str(args.groq_token_ms),
+                              "--groq-error-rate", str(args.groq_error_rate),
+                              "--sarvam-latency-ms", str(args.sarvam_latency_ms),
+                              "--sarvam-error-rate", str(args.sarvam_error_rate),
+                              "--jitter", str(args.jitter)], cwd=HERE, env=env)
+    api_log = open(os.path.join(RESULTS_DIR, "api.log"), "w", encoding="utf-8")
+    server = subprocess.Popen([sys.executable, "benchmark.py", "--serve-api", str(api_port),
+                               "--mongo-latency-ms", str(args.mongo_latency_ms),
+                               "--mongo-error-rate", str(args.mongo_error_rate), "--jitter", str(args.jitter)]
+                              + (["--answer-cache"] if args.answer_cache else []),
+                              cwd=HERE, env=env, stdout=api_log, stderr=subprocess.STDOUT)
+    try:
+        _wait_ready(f"{fakes_url}/stats", fakes, 30)
+        print(f"⏳ Waiting for the API (log: {api_log.name})...")
+        _wait_ready(f"{api_url}/health/ready", server, args.startup_timeout)
+
+        async def run_all():
+            counter = [0]
+            limits = httpx.Limits(max_connections=max(args.concurrency) + 4)
+            async with httpx.AsyncClient(base_url=api_url, timeout=120, limits=limits) as client:
+                levels = []
+                for c in args.concurrency:
+                    print(f"🏃 concurrency {c}: {args.requests} requests (+{args.warmup} warmup)...")
+                    lvl = await run_level(client, c, args.requests, args.warmup, args.language_code, counter)
+                    e2e = lvl["stages"]["end_to_end"]
+                    print(f"   {lvl['throughput_rps']:.2f} rps, p50 {e2e['p50']:.0f} ms, p95 {e2e['p95']:.0f} ms, "
+                          f"p99 {e2e['p99']:.0f} ms, {lvl['errors']} errors")
+                    levels.append(lvl)
+                health = (await client.get("/health")).json()
+            return levels, health
+
+        levels, health = asyncio.run(run_all())
+        fake_stats = httpx.get(f"{fakes_url}/stats").json()
+    finally:
+        server.terminate()
+        fakes.terminate()
+        server.wait(timeout=30)
+        fakes.wait(timeout=30)
+        api_log.close()
+
+    timestamp = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime())
+    result = {
+        "meta": {
+            "timestamp": timestamp, "git_sha": _git_sha(),
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "config": {k: v for k, v in vars(args).items() if k not in ("baseline", "serve_api")},
+            "env": {k: os.environ[k] for k in ("RAG_INDEX_BUNDLE", "VECTOR_BACKEND", "RAG_RETRIEVAL_MODE",
+                                               "CONTEXT_TOKEN_BUDGET") if k in os.environ},
+        },
+        "levels": levels,
+        "fakes": fake_stats,
+        "health": health,
+    }
+    out = args.output or os.path.join(RESULTS_DIR, f"{timestamp}-{result['meta']['git_sha']}.json")
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(result, f, indent=2)
+
+    print(f"\n{'stage':<17}" + "".join(f"{'c=' + str(l['concurrency']):>24}" for l in levels))
+    for stage in STAGES:
+        row = "".join(f"{'%.0f/%.0f/%.0f' % tuple(l['stages'][stage][p] for p in ('p50', 'p95', 'p99')):>24}"
+                      for l in levels)
+        print(f"{stage:<17}{row}")
+    print(f"(p50/p95/p99 ms)\n📄 Results → {out}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            if not compare(result, json.load(f), args.max_regression):
+                return 1
+    return 0
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Offline /ask benchmark with fake Groq, Sarvam and MongoDB.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=200, help="measured requests per level")
+    parser.add_argument("--warmup", type=int, default=20)
+    parser.add_argument("--language-code", default="hi-IN")
+    parser.add_argument("--groq-ttft-ms", type=float, default=150)
+    parser.add_argument("--groq-token-ms", type=float, default=4)
+    parser.add_argument("--groq-error-rate", type=float, default=0.0)
+    parser.add_argument("--sarvam-latency-ms", type=float, default=120)
+    parser.add_argument("--sarvam-error-rate", type=float, default=0.0)
+    parser.add_argument("--mongo-latency-ms", type=float, default=15)
+    parser.add_argument("--mongo-error-rate", type=float, default=0.0)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--answer-cache", action="store_true", help="keep the semantic answer cache enabled")
+    parser.add_argument("--startup-timeout", type=float, default=300)
+    parser.add_argument("--output", default=None)
+    parser.add_argument("--baseline", default=None, help="earlier results file to compare against")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="allowed p95 increase (fraction)")
+    parser.add_argument("--serve-api", type=int, default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve_api is not None:
+        serve_api(args.serve_api, args.mongo_latency_ms, args.mongo_error_rate, args.jitter, args.answer_cache)
+    else:
+        sys.exit(main(args))
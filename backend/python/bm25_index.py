@@ -0,0 +1,113 @@
+"""Lexical (BM25) index over the ingested chunks.
+
+Dense retrieval misses exact clinical terms — drug names, lab values,
+abbreviations — that a keyword index matches directly. ingest.py rebuilds
+this index next to the Chroma collection (`<persist_directory>/bm25.json.gz`)
+whenever the collection changes; the RAG service fuses its ranking with the
+vector ranking (see `reciprocal_rank_fusion`).
+"""
+import os
+import re
+import gzip
+import json
+import math
+from collections import Counter, defaultdict
+from typing import Dict, List, Tuple
+
+BM25_FILE = "bm25.json.gz"
+BM25_K1 = float(os.getenv("BM25_K1", "1.5"))
+BM25_B = float(os.getenv("BM25_B", "0.75"))
+
+# Alphanumeric runs, so drug/lab terms like "HbA1c", "MgSO4", "LMWH" and
+# doses like "300mg" stay single tokens.
+_TOKEN = re.compile(r"[a-z0-9]+")
+_STOPWORDS = frozenset("""
+a an the and or of to in on for with by at from as is are was were be been being it its this that
+these those there their they she her he his you your i my we our me do does did can could should
+would may might will shall not no if then than so such into about over after before during
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in _TOKEN.findall(text.lower()) if t not in _STOPWORDS and len(t) > 1]
+
+
+class BM25Index:
+    """In-process inverted index with Okapi BM25 scoring.
+
+    Postings are term -> [(doc_idx, term_freq), ...]; only documents sharing
+    at least one query term are ever scored.
+    """
+
+    def __init__(self, ids: List[str], texts: List[str], metadatas: List[dict],
+                 postings: Dict[str, List[Tuple[int, int]]], doc_lens: List[int]):
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.postings = postings
+        self.doc_lens = doc_lens
+        self.n_docs = len(ids)
+        self.avg_len = (sum(doc_lens) / self.n_docs) if self.n_docs else 0.0
+        self.idf = {
+            term: math.log(1 + (self.n_docs - len(p) + 0.5) / (len(p) + 0.5))
+            for term, p in postings.items()
+        }
+
+    @classmethod
+    def build(cls, ids: List[str], texts: List[str], metadatas: List[dict]) -> "BM25Index":
+        postings = defaultdict(list)
+        doc_lens = []
+        for idx, text in enumerate(texts):
+            tokens = tokenize(text)
+            doc_lens.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                postings[term].append((idx, tf))
+        return cls(ids, texts, metadatas, dict(postings), doc_lens)
+
+    @classmethod
+    def from_collection(cls, collection) -> "BM25Index":
+        data = collection.get(include=["documents", "metadatas"])
+        return cls.build(data["ids"], data["documents"], [m or {} for m in data["metadatas"]])
+
+    def search(self, query: str, k: int = 10) -> List[Tuple[int, float]]:
+        """Top-k (doc_idx, score) for `query`, best first."""
+        scores = defaultdict(float)
+        k1, b = BM25_K1, BM25_B
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if not postings:
+                continue
+            idf = self.idf[term]
+            for idx, tf in postings:
+                norm = k1 * (1 - b + b * self.doc_lens[idx] / self.avg_len)
+                scores[idx] += idf * tf * (k1 + 1) / (tf + norm)
+        return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)[:k]
+
+    # ─── Persistence ─────────────────────────────────────────────────────────
+    def save(self, directory: str):
+        path = os.path.join(directory, BM25_FILE)
+        tmp = path + ".tmp"
+        with gzip.open(tmp, "wt", encoding="utf-8") as f:
+            json.dump({"ids": self.ids, "texts": self.texts, "metadatas": self.metadatas,
+                       "postings": self.postings, "doc_lens": self.doc_lens}, f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, directory: str) -> "BM25Index":
+        with gzip.open(os.path.join(directory, BM25_FILE), "rt", encoding="utf-8") as f:
+            d = json.load(f)
+        postings = {t: [tuple(p) for p in plist] for t, plist in d["postings"].items()}
+        return cls(d["ids"], d["texts"], d["metadatas"], postings, d["doc_lens"])
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, BM25_FILE))
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse several best-first key lists: score(d) = sum 1 / (k + rank_i(d))."""
+    scores = defaultdict(float)
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] += 1.0 / (k + rank)
+    return sorted(scores.items(), key=lambda kv: kv[1], reverse=True)
@@ -0,0 +1,496 @@
+"""Local clinical extraction for a conversation turn, without an LLM call.
+
+`extract_clinical(transcript)` returns the same JSON shape the Groq
+extraction prompt in api.py asks for:
+
+    {"symptoms": [...], "medications": [...], "relief_noted": bool,
+     "relief_details": str, "fetal_movement": "Yes"|"No"|"Unknown",
+     "severity": 1-10, "summary": str}
+
+plus a confidence in [0, 1]. How it works:
+
+- A word-level Aho-Corasick automaton matches every surface form in the
+  lexicon (symptoms, medications, fetal movement) in one pass over the
+  tokens, so matches respect word boundaries and multi-word terms
+  ("blurred vision", "folic acid") cost no more than single words.
+- Each match is checked against its clause (split at punctuation and
+  "but"/"however"/...). A negation cue in the words before it ("no", "not",
+  "never", "without", ...) or a Hindi one after it ("nahi") drops the
+  symptom. A relief cue ("went away", "no longer", "better now", ...) that
+  is not itself negated ("has not stopped") keeps it and sets relief_noted;
+  a cue later in the sentence ("I had fever last week, it went away")
+  applies to the nearest clause before it that names a symptom. A symptom
+  placed in the past ("last week ... had", with no "now"/"still") does not
+  count towards severity.
+- Terms in a question ("Should I worry about spotting?", "What are the
+  signs of ...", "... kya") are not reported symptoms and are dropped; if
+  the question is about the speaker ("I", "my", "mujhe") the turn goes to
+  the LLM.
+- Severity is the weight of the worst symptom (red flags such as bleeding,
+  convulsions or reduced fetal movement score 8-10), raised by intensifiers
+  ("severe", "unbearable") and extra symptoms, lowered by "mild" or relief.
+  Fetal movement is "No" when its clause has a negation or a reducer
+  ("less", "stopped", "kam").
+- Confidence drops for complaint words the lexicon did not cover ("pain in
+  my ...", "problem"), hedges ("maybe", "not sure") and long turns, and
+  stays below the threshold when a red flag has a negation nearby or is
+  placed in the past, or a question about the speaker names a term. api.py
+  sends turns below CLINICAL_LLM_MIN_CONFIDENCE to the LLM when
+  CLINICAL_EXTRACTION=hybrid.
+
+Only the user's words are scanned: the assistant's answer lists symptoms
+to watch for, which are not symptoms the user has.
+"""
+import os
+import re
+from typing import Dict, List, Tuple
+
+# "local": lexicon extractor only; "hybrid": local, with the LLM for
+# low-confidence turns; "llm": always the LLM (the previous behaviour)
+CLINICAL_EXTRACTION = os.getenv("CLINICAL_EXTRACTION", "hybrid")
+CLINICAL_LLM_MIN_CONFIDENCE = float(os.getenv("CLINICAL_LLM_MIN_CONFIDENCE", "0.6"))
+
+# ─── Lexicon ─────────────────────────────────────────────────────────────────
+# canonical name: (severity weight 1-10, surface forms). Surface forms are
+# matched on normalized tokens (lowercase, apostrophes removed, plural "s"
+# stripped), so "headaches" and "head ache" need no separate entries.
+# Common romanized Hindi terms are included for turns that reach extraction
+# untranslated.
+SYMPTOMS: Dict[str, Tuple[int, Tuple[str, ...]]] = {
+    "vaginal bleeding": (9, ("bleeding", "blood from vagina", "vaginal bleeding", "spotting", "blood clot",
+                             "bleed", "khoon", "khoon aana")),
+    "bleeding gums": (2, ("bleeding gums", "gum bleeding", "gums bleeding", "bleeding from gums")),
+    "convulsions": (10, ("convulsion", "seizure", "jhatke", "daura")),
+    "leaking fluid": (8, ("leaking fluid", "water broke", "water breaking", "fluid leaking", "leaking water",
+                          "water leaking", "pani aana", "pani nikalna")),
+    "blurred vision": (8, ("blurred vision", "blurry vision", "vision problem", "spots in front of eyes",
+                           "seeing spots", "dhundhla")),
+    "severe abdominal pain": (8, ("severe abdominal pain", "severe stomach pain", "severe pain in stomach",
+                                  "unbearable stomach pain")),
+    "breathlessness": (7, ("breathlessness", "shortness of breath", "difficulty breathing", "cant breathe",
+                           "breathing problem", "saans phoolna", "saans lene mein taklif")),
+    "chest pain": (7, ("chest pain", "pain in chest", "seene mein dard")),
+    "fever": (6, ("fever", "high temperature", "bukhar", "bukhaar")),
+    "contractions": (6, ("contraction", "labour pain", "labor pain")),
+    "burning urination": (5, ("burning urination", "burning while urinating", "pain while urinating",
+                              "burning when i pee", "peshab mein jalan")),
+    "swelling": (5, ("swelling", "swollen", "puffy", "edema", "oedema", "sujan", "soojan")),
+    "headache": (4, ("headache", "head ache", "head pain", "pain in head", "migraine", "sar dard",
+                     "sir dard", "sar mein dard", "sir mein dard")),
+    "dizziness": (4, ("dizzy", "dizziness", "lightheaded", "light headed", "giddy", "giddiness", "faint",
+                      "fainting", "chakkar")),
+    "vomiting": (4, ("vomiting", "vomit", "throwing up", "threw up", "ulti", "ultiyan")),
+    "abdominal pain": (4, ("abdominal pain", "stomach pain", "stomach ache", "pain in stomach",
+                           "pain in abdomen", "tummy pain", "lower abdominal pain", "pet dard",
+                           "pet mein dard")),
+    "cramps": (3, ("cramp", "cramping")),
+    "nausea": (3, ("nausea", "nauseous", "morning sickness", "feel like vomiting", "ji machalna")),
+    "back pain": (3, ("back pain", "backache", "back ache", "pain in back", "pain in lower back",
+                      "kamar dard", "kamar mein dard")),
+    "itching": (3, ("itching", "itchy", "khujli")),
+    "vaginal discharge": (3, ("discharge", "white discharge", "vaginal discharge", "safed pani")),
+    "loss of appetite": (3, ("loss of appetite", "no appetite", "not hungry", "bhookh nahi")),
+    "insomnia": (2, ("insomnia", "cant sleep", "cannot sleep", "trouble sleeping", "not sleeping",
+                     "neend nahi")),
+    "fatigue": (2, ("fatigue", "tired", "tiredness", "weakness", "weak", "exhausted", "low energy",
+                    "thakan", "thakaan", "kamzori")),
+    "heartburn": (2, ("heartburn", "acidity", "acid reflux", "burning in chest", "indigestion", "jalan")),
+    "constipation": (2, ("constipation", "constipated", "kabz", "kabj")),
+    "leg cramps": (2, ("leg cramp", "cramp in leg", "cramp in my leg", "pair mein dard")),
+    "frequent urination": (1, ("frequent urination", "urinating often", "peeing often", "baar baar peshab")),
+    "mood swings": (2, ("mood swing", "anxiety", "anxious", "sad", "crying", "depressed", "stress",
+                        "stressed", "tension")),
+}
+
+MEDICATIONS: Dict[str, Tuple[str, ...]] = {
+    "iron supplement": ("iron tablet", "iron supplement", "iron pill", "ferrous", "ferrous sulphate",
+                        "ferrous sulfate", "iron sucrose", "livogen", "autrin"),
+    "folic acid": ("folic acid", "folate", "folvite"),
+    "calcium supplement": ("calcium tablet", "calcium supplement", "shelcal", "calcimax"),
+    "vitamin d": ("vitamin d", "vitamin d3"),
+    "vitamin b12": ("vitamin b12", "b12"),
+    "multivitamin": ("multivitamin", "prenatal vitamin", "pregnacare"),
+    "paracetamol": ("paracetamol", "acetaminophen", "crocin", "dolo", "calpol", "tylenol"),
+    "antacid": ("antacid", "digene", "gelusil", "eno", "rantac", "ranitidine", "pantoprazole", "pan 40"),
+    "ors": ("ors", "oral rehydration", "electral"),
+    "anti-nausea medicine": ("ondansetron", "emeset", "doxinate", "doxylamine"),
+    "progesterone": ("progesterone", "duphaston", "susten"),
+    "thyroid medicine": ("thyroxine", "levothyroxine", "eltroxin", "thyronorm"),
+    "blood pressure medicine": ("labetalol", "nifedipine", "methyldopa", "bp medicine", "bp tablet"),
+    "insulin": ("insulin",),
+    "metformin": ("metformin",),
+    "aspirin": ("aspirin", "ecosprin"),
+    "tetanus injection": ("tetanus", "tt injection", "tetanus injection"),
+    "antibiotic": ("antibiotic", "amoxicillin", "azithromycin", "cephalexin"),
+    "cough syrup": ("cough syrup",),
+}
+
+FETAL_MOVEMENT = ("baby moving", "baby move", "baby is moving", "baby not moving", "baby is not moving",
+                  "baby stopped moving", "baby has stopped moving", "baby kick", "baby kicking",
+                  "feel the baby", "feel baby",
+                  "feel my baby", "baby movement", "fetal movement", "foetal movement", "movement of baby",
+                  "movement of the baby", "kick", "kicking", "bachcha hil", "baccha hil", "hil raha", "hil rahi",
+                  "hilna", "hilta", "hilti", "harkat")
+
+_NEGATIONS = frozenset("no not never without denies deny neither nor none nothing dont doesnt didnt isnt "
+                       "arent wasnt werent havent hasnt hadnt cant cannot".split())
+_POST_NEGATIONS = frozenset("nahi nahin nhi".split())
+_POST_NEGATION_WINDOW = 3
+_FETAL_REDUCED = frozenset("less reduced decreased fewer stopped lesser slow slower kam kamm band".split())
+_RELIEF_AFTER = ("went away", "gone", "is better", "got better", "feel better", "feeling better", "better now",
+                 "reduced", "stopped", "subsided", "relieved", "cured", "improved", "eased", "helped",
+                 "anymore", "thik", "theek", "recovered", "resolved", "cleared", "fine now", "okay now",
+                 "ok now", "normal now")
+_RELIEF_BEFORE = ("no longer", "relief from", "relieved from", "not anymore", "no more")
+_INTENSIFIERS = frozenset("severe very extreme extremely unbearable heavy terrible constant continuous worst "
+                          "sharp bad intense bahut zyada".split())
+_MITIGATORS = frozenset("mild slight slightly little bit minor occasional thoda".split())
+_HEDGES = ("maybe", "might be", "not sure", "i think", "i guess", "probably", "perhaps")
+# Complaint words: one with no lexicon match nearby means the lexicon missed something
+_COMPLAINTS = frozenset("pain hurt hurts hurting ache aching sore problem issue trouble uncomfortable "
+                        "discomfort unwell sick ill dard taklif".split())
+# A complaint word this close to a lexicon match is taken to be part of it
+_COMPLAINT_REACH = 3
+_CLAUSE_BREAKS = frozenset(". , ; ! ? but however although though except lekin magar par".split())
+_SENTENCE_BREAKS = frozenset(". ; ! ?".split())
+# A clause opening with one of these is a question
+_WH_WORDS = frozenset("what why how which who whom whose should shall".split())
+# ... and with one of these when a subject follows ("is it", "can i") or the sentence ends in "?"
+_AUXILIARIES = frozenset("is are am was were do does did can could will would may might".split())
+_SUBJECTS = frozenset("i it this that there these those my the a an she he we you baby".split())
+_QUESTION_PARTICLES = frozenset("kya kyaa kyun kyon kaise".split())
+# A question with one of these is about the speaker
+_SELF = frozenset("i me my mine im ive mujhe mujhko mera meri mere".split())
+_PAST_TIMES = ("last week", "last month", "last night", "last time", "yesterday", "earlier", "days ago",
+               "weeks ago", "months ago", "pehle", "pichle hafte")
+_PAST_VERBS = frozenset("had was were tha thi".split())
+_PRESENT = frozenset("now still today currently again since abhi ab".split())
+_NEGATION_WINDOW = 5
+# Symptoms at or above this weight are red flags: a negation near one sends
+# the turn to the LLM (hybrid mode) rather than trusting the local reading
+_RED_FLAG_WEIGHT = 7
+RED_FLAGS = frozenset([name for name, (weight, _) in SYMPTOMS.items() if weight >= _RED_FLAG_WEIGHT]
+                      + ["fetal movement"])
+_LONG_TURN_WORDS = 80
+
+
+# ─── Multi-pattern matcher ───────────────────────────────────────────────────
+def _stem(token: str) -> str:
+    if len(token) > 4 and token.endswith("s") and not token.endswith("ss"):
+        return token[:-1]
+    return token
+
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens with apostrophes removed and clause punctuation
+    kept as separate tokens, so patterns never match across a clause."""
+    text = text.lower().replace("'", "").replace("’", "")
+    return [_stem(t) for t in re.findall(r"[a-z0-9]+|[.,;!?]", text)]
+
+
+class AhoCorasick:
+    """Word-level Aho-Corasick automaton: finds every occurrence of every
+    pattern (a token sequence) in one left-to-right pass over the text."""
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[List[Tuple[int, object]]] = [[]]   # (pattern length, payload)
+
+    def add(self, tokens: List[str], payload):
+        node = 0
+        for tok in tokens:
+            nxt = self._goto[node].get(tok)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto[node][tok] = nxt
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append([])
+            node = nxt
+        self._out[node].append((len(tokens), payload))
+
+    def build(self) -> "AhoCorasick":
+        queue = list(self._goto[0].values())
+        for node in queue:                 # breadth-first: parents before children
+            for tok, child in self._goto[node].items():
+                queue.append(child)
+                f = self._fail[node]
+                while f and tok not in self._goto[f]:
+                    f = self._fail[f]
+                target = self._goto[f].get(tok, 0)
+                self._fail[child] = target if target != child else 0
+                self._out[child] = self._out[child] + self._out[self._fail[child]]
+        return self
+
+    def finditer(self, tokens: List[str]):
+        """Yield (start, end, payload) for every match; `end` is exclusive."""
+        node = 0
+        for i, tok in enumerate(tokens):
+            while node and tok not in self._goto[node]:
+                node = self._fail[node]
+            node = self._goto[node].get(tok, 0)
+            for length, payload in self._out[node]:
+                yield i + 1 - length, i + 1, payload
+
+
+def _build_matcher() -> AhoCorasick:
+    matcher = AhoCorasick()
+    for name, (_, forms) in SYMPTOMS.items():
+        for form in forms:
+            matcher.add(tokenize(form), ("symptom", name))
+    for name, forms in MEDICATIONS.items():
+        for form in forms:
+            matcher.add(tokenize(form), ("medication", name))
+    for form in FETAL_MOVEMENT:
+        matcher.add(tokenize(form), ("fetal", "movement"))
+    return matcher.build()
+
+
+_MATCHER = _build_matcher()
+_PHRASES = AhoCorasick()
+for _form in _RELIEF_AFTER:
+    _PHRASES.add(tokenize(_form), "relief_after")
+for _form in _RELIEF_BEFORE:
+    _PHRASES.add(tokenize(_form), "relief_before")
+for _form in _HEDGES:
+    _PHRASES.add(tokenize(_form), "hedge")
+for _form in _PAST_TIMES:
+    _PHRASES.add(tokenize(_form), "past")
+_PHRASES.build()
+
+
+# ─── Extraction ──────────────────────────────────────────────────────────────
+def _clauses(tokens: List[str]) -> List[int]:
+    """Clause index of every token."""
+    ids, current = [], 0
+    for tok in tokens:
+        if tok in _CLAUSE_BREAKS:
+            current += 1
+        ids.append(current)
+    return ids
+
+
+def _sentences(tokens: List[str]) -> List[int]:
+    """Sentence index of every token."""
+    ids, current = [], 0
+    for tok in tokens:
+        ids.append(current)
+        if tok in _SENTENCE_BREAKS:
+            current += 1
+    return ids
+
+
+def _question_clauses(tokens: List[str], clause: List[int], sentence: List[int]) -> set:
+    """Clause indices that ask rather than report."""
+    first: Dict[int, int] = {}
+    for i, tok in enumerate(tokens):
+        if tok not in _CLAUSE_BREAKS:
+            first.setdefault(clause[i], i)
+    asks = {s for i, s in enumerate(sentence) if tokens[i] == "?"}
+    questions, led = set(), set()
+    for c, i in first.items():
+        nxt = tokens[i + 1] if i + 1 < len(tokens) else ""
+        if (tokens[i] in _WH_WORDS
+                or (tokens[i] in _AUXILIARIES and (nxt in _SUBJECTS or sentence[i] in asks))):
+            questions.add(c)
+            led.add(sentence[i])
+    for i, tok in enumerate(tokens):
+        if tok in _QUESTION_PARTICLES:
+            questions.add(clause[i])
+        elif sentence[i] in asks and sentence[i] not in led:
+            questions.add(clause[i])       # "Spotting is normal?"
+    return questions
+
+
+def _longest_matches(matches: list) -> list:
+    """Drop matches contained in a longer one ("stomach pain" inside "severe
+    stomach pain", "cramp" inside "leg cramp")."""
+    matches = sorted(matches, key=lambda m: (m[0], -(m[1] - m[0])))
+    kept, covered_until = [], -1
+    for start, end, payload in matches:
+        if end <= covered_until:
+            continue
+        kept.append((start, end, payload))
+        covered_until = max(covered_until, end)
+    return kept
+
+
+def _join(items: List[str]) -> str:
+    return items[0] if len(items) == 1 else ", ".join(items[:-1]) + " and " + items[-1]
+
+
+def _negation_near(tokens: List[str], clause: List[int], start: int, end: int) -> bool:
+    """A negation cue in the words before tokens[start:end], or a Hindi one
+    ("bukhar nahi hai") just after it, within the same clause."""
+    before = range(max(0, start - _NEGATION_WINDOW), start)
+    after = range(end, min(len(tokens), end + _POST_NEGATION_WINDOW))
+    return (any(tokens[j] in _NEGATIONS for j in before if clause[j] == clause[start])
+            or any(tokens[j] in _POST_NEGATIONS for j in after if clause[j] == clause[start]))
+
+
+def negated(tokens: List[str], start: int, end: int) -> bool:
+    """Whether tokens[start:end] (from `tokenize`) is negated in its clause."""
+    return _negation_near(tokens, _clauses(tokens), start, end)
+
+
+def find_terms(tokens: List[str]) -> List[Tuple[int, int, str, bool]]:
+    """(start, end, canonical English name, negated) of every lexicon term
+    in `tokens` (from `tokenize`), longest match wins. Relief cues are not
+    considered; fetal movement counts as negated when its clause has a
+    negation or a reducer ("kam")."""
+    clause = _clauses(tokens)
+    terms = []
+    for start, end, (kind, name) in _longest_matches(list(_MATCHER.finditer(tokens))):
+        if kind == "fetal":
+            clause_tokens = [t for t, c in zip(tokens, clause) if c == clause[start]]
+            terms.append((start, end, "fetal movement", any(
+                t in _NEGATIONS or t in _POST_NEGATIONS or t in _FETAL_REDUCED for t in clause_tokens)))
+        else:
+            terms.append((start, end, name, _negation_near(tokens, clause, start, end)))
+    return terms
+
+
+def extract_clinical(transcript: str) -> Tuple[dict, float]:
+    """Return (clinical data in the LLM extraction's JSON shape, confidence)."""
+    tokens = tokenize(transcript or "")
+    clause = _clauses(tokens)
+    sentence = _sentences(tokens)
+    phrases = list(_PHRASES.finditer(tokens))
+    matches = _longest_matches(list(_MATCHER.finditer(tokens)))
+    questions = _question_clauses(tokens, clause, sentence)
+    term_clauses = {clause[s] for s, _, _ in matches}
+
+    def in_clause(i: int, lo: int, hi: int, kinds: str) -> bool:
+        return any(p == kinds and lo <= s and e <= hi and clause[s] == clause[i] for s, e, p in phrases)
+
+    def relieved_after(start: int, end: int) -> bool:
+        """A relief cue later in the sentence that is not itself negated ("the
+        bleeding has not stopped", "dard theek nahi hua"). A cue in a later
+        clause ("..., it went away") refers to the nearest clause before it
+        that names a term."""
+        for s, e, p in phrases:
+            if p != "relief_after" or s < end or sentence[s] != sentence[start]:
+                continue
+            target = max(c for c in term_clauses if c <= clause[s] and
+                         any(clause[ms] == c and ms < s for ms, _, _ in matches))
+            if target != clause[start]:
+                continue
+            between = [tokens[j] for j in range(end, s) if clause[j] == clause[s]]
+            after = [tokens[j] for j in range(e, min(len(tokens), e + _POST_NEGATION_WINDOW))
+                     if clause[j] == clause[s]]
+            if not any(t in _NEGATIONS for t in between) and not any(t in _POST_NEGATIONS for t in after):
+                return True
+        return False
+
+    def in_past(i: int) -> bool:
+        """The sentence places it earlier ("last week ... had") and nothing says it goes on."""
+        words = [t for t, n in zip(tokens, sentence) if n == sentence[i]]
+        return (any(p == "past" and sentence[s] == sentence[i] for s, _, p in phrases)
+                and any(t in _PAST_VERBS for t in words) and not any(t in _PRESENT for t in words))
+
+    symptoms: Dict[str, dict] = {}
+    medications: List[str] = []
+    relieved: List[str] = []
+    past: List[str] = []
+    fetal = "Unknown"
+    negated_red_flag = False
+    # A term in a question about the speaker ("Should I worry about spotting?")
+    # may still be something she has: the LLM decides
+    asked_about_self = False
+
+    for start, end, (kind, name) in matches:
+        clause_tokens = [tokens[j] for j in range(len(tokens)) if clause[j] == clause[start]]
+        if clause[start] in questions:
+            asked_about_self = asked_about_self or any(t in _SELF for t in clause_tokens)
+            continue
+        relief = (relieved_after(start, end)
+                  or in_clause(start, max(0, start - _NEGATION_WINDOW), start, "relief_before"))
+        is_negated = not relief and _negation_near(tokens, clause, start, end)
+
+        if kind == "fetal":
+            negation_near = any(t in _NEGATIONS or t in _POST_NEGATIONS for t in clause_tokens)
+            reduced = negation_near or any(t in _FETAL_REDUCED for t in clause_tokens)
+            fetal = "No" if reduced else ("Yes" if fetal == "Unknown" else fetal)
+            negated_red_flag = negated_red_flag or negation_near
+            continue
+        if kind == "medication":
+            if not is_negated and name not in medications:
+                medications.append(name)
+            continue
+
+        if SYMPTOMS[name][0] >= _RED_FLAG_WEIGHT:
+            window = range(max(0, start - _NEGATION_WINDOW), min(len(tokens), end + _NEGATION_WINDOW))
+            negated_red_flag = negated_red_flag or any(
+                clause[j] == clause[start] and (tokens[j] in _NEGATIONS or tokens[j] in _POST_NEGATIONS)
+                for j in window)
+        if is_negated:
+            continue
+        entry = symptoms.setdefault(name, {"weight": SYMPTOMS[name][0], "intensity": 0, "relieved": False})
+        if not relief and in_past(start):
+            if SYMPTOMS[name][0] >= _RED_FLAG_WEIGHT:
+                negated_red_flag = True        # an earlier red flag may still matter: the LLM decides
+            else:
+                entry["relieved"] = True
+                if name not in past:
+                    past.append(name)
+        if any(t in _INTENSIFIERS for t in clause_tokens):
+            entry["intensity"] = max(entry["intensity"], 1)
+        elif any(t in _MITIGATORS for t in clause_tokens) and entry["intensity"] == 0:
+            entry["intensity"] = -1
+        if relief:
+            entry["relieved"] = True
+            if name not in relieved:
+                relieved.append(name)
+
+    # Severity: worst active symptom, adjusted; 1 when nothing is reported
+    severity = 1
+    active = {n: e for n, e in symptoms.items() if not e["relieved"]}
+    if active:
+        worst = max(active.values(), key=lambda e: e["weight"] + e["intensity"])
+        severity = worst["weight"] + worst["intensity"] + min(2, (len(active) - 1) // 2)
+    elif symptoms:
+        severity = max(1, max(e["weight"] for e in symptoms.values()) - 2)
+    if fetal == "No":
+        severity = max(severity, 9)
+    severity = max(1, min(10, severity))
+
+    # Confidence: lexicon gaps, hedges and long turns lower it
+    confidence = 1.0
+    uncovered = [i for i, t in enumerate(tokens) if t in _COMPLAINTS and not any(
+        clause[s] == clause[i] and s - _COMPLAINT_REACH <= i < e + _COMPLAINT_REACH for s, e, _ in matches)]
+    confidence -= 0.45 * len(uncovered)
+    if any(p == "hedge" for _, _, p in phrases):
+        confidence -= 0.2
+    if sum(t not in _CLAUSE_BREAKS for t in tokens) > _LONG_TURN_WORDS:
+        confidence -= 0.25
+    if negated_red_flag or asked_about_self:
+        # Misreading a negated red flag either way is costly: let the LLM decide
+        confidence = min(confidence, CLINICAL_LLM_MIN_CONFIDENCE - 0.1)
+    confidence = round(max(0.0, confidence), 2)
+
+    # Summary: one sentence
+    parts = []
+    if active:
+        parts.append("reports " + _join(list(active)))
+    if relieved:
+        parts.append("notes relief from " + _join(relieved))
+    if past:
+        parts.append("mentions earlier " + _join(past))
+    if medications:
+        parts.append("is taking " + _join(medications))
+    if fetal == "No":
+        parts.append("reports reduced or absent fetal movement")
+    elif fetal == "Yes":
+        parts.append("reports fetal movement")
+    summary = ("Patient " + "; ".join(parts) + ".") if parts else "General query; no symptoms reported."
+
+    return {
+        "symptoms": list(symptoms),
+        "medications": medications,
+        "relief_noted": bool(relieved),
+        "relief_details": ("Relief from " + _join(relieved)) if relieved else "",
+        "fetal_movement": fetal,
+        "severity": severity,
+        "summary": summary,
+    }, confidence
@@ -0,0 +1,106 @@
+"""Token-budgeted context assembly for the RAG prompt.
+
+Retrieved chunks overlap (fixed windows share 100 characters; neighbouring
+structured chunks often repeat a sentence) and most of their sentences are
+irrelevant to the question. `build_context` merges adjacent chunks of the
+same source, drops duplicate sentences, ranks the rest by relevance to the
+query and keeps only as many as fit in CONTEXT_TOKEN_BUDGET, preserving
+document order so the prompt still reads as prose.
+"""
+import os
+import math
+from typing import List, Tuple
+
+from bm25_index import tokenize
+from llm_scheduler import estimate_tokens
+from text_chunker import split_sentences
+
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "700"))
+# Relevance bonus for sentences from higher-ranked chunks (rank 0 gets all of it)
+_RANK_PRIOR = 0.5
+_MAX_OVERLAP = 300
+
+
+def _overlap(a: str, b: str) -> int:
+    """Length of the longest suffix of `a` that is a prefix of `b`."""
+    for n in range(min(len(a), len(b), _MAX_OVERLAP), 0, -1):
+        if a.endswith(b[:n]):
+            return n
+    return 0
+
+
+def merge_passages(docs: list) -> List[Tuple[int, str]]:
+    """Merge chunks that are adjacent in the same source into one passage.
+
+    Returns (best_rank, text) pairs in retrieval order, where best_rank is
+    the highest retrieval rank among the merged chunks.
+    """
+    keyed = []
+    for rank, d in enumerate(docs):
+        meta = d.metadata or {}
+        keyed.append((meta.get("source"), meta.get("chunk"), rank, d.page_content))
+
+    passages = []   # [source, last_chunk, best_rank, text]
+    for source, chunk, rank, text in sorted(keyed, key=lambda k: (str(k[0]), k[1] if k[1] is not None else -1)):
+        last = passages[-1] if passages else None
+        if (last and source is not None and chunk is not None and last[0] == source
+                and last[1] is not None and chunk - last[1] <= 1):
+            if chunk != last[1]:
+                n = _overlap(last[3], text)
+                last[3] += text[n:] if n else " " + text
+            last[1], last[2] = chunk, min(last[2], rank)
+        else:
+            passages.append([source, chunk, rank, text])
+    return sorted(((p[2], p[3]) for p in passages), key=lambda p: p[0])
+
+
+def build_context(query: str, docs: list, token_budget: int = CONTEXT_TOKEN_BUDGET) -> Tuple[str, dict]:
+    """Return (context, stats) for `docs` (best first) under `token_budget`.
+
+    stats: raw_tokens (naive join of all chunks), context_tokens,
+    tokens_saved, sentences kept / total.
+    """
+    raw_tokens = estimate_tokens("\n\n".join(d.page_content for d in docs)) if docs else 0
+    passages = merge_passages(docs)
+
+    query_terms = set(tokenize(query))
+    seen, sentences = set(), []    # (passage_idx, position, score, tokens, text)
+    for p_idx, (rank, text) in enumerate(passages):
+        prior = _RANK_PRIOR / (1 + rank)
+        for pos, sentence in enumerate(split_sentences(text)):
+            key = " ".join(sentence.lower().split())
+            if key in seen:
+                continue
+            seen.add(key)
+            terms = tokenize(sentence)
+            hits = len(query_terms.intersection(terms))
+            score = hits / math.sqrt(len(terms) or 1) + prior
+            sentences.append((p_idx, pos, score, estimate_tokens(sentence), sentence))
+
+    kept, used = [], 0
+    for s in sorted(sentences, key=lambda s: s[2], reverse=True):
+        if used + s[3] > token_budget and kept:
+            continue
+        kept.append(s)
+        used += s[3]
+
+    kept.sort(key=lambda s: (s[0], s[1]))
+    blocks, current, current_idx = [], [], None
+    for p_idx, _, _, _, sentence in kept:
+        if p_idx != current_idx and current:
+            blocks.append(" ".join(current))
+            current = []
+        current_idx = p_idx
+        current.append(sentence)
+    if current:
+        blocks.append(" ".join(current))
+
+    context = "\n\n".join(blocks)
+    context_tokens = estimate_tokens(context) if context else 0
+    return context, {
+        "raw_tokens": raw_tokens,
+        "context_tokens": context_tokens,
+        "tokens_saved": max(0, raw_tokens - context_tokens),
+        "sentences_kept": len(kept),
+        "sentences_total": len(sentences),
+    }
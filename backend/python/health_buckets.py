@@ -0,0 +1,217 @@
+"""Time-bucketed health-log storage.
+
+Instead of `$push`ing every interaction into one ever-growing `history` array
+on the user's `healthlogs` document, interactions go into per-user, per-day
+bucket documents in `healthlogbuckets`:
+
+    {
+      user_key: "phone:+9198...",     # or "email:..."
+      day: "2026-10-17",              # UTC day
+      count: 3,                       # interactions in this bucket
+      first_ts: ISODate, last_ts: ISODate,
+      interactions: [ {...}, ... ],
+      migrated: true                  # only on buckets written by the migration
+    }
+
+A bucket holds at most HEALTHLOG_BUCKET_SIZE interactions; a busy day simply
+rolls over into a second bucket. The `healthlogs` document keeps the user's
+identity, `summaries` and timestamps, so its size stays constant.
+
+Run `python health_buckets.py --migrate` to move existing `history` arrays
+into buckets (idempotent; add `--drop-legacy` to `$unset` them afterwards).
+Migrated buckets are owned by the migration: live writes never append to
+them, so re-running it cannot overwrite live interactions.
+"""
+import os
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from pymongo import ASCENDING, UpdateOne
+
+# ─── Configuration ───────────────────────────────────────────────────────────
+BUCKET_COLLECTION = os.getenv("HEALTHLOG_BUCKET_COLLECTION", "healthlogbuckets")
+HEALTHLOG_BUCKET_SIZE = int(os.getenv("HEALTHLOG_BUCKET_SIZE", "200"))
+
+
+def user_key_for(filter_query: dict) -> str:
+    """Stable bucket key from a `healthlogs` filter ({phone_number} or {user_email})."""
+    if filter_query.get("phone_number"):
+        return f"phone:{filter_query['phone_number']}"
+    if filter_query.get("user_email"):
+        return f"email:{filter_query['user_email']}"
+    return "phone:anonymous"
+
+
+def day_of(ts: datetime) -> str:
+    return ts.strftime("%Y-%m-%d")
+
+
+async def ensure_indexes(db):
+    buckets = db[BUCKET_COLLECTION]
+    await buckets.create_index([("user_key", ASCENDING), ("day", ASCENDING)])
+    await buckets.create_index([("user_key", ASCENDING), ("last_ts", ASCENDING), ("first_ts", ASCENDING)])
+    await buckets.create_index([("last_ts", ASCENDING)])
+
+
+def bucket_write_ops(filter_query: dict, items: list, set_on_insert: dict, now: datetime):
+    """Build the bulk-write ops for appending `items` for one user.
+
+    Returns (bucket_collection_ops, healthlogs_ops). Items are grouped by UTC
+    day so a batch that straddles midnight lands in the right buckets.
+    """
+    key = user_key_for(filter_query)
+    by_day = defaultdict(list)
+    for item in items:
+        by_day[day_of(item.get("timestamp") or now)].append(item)
+
+    bucket_ops = []
+    for day, day_items in by_day.items():
+        stamps = [i.get("timestamp") or now for i in day_items]
+        bucket_ops.append(UpdateOne(
+            # Soft cap: a bucket with room is reused, otherwise upsert starts a new one.
+            # Migrated buckets are rewritten by migrate_legacy, so never append to them.
+            {"user_key": key, "day": day, "migrated": {"$ne": True}, "count": {"$lt": HEALTHLOG_BUCKET_SIZE}},
+            {
+                "$push": {"interactions": {"$each": day_items}},
+                "$inc": {"count": len(day_items)},
+                "$min": {"first_ts": min(stamps)},
+                "$max": {"last_ts": max(stamps)},
+            },
+            upsert=True,
+        ))
+
+    parent_op = UpdateOne(
+        filter_query,
+        {
+            "$set": {"updated_at": now},
+            "$inc": {"interaction_count": len(items)},
+            "$setOnInsert": {**set_on_insert, "created_at": now},
+        },
+        upsert=True,
+    )
+    return bucket_ops, [parent_op]
+
+
+async def fetch_interactions(db, filter_query: dict, start: datetime = None, end: datetime = None) -> list:
+    """Interactions for one user in [start, end], oldest first.
+
+    Only buckets overlapping the window are read, so cost is proportional to
+    the range rather than to the user's whole history.
+    """
+    query = {"user_key": user_key_for(filter_query)}
+    if end is not None:
+        query["first_ts"] = {"$lte": end}
+    if start is not None:
+        query["last_ts"] = {"$gte": start}
+
+    out = []
+    async for bucket in db[BUCKET_COLLECTION].find(query, {"interactions": 1}).sort("first_ts", ASCENDING):
+        for item in bucket.get("interactions", []):
+            ts = item.get("timestamp")
+            if ts is None or ((start is None or ts >= start) and (end is None or ts <= end)):
+                out.append(item)
+    out.sort(key=lambda i: i.get("timestamp") or datetime.min)
+    return out
+
+
+async def fetch_recent(db, filter_query: dict, days: int = 7) -> list:
+    return await fetch_interactions(db, filter_query, start=datetime.utcnow() - timedelta(days=days))
+
+
+# ─── Migration: healthlogs.history → healthlogbuckets ───────────────────────
+async def migrate_legacy(db, drop_legacy: bool = False, dry_run: bool = False) -> dict:
+    """Copy every `healthlogs.history` array into day buckets.
+
+    Bucket `_id`s are deterministic ("<user_key>|<day>|m<n>") and written with
+    upsert + $set, so re-running after a crash never duplicates interactions.
+    They are marked `migrated`, which keeps live writes out of them (see
+    bucket_write_ops). `interaction_count` is raised by the interactions not
+    migrated before (`migrated_interactions`), keeping the live increments.
+    """
+    logs = db["healthlogs"]
+    buckets = db[BUCKET_COLLECTION]
+    stats = {"users": 0, "interactions": 0, "buckets": 0, "dropped": 0}
+
+    cursor = logs.find({"history.0": {"$exists": True}},
+                       {"phone_number": 1, "user_email": 1, "history": 1, "migrated_interactions": 1})
+    async for doc in cursor:
+        filter_query = ({"phone_number": doc["phone_number"]} if doc.get("phone_number")
+                        else {"user_email": doc.get("user_email", "")})
+        key = user_key_for(filter_query)
+        by_day = defaultdict(list)
+        for item in doc.get("history", []):
+            ts = item.get("timestamp") or doc["_id"].generation_time.replace(tzinfo=None)
+            by_day[day_of(ts)].append(item)
+
+        chunks = {}
+        for day, items in sorted(by_day.items()):
+            for n in range(0, len(items), HEALTHLOG_BUCKET_SIZE):
+                chunks[f"{key}|{day}|m{n // HEALTHLOG_BUCKET_SIZE}"] = (day, items[n:n + HEALTHLOG_BUCKET_SIZE])
+
+        migrated = len(doc.get("history", []))
+        stats["users"] += 1
+        stats["interactions"] += migrated
+        stats["buckets"] += len(chunks)
+        if dry_run:
+            continue
+        # Buckets from runs before the `migrated` mark may have live appends since:
+        # mark them but keep their contents. Such a run also $set interaction_count.
+        unmarked = {b["_id"] async for b in buckets.find(
+            {"_id": {"$in": list(chunks)}, "migrated": {"$exists": False}}, {"_id": 1})}
+        before = doc.get("migrated_interactions", migrated if unmarked else 0)
+        ops = []
+        for bucket_id, (day, chunk) in chunks.items():
+            if bucket_id in unmarked:
+                ops.append(UpdateOne({"_id": bucket_id}, {"$set": {"migrated": True}}))
+                continue
+            stamps = [i.get("timestamp") for i in chunk if i.get("timestamp")]
+            ops.append(UpdateOne(
+                {"_id": bucket_id},
+                {"$set": {
+                    "user_key": key, "day": day, "count": len(chunk),
+                    "first_ts": min(stamps) if stamps else None,
+                    "last_ts": max(stamps) if stamps else None,
+                    "interactions": chunk, "migrated": True,
+                }},
+                upsert=True,
+            ))
+        if ops:
+            await buckets.bulk_write(ops, ordered=False)
+        update = {"$inc": {"interaction_count": migrated - before},
+                  "$set": {"migrated_interactions": migrated}}
+        if drop_legacy:
+            update["$unset"] = {"history": ""}
+            stats["dropped"] += 1
+        await logs.update_one({"_id": doc["_id"]}, update)
+        print(f"📦 Migrated {key}: {len(doc.get('history', []))} interactions → {len(ops)} buckets")
+
+    if not dry_run:
+        await ensure_indexes(db)
+    return stats
+
+
+if __name__ == "__main__":
+    import argparse
+    import asyncio
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    parser = argparse.ArgumentParser(description="Migrate healthlogs.history arrays into day buckets.")
+    parser.add_argument("--migrate", action="store_true", help="run the migration")
+    parser.add_argument("--drop-legacy", action="store_true", help="$unset history after copying")
+    parser.add_argument("--dry-run", action="store_true", help="count only, write nothing")
+    args = parser.parse_args()
+
+    from dotenv import load_dotenv
+    load_dotenv(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", ".env"))
+
+    async def _main():
+        client = AsyncIOMotorClient(os.environ["MONGO_URI"])
+        db = client.get_default_database("test")
+        if args.migrate or args.dry_run:
+            print(await migrate_legacy(db, drop_legacy=args.drop_legacy, dry_run=args.dry_run))
+        else:
+            await ensure_indexes(db)
+            print("✅ Bucket indexes ensured")
+        client.close()
+
+    asyncio.run(_main())
@@ -0,0 +1,139 @@
+"""Hedged requests: start a backup call when the primary is slower than usual.
+
+`Hedge.run(primary, backup)` starts `primary()`. If it has not answered after
+the hedge delay, `backup()` starts alongside it; the first successful result
+wins and the other call is cancelled. If the primary fails outright, the
+backup runs at once (a plain fallback).
+
+The hedge delay is the HEDGE_PERCENTILE of the primary's recent latencies,
+clamped to [HEDGE_MIN_DELAY, HEDGE_MAX_DELAY]. With p90 roughly one call in
+ten is hedged. HEDGE_BUDGET caps the share of recent calls that may be
+hedged, so a primary that turns slow across the board is waited for rather
+than doubling the cost of every call. HEDGE_BUDGET=0 disables hedging and
+keeps only the fallback.
+"""
+import os
+import math
+import time
+import asyncio
+from collections import deque
+from typing import Awaitable, Callable, Tuple
+
+from observability import get_logger, HEDGE_DELAY, HEDGES
+
+log = get_logger("hedge")
+
+# ─── Configuration ───────────────────────────────────────────────────────────
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "0.9"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "0.15"))
+HEDGE_MAX_DELAY = float(os.getenv("HEDGE_MAX_DELAY", "3.0"))
+# Used until HEDGE_MIN_SAMPLES primary latencies have been observed
+HEDGE_DEFAULT_DELAY = float(os.getenv("HEDGE_DEFAULT_DELAY", "1.0"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.2"))
+
+# Outcomes of Hedge.run
+PRIMARY = "primary"               # primary answered within the hedge delay
+PRIMARY_WON = "primary_won"       # hedged, primary answered first
+BACKUP_WON = "backup_won"         # hedged, backup answered first
+FALLBACK = "fallback"             # primary failed, backup answered
+SLOW_UNHEDGED = "slow_unhedged"   # primary was slow but the hedge budget was spent
+
+
+class Hedge:
+    def __init__(self, name: str, percentile: float = HEDGE_PERCENTILE, min_delay: float = HEDGE_MIN_DELAY,
+                 max_delay: float = HEDGE_MAX_DELAY, budget: float = HEDGE_BUDGET, window: int = HEDGE_WINDOW):
+        self.name = name
+        self.percentile = percentile
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.budget = budget
+        self._latencies = deque(maxlen=window)   # primary latencies (s); lower bounds when it lost
+        self._hedged = deque(maxlen=window)      # whether each recent call was hedged
+        self.stats = {PRIMARY: 0, PRIMARY_WON: 0, BACKUP_WON: 0, FALLBACK: 0, SLOW_UNHEDGED: 0, "failed": 0}
+        HEDGE_DELAY.set(self.delay, call=name)
+
+    @property
+    def delay(self) -> float:
+        if len(self._latencies) < HEDGE_MIN_SAMPLES:
+            return HEDGE_DEFAULT_DELAY
+        ordered = sorted(self._latencies)
+        rank = min(len(ordered), max(1, math.ceil(self.percentile * len(ordered))))
+        return min(self.max_delay, max(self.min_delay, ordered[rank - 1]))
+
+    def _may_hedge(self) -> bool:
+        if self.budget <= 0:
+            return False
+        return not self._hedged or sum(self._hedged) / len(self._hedged) < self.budget
+
+    def _finish(self, outcome: str, hedged: bool):
+        self._hedged.append(hedged)
+        self.stats[outcome] += 1
+        HEDGES.inc(call=self.name, outcome=outcome)
+        HEDGE_DELAY.set(self.delay, call=self.name)
+
+    async def run(self, primary: Callable[[], Awaitable], backup: Callable[[], Awaitable]) -> Tuple[object, str]:
+        """Return (result, outcome). Raises the backup's error if both fail."""
+        started = time.monotonic()
+        first = asyncio.ensure_future(primary())
+        try:
+            await asyncio.wait({first}, timeout=self.delay)
+            outcome = PRIMARY
+            if not first.done():
+                if self._may_hedge():
+                    return await self._race(first, backup, started)
+                outcome = SLOW_UNHEDGED
+                await asyncio.wait({first})
+            if first.exception() is None:
+                self._latencies.append(time.monotonic() - started)
+                self._finish(outcome, hedged=False)
+                return first.result(), outcome
+            log.warning("hedge.primary_failed", call=self.name, error=repr(first.exception()))
+        finally:
+            if not first.done():
+                first.cancel()
+
+        try:
+            result = await backup()
+        except Exception:
+            self.stats["failed"] += 1
+            self._hedged.append(False)
+            raise
+        self._finish(FALLBACK, hedged=False)
+        return result, FALLBACK
+
+    async def _race(self, first: asyncio.Future, backup, started: float):
+        second = asyncio.ensure_future(backup())
+        pending = {first, second}
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in sorted(done, key=lambda t: t is not first):   # primary wins ties
+                    if task.exception() is not None:
+                        log.warning("hedge.call_failed", call=self.name,
+                                    side="primary" if task is first else "backup", error=repr(task.exception()))
+                        continue
+                    if task is first or not first.done():
+                        # When the backup won this is a lower bound on the
+                        # primary's latency; recording it keeps a slowing
+                        # primary from pinning the delay low.
+                        self._latencies.append(time.monotonic() - started)
+                    outcome = PRIMARY_WON if task is first else BACKUP_WON
+                    self._finish(outcome, hedged=True)
+                    return task.result(), outcome
+            self.stats["failed"] += 1
+            self._hedged.append(True)
+            raise second.exception()
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def snapshot(self) -> dict:
+        hedged = sum(self._hedged)
+        return {
+            **self.stats,
+            "delay_ms": round(self.delay * 1000, 1),
+            "samples": len(self._latencies),
+            "hedge_rate": round(hedged / len(self._hedged), 4) if self._hedged else 0.0,
+        }
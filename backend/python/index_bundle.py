@@ -0,0 +1,156 @@
+"""Prebuilt, versioned index bundles for the RAG service.
+
+A bundle is a self-contained directory produced at build time:
+
+    bundles/<version>/
+        manifest.json    # version, model, dim, chunk count, source hashes, chunker
+        model/           # FastEmbed model files (no download at serve time)
+        vectordb/        # Chroma persist directory (+ bm25.json.gz lexical index)
+        flat/            # chunk store + quantized flat index for VECTOR_BACKEND=flat (vector_store.py)
+    bundles/CURRENT      # name of the bundle to serve
+
+The version is a hash of the model, chunker and source files, so a build
+whose version already exists is skipped. A bundle is built in a temporary
+directory and renamed into place, and a bundle directory in use is never
+modified.
+
+Build:  python index_bundle.py build [sources...] [--out bundles]
+Serve:  RAG_INDEX_BUNDLE=bundles python api.py
+
+In bundle mode the service only loads; it never downloads a model or
+re-ingests the corpus while serving traffic.
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+from typing import Iterable, Union
+
+EMBED_MODEL = "BAAI/bge-small-en-v1.5"
+MANIFEST = "manifest.json"
+CURRENT = "CURRENT"
+BUNDLE_FORMAT = 1
+
+
+class BundleError(Exception):
+    """Raised when a bundle is missing, incomplete or of an unknown format."""
+
+
+def resolve_bundle(path: str) -> str:
+    """Accept a bundle directory or a bundles root containing CURRENT."""
+    if os.path.exists(os.path.join(path, MANIFEST)):
+        return path
+    current = os.path.join(path, CURRENT)
+    if os.path.exists(current):
+        with open(current, "r", encoding="utf-8") as f:
+            return os.path.join(path, f.read().strip())
+    raise BundleError(f"No index bundle at {path} (expected {MANIFEST} or {CURRENT})")
+
+
+def load_manifest(bundle_dir: str) -> dict:
+    path = os.path.join(bundle_dir, MANIFEST)
+    if not os.path.exists(path):
+        raise BundleError(f"{path} not found")
+    with open(path, "r", encoding="utf-8") as f:
+        manifest = json.load(f)
+    if manifest.get("format") != BUNDLE_FORMAT:
+        raise BundleError(f"Unsupported bundle format {manifest.get('format')} in {bundle_dir}")
+    for part in ("model", "vectordb", "flat"):
+        if not os.path.exists(os.path.join(bundle_dir, part)):
+            raise BundleError(f"Bundle {bundle_dir} is incomplete: missing {part}")
+    return manifest
+
+
+def _set_current(out_root: str, version: str):
+    tmp = os.path.join(out_root, CURRENT + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(out_root, CURRENT))
+
+
+def build_bundle(sources: Union[str, Iterable[str]], out_root: str = "bundles", workers: int = None) -> str:
+    """Build a bundle from `sources` and point `out_root/CURRENT` at it."""
+    import numpy as np
+    from ingest import (ingest_docs, iter_source_files, file_sha256, _chunker_signature,
+                        INGEST_CHUNKER, INGEST_WORKERS, COLLECTION_NAME)
+    from vector_store import FlatVectorStore, FLAT_DIR, FLAT_INDEX_DTYPE
+
+    started = time.perf_counter()
+    os.makedirs(out_root, exist_ok=True)
+    files = list(iter_source_files(sources))
+    source_hashes = {os.path.basename(p): file_sha256(p) for p in files}
+    signature = _chunker_signature(INGEST_CHUNKER)
+    version = hashlib.sha1(
+        json.dumps([EMBED_MODEL, signature, FLAT_INDEX_DTYPE, sorted(source_hashes.items())]).encode()
+    ).hexdigest()[:12]
+    final = os.path.join(out_root, version)
+    try:
+        # Same version, same content: serve.py may have it mapped, so reuse it
+        load_manifest(final)
+        _set_current(out_root, version)
+        print(f"📦 Bundle {version} already built → {final}")
+        return final
+    except BundleError:
+        pass
+
+    tmp = os.path.join(out_root, f".build-{os.getpid()}-{int(time.time())}")
+    model_dir = os.path.join(tmp, "model")
+    os.makedirs(model_dir)
+
+    # Both this process and ingest's embedding workers download into the bundle
+    os.environ["FASTEMBED_CACHE_PATH"] = os.path.abspath(model_dir)
+    try:
+        # The bundle's flat/ is built below; vectordb/ does not need its own
+        vectordb = ingest_docs(files, os.path.join(tmp, "vectordb"), vector_backend="chroma",
+                               workers=INGEST_WORKERS if workers is None else workers)
+
+        data = vectordb._collection.get(include=["documents", "metadatas", "embeddings"])
+        vectors = np.asarray(data["embeddings"], dtype=np.float32)
+        FlatVectorStore.build(os.path.join(tmp, FLAT_DIR), data["ids"], data["documents"],
+                              data["metadatas"], vectors, FLAT_INDEX_DTYPE)
+        manifest = {
+            "format": BUNDLE_FORMAT,
+            "version": version,
+            "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+            "embedding_model": EMBED_MODEL,
+            "dim": int(vectors.shape[1]) if vectors.size else 0,
+            "chunks": int(vectors.shape[0]),
+            "collection": COLLECTION_NAME,
+            "chunker": signature,
+            "flat_dtype": FLAT_INDEX_DTYPE,
+            "sources": source_hashes,
+        }
+        with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+
+        if os.path.exists(final):
+            # An incomplete leftover: moved aside, never deleted in place
+            os.replace(final, os.path.join(out_root, f".broken-{version}-{int(time.time())}"))
+        os.replace(tmp, final)
+        _set_current(out_root, version)
+    except Exception:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+    print(f"📦 Bundle {version}: {manifest['chunks']} chunks, dim {manifest['dim']} "
+          f"→ {final} ({time.perf_counter() - started:.1f}s)")
+    return final
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build or inspect RAG index bundles.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="build a new bundle and make it CURRENT")
+    b.add_argument("sources", nargs="*", default=["health_book.txt"])
+    b.add_argument("--out", default="bundles")
+    b.add_argument("--workers", type=int, default=None)
+    s = sub.add_parser("show", help="print the manifest of a bundle")
+    s.add_argument("path", nargs="?", default="bundles")
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        build_bundle(args.sources, args.out, args.workers)
+    else:
+        print(json.dumps(load_manifest(resolve_bundle(args.path)), indent=2))
@@ -1,11 +1,30 @@
 import os
+import json
+import time
+import hashlib
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, Iterator, List, Union
 from dotenv import load_dotenv
 from langchain_community.embeddings.fastembed import FastEmbedEmbeddings
 from langchain_chroma import Chroma
-from langchain_core.documents import Document
+from text_chunker import iter_chunks, CHUNK_TOKEN_BUDGET, CHUNKER_VERSION
+from bm25_index import BM25Index
+from vector_store import FlatVectorStore, VECTOR_BACKEND, FLAT_DIR
 
 load_dotenv()
 
+EMBED_MODEL = "BAAI/bge-small-en-v1.5"
+COLLECTION_NAME = "pregnancy_docs"
+INGEST_BATCH_SIZE = int(os.getenv("INGEST_BATCH_SIZE", "256"))
+INGEST_WORKERS = int(os.getenv("INGEST_WORKERS", str(min(4, os.cpu_count() or 1))))
+INGEST_EXTENSIONS = (".txt", ".md")
+MANIFEST_FILE = "ingest_manifest.json"
+# "structured" (sentence-aligned, heading-aware; see text_chunker.py) or
+# "fixed" (legacy 1000-char windows with 100-char overlap)
+INGEST_CHUNKER = os.getenv("INGEST_CHUNKER", "structured")
+_READ_BLOCK = 64 * 1024
+
+
 def manual_split_text(text, chunk_size=1000, chunk_overlap=100):
     chunks = []
     start = 0
@@ -15,44 +34,291 @@ def manual_split_text(text, chunk_size=1000, chunk_overlap=100):
         start += (chunk_size - chunk_overlap)
     return chunks
 
-def ingest_docs(file_path: str, persist_directory: str = "vectordb"):
-    """Loads a document and stores it in ChromaDB using FastEmbed."""
-    print(f"Loading document: {file_path}")
-    
+
+def iter_split_file(file_path: str, chunk_size: int = 1000, chunk_overlap: int = 100) -> Iterator[str]:
+    """Streaming version of manual_split_text: never holds more than one read
+    block plus one chunk of the file in memory. Unlike manual_split_text it
+    does not emit a trailing chunk made only of overlap."""
+    step = chunk_size - chunk_overlap
+    buf = ""
     with open(file_path, 'r', encoding='utf-8') as f:
-        text = f.read()
-    
-    # Manual splitting to avoid LangChain's torch-dependent splitters
-    chunks = manual_split_text(text)
-    docs = [Document(page_content=chunk, metadata={"source": file_path}) for chunk in chunks]
-    print(f"Split into {len(docs)} chunks.")
-
-    # Using FastEmbed - Very reliable locally and doesn't require Torch
-    embeddings = FastEmbedEmbeddings(model_name="BAAI/bge-small-en-v1.5")
-    
-    print("Creating vector database...")
-    if os.path.exists(persist_directory):
-        print(f"Updating existing database at {persist_directory}...")
-        vectordb = Chroma(
-            persist_directory=persist_directory,
-            embedding_function=embeddings,
-            collection_name="pregnancy_docs"
-        )
-        vectordb.add_documents(docs)
+        while True:
+            block = f.read(_READ_BLOCK)
+            if block:
+                buf += block
+            while len(buf) >= chunk_size + step or (not block and buf):
+                yield buf[:chunk_size]
+                if not block and len(buf) <= chunk_size:
+                    buf = ""
+                    break
+                buf = buf[step:]
+            if not block:
+                return
+
+
+def iter_source_files(sources: Union[str, Iterable[str]]) -> Iterator[str]:
+    """Expand a file, a directory (recursively) or a list of either into files."""
+    if isinstance(sources, str):
+        sources = [sources]
+    for src in sources:
+        if os.path.isdir(src):
+            for root, _, files in sorted(os.walk(src)):
+                for name in sorted(files):
+                    if name.lower().endswith(INGEST_EXTENSIONS):
+                        yield os.path.join(root, name)
+        else:
+            yield src
+
+
+# ─── Embedding workers ───────────────────────────────────────────────────────
+_worker_embeddings = None
+
+def _init_worker(model_name: str):
+    global _worker_embeddings
+    _worker_embeddings = FastEmbedEmbeddings(model_name=model_name)
+
+def _embed_batch(texts: List[str]) -> List[List[float]]:
+    return _worker_embeddings.embed_documents(texts)
+
+
+# ─── Content-hash IDs + manifest ─────────────────────────────────────────────
+def chunk_id(source: str, text: str) -> str:
+    """Deterministic ID: the same chunk of the same file always maps to the same row."""
+    return hashlib.sha1(f"{source}\0{text}".encode("utf-8")).hexdigest()
+
+def file_sha256(file_path: str) -> str:
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+def _load_manifest(persist_directory: str) -> dict:
+    path = os.path.join(persist_directory, MANIFEST_FILE)
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def _save_manifest(persist_directory: str, manifest: dict):
+    path = os.path.join(persist_directory, MANIFEST_FILE)
+    tmp = path + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, path)   # atomic: a crash never leaves a half-written manifest
+
+
+def _chunker_signature(chunker: str) -> str:
+    return f"structured:v{CHUNKER_VERSION}:{CHUNK_TOKEN_BUDGET}" if chunker == "structured" else "fixed:1000:100"
+
+
+def _iter_file_chunks(file_path: str, chunker: str) -> Iterator[tuple]:
+    """Yield (text, extra_metadata) for one file."""
+    if chunker == "structured":
+        for c in iter_chunks(file_path):
+            # An unknown section is left out rather than stored empty
+            yield c.text, {"section": c.section, "tokens": c.tokens} if c.section else {"tokens": c.tokens}
     else:
-        print(f"Creating new database at {persist_directory}...")
-        vectordb = Chroma.from_documents(
-            documents=docs,
-            embedding=embeddings,
-            persist_directory=persist_directory,
-            collection_name="pregnancy_docs"
-        )
-    print(f"Vector DB created and persisted at {persist_directory}")
+        for text in iter_split_file(file_path):
+            yield text, {}
+
+
+def _iter_batches(file_path: str, batch_size: int, chunker: str):
+    """Yield [(chunk_index, chunk_id, text, extra_metadata), ...] batches for one file."""
+    batch = []
+    for i, (chunk, meta) in enumerate(_iter_file_chunks(file_path, chunker)):
+        batch.append((i, chunk_id(file_path, chunk), chunk, meta))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def _stored_metadatas(collection, ids: List[str]) -> dict:
+    if not ids:
+        return {}
+    res = collection.get(ids=ids, include=["metadatas"])
+    return dict(zip(res["ids"], res["metadatas"]))
+
+def _delete_ids(collection, ids: List[str], step: int = 5000):
+    for n in range(0, len(ids), step):
+        collection.delete(ids=ids[n:n + step])
+
+
+def ingest_docs(sources: Union[str, Iterable[str]], persist_directory: str = "vectordb",
+                batch_size: int = INGEST_BATCH_SIZE, workers: int = INGEST_WORKERS,
+                incremental: bool = True, prune: bool = False, chunker: str = INGEST_CHUNKER,
+                vector_backend: str = VECTOR_BACKEND):
+    """Stream one file, many files or a directory into ChromaDB using FastEmbed.
+
+    Chunks are produced lazily, embedded in `batch_size` batches across
+    `workers` processes (0 = in-process) and upserted batch by batch.
+
+    Every chunk gets a content-hash ID, so ingestion is idempotent. With
+    `incremental` (the default) a file whose hash matches the manifest is
+    skipped, chunks already in the collection are not re-embedded (a chunk
+    that moved only has its metadata rewritten), and chunks of the file that
+    no longer exist are deleted. An interrupted run therefore resumes from
+    the last committed batch by simply being re-run. `prune` also deletes
+    the chunks of manifest files not among `sources`.
+
+    `chunker` selects structure-aware chunks with section metadata
+    ("structured") or the legacy fixed windows ("fixed"); changing it
+    re-chunks every file on the next run.
+
+    Chroma stays the store that ingestion updates incrementally. With
+    `vector_backend="flat"` the collection is also exported to a flat,
+    memory-mapped index (`<persist_directory>/flat`, see vector_store.py)
+    whenever it changes, for the service to serve from instead.
+    """
+    os.makedirs(persist_directory, exist_ok=True)
+    embeddings = FastEmbedEmbeddings(model_name=EMBED_MODEL)
+    vectordb = Chroma(
+        persist_directory=persist_directory,
+        embedding_function=embeddings,
+        collection_name=COLLECTION_NAME
+    )
+    collection = vectordb._collection
+    manifest = _load_manifest(persist_directory)
+
+    pool = None
+    if workers > 0:
+        pool = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(EMBED_MODEL,))
+    else:
+        _init_worker(EMBED_MODEL)
+
+    started = time.perf_counter()
+    stats = {"files": 0, "skipped_files": 0, "embedded": 0, "unchanged": 0, "relabelled": 0, "duplicates": 0,
+             "deleted": 0}
+    seen_files = set()
+    try:
+        for file_path in iter_source_files(sources):
+            seen_files.add(file_path)
+            fhash = file_sha256(file_path)
+            signature = _chunker_signature(chunker)
+            prev = manifest.get(file_path, {})
+            if incremental and prev.get("sha256") == fhash and prev.get("chunker") == signature:
+                print(f"⏭️  {file_path}: unchanged, skipping")
+                stats["skipped_files"] += 1
+                continue
+            print(f"Loading document: {file_path}")
+            stats["files"] += 1
+            file_ids = set()
+            # Chunks already stored are not re-embedded, also on a file whose
+            # first run never finished (no manifest entry yet). IDs hash only
+            # the text, so after a recorded chunker change every chunk is
+            # rewritten to refresh its metadata.
+            skip_present = incremental and prev.get("chunker", signature) == signature
+
+            def metadata(i, meta):
+                return {"source": file_path, "chunk": i, **meta}
+
+            def commit(batch, vectors):
+                collection.upsert(
+                    ids=[cid for _, cid, _, _ in batch],
+                    embeddings=vectors,
+                    documents=[text for _, _, text, _ in batch],
+                    metadatas=[metadata(i, meta) for i, _, _, meta in batch],
+                )
+                stats["embedded"] += len(batch)
+                rate = stats["embedded"] / max(time.perf_counter() - started, 1e-6)
+                print(f"  ✅ {file_path}: {stats['embedded']} chunks embedded ({rate:.0f} chunks/s)")
+
+            # Keep up to 2×workers batches in flight
+            in_flight = []
+            for batch in _iter_batches(file_path, batch_size, chunker):
+                # Content-hash IDs repeat for repeated text; Chroma rejects duplicate
+                # IDs in one upsert, so each is sent once per file (first occurrence)
+                fresh = {}
+                for c in batch:
+                    if c[1] not in file_ids:
+                        fresh.setdefault(c[1], c)
+                stats["duplicates"] += len(batch) - len(fresh)
+                file_ids.update(fresh)
+                batch = list(fresh.values())
+                if skip_present and batch:
+                    present = _stored_metadatas(collection, list(fresh))
+                    stats["unchanged"] += len(present)
+                    # An unchanged chunk that moved (text inserted above it) keeps
+                    # its vector but gets its new position: context_builder merges
+                    # neighbours by "chunk"
+                    moved = [(cid, metadata(i, meta)) for i, cid, _, meta in batch
+                             if cid in present and present[cid] != metadata(i, meta)]
+                    if moved:
+                        collection.update(ids=[cid for cid, _ in moved], metadatas=[m for _, m in moved])
+                        stats["relabelled"] += len(moved)
+                    batch = [c for c in batch if c[1] not in present]
+                if not batch:
+                    continue
+                texts = [t for _, _, t, _ in batch]
+                if pool is None:
+                    commit(batch, _embed_batch(texts))
+                    continue
+                in_flight.append((batch, pool.submit(_embed_batch, texts)))
+                if len(in_flight) >= 2 * workers:
+                    b0, fut = in_flight.pop(0)
+                    commit(b0, fut.result())
+            for b0, fut in in_flight:
+                commit(b0, fut.result())
+
+            # Chunks of this file that no longer exist (including random-ID rows
+            # from before content-hash IDs) are removed.
+            stored = collection.get(where={"source": file_path}, include=[])["ids"]
+            stale = [cid for cid in stored if cid not in file_ids]
+            _delete_ids(collection, stale)
+            stats["deleted"] += len(stale)
+
+            manifest[file_path] = {"sha256": fhash, "chunker": signature,
+                                   "chunks": len(file_ids), "ingested_at": time.time()}
+            _save_manifest(persist_directory, manifest)
+
+        if prune:
+            for gone in [f for f in manifest if f not in seen_files]:
+                stale = collection.get(where={"source": gone}, include=[])["ids"]
+                _delete_ids(collection, stale)
+                stats["deleted"] += len(stale)
+                del manifest[gone]
+                print(f"🗑️  {gone}: removed {len(stale)} chunks")
+            _save_manifest(persist_directory, manifest)
+    finally:
+        if pool is not None:
+            pool.shutdown(cancel_futures=True)
+
+    changed = stats["embedded"] or stats["relabelled"] or stats["deleted"]
+    if changed or not BM25Index.exists(persist_directory):
+        bm25 = BM25Index.from_collection(collection)
+        bm25.save(persist_directory)
+        print(f"🔤 BM25 index: {bm25.n_docs} chunks, {len(bm25.postings)} terms")
+    flat_dir = os.path.join(persist_directory, FLAT_DIR)
+    if vector_backend == "flat" and (changed or not FlatVectorStore.exists(flat_dir)):
+        flat = FlatVectorStore.from_collection(collection, flat_dir)
+        print(f"🧮 Flat index: {len(flat)} vectors ({flat.vectors.dtype})")
+
+    elapsed = time.perf_counter() - started
+    print(f"Vector DB persisted at {persist_directory} in {elapsed:.1f}s: "
+          f"{stats['embedded']} embedded, {stats['unchanged']} unchanged ({stats['relabelled']} moved), "
+          f"{stats['duplicates']} duplicates, "
+          f"{stats['deleted']} deleted, {stats['skipped_files']} files skipped ({workers} workers)")
     return vectordb
 
 if __name__ == "__main__":
-    sample_file = "health_book.txt"
-    if os.path.exists(sample_file):
-        ingest_docs(sample_file)
+    import argparse
+    parser = argparse.ArgumentParser(description="Ingest documents into the pregnancy_docs vector store.")
+    parser.add_argument("sources", nargs="*", default=["health_book.txt"], help="files or directories")
+    parser.add_argument("--persist-directory", default="vectordb")
+    parser.add_argument("--full", action="store_true", help="re-embed everything, ignoring the manifest")
+    parser.add_argument("--prune", action="store_true", help="delete chunks of files no longer listed")
+    parser.add_argument("--workers", type=int, default=INGEST_WORKERS)
+    parser.add_argument("--batch-size", type=int, default=INGEST_BATCH_SIZE)
+    parser.add_argument("--chunker", choices=["structured", "fixed"], default=INGEST_CHUNKER)
+    parser.add_argument("--vector-backend", choices=["chroma", "flat"], default=VECTOR_BACKEND)
+    args = parser.parse_args()
+
+    missing = [s for s in args.sources if not os.path.exists(s)]
+    if missing:
+        print(f"File(s) not found: {', '.join(missing)}")
     else:
-        print(f"File {sample_file} not found.")
+        ingest_docs(args.sources, args.persist_directory, batch_size=args.batch_size,
+                    workers=args.workers, incremental=not args.full, prune=args.prune,
+                    chunker=args.chunker, vector_backend=args.vector_backend)
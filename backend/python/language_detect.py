@@ -0,0 +1,210 @@
+"""Local language/script detection for inbound queries.
+
+/ask used to translate whenever the client's language_code was not
+English, so English typed into the Hindi UI, and Hinglish such as "mujhe
+bahut thakan ho rahi hai", each paid a Sarvam/Groq round-trip.
+`route_query(text, language_code)` decides locally, in microseconds:
+
+    english          Latin script that reads as English: no translation
+    romanized_local  romanized Hindi whose content words the local gloss
+                     covers: normalized spellings plus English keywords
+                     (negated terms as "no fever"), no translation call.
+                     A negated red flag ("khoon nahi aa raha") is
+                     translated instead.
+    translate        anything else: translate remotely. The source code
+                     comes from the script when it contradicts the
+                     declared language_code (Devanagari sent as en-IN).
+
+Scripts are counted by Unicode block. Latin text is scored by a small
+romanized-Hindi/English classifier: word lists of frequent function words
+with unambiguous spellings ("hai", "mujhe", "nahi" / "the", "what",
+"have"), plus spelling cues for unknown words ("bh"/"kh"/"aa", "-iye" /
+"-ing", "-tion"). The gloss is the clinical lexicon (clinical_extractor.py,
+which already lists romanized symptom names) plus GLOSS below.
+"""
+import os
+import re
+from typing import Dict, List, Tuple
+
+from clinical_extractor import tokenize, find_terms, negated, RED_FLAGS
+
+LANG_DETECT = os.getenv("LANG_DETECT", "on") == "on"
+# Share of content words the gloss must cover to skip translating romanized Hindi
+ROMANIZED_MIN_COVERAGE = float(os.getenv("ROMANIZED_MIN_COVERAGE", "0.6"))
+
+# Unicode block -> (script, default language code)
+_SCRIPTS = (
+    (0x0900, 0x097F, "devanagari", "hi-IN"),
+    (0x0980, 0x09FF, "bengali", "bn-IN"),
+    (0x0A00, 0x0A7F, "gurmukhi", "pa-IN"),
+    (0x0A80, 0x0AFF, "gujarati", "gu-IN"),
+    (0x0B00, 0x0B7F, "odia", "od-IN"),
+    (0x0B80, 0x0BFF, "tamil", "ta-IN"),
+    (0x0C00, 0x0C7F, "telugu", "te-IN"),
+    (0x0C80, 0x0CFF, "kannada", "kn-IN"),
+    (0x0D00, 0x0D7F, "malayalam", "ml-IN"),
+    (0x0600, 0x06FF, "arabic", "ur-IN"),
+)
+# Languages sharing a script: keep the declared code if it is one of these
+_SCRIPT_LANGS = {"devanagari": ("hi", "mr", "sa", "ne", "kok", "mai", "doi"), "bengali": ("bn", "as"),
+                 "odia": ("od", "or")}
+
+_HINDI_WORDS = frozenset("""
+hai hain tha thi hoon hun ho raha rahi rahe rha rhi mujhe mujhko mera meri mere hum hamara humko
+aap aapka aapki tum tumhara kya kyun kyon kaise kaisa kaisi kab kahan kitna kitni kitne kaun nahi nahin
+nhi bahut bohot bahot zyada jyada thoda thodi aur bhi kuch koi sab abhi phir fir ke ki ka ko se mein
+mai main wala wali wale karna karne karta karti kar liye lie chahiye chaiye sakti sakta sakte hota hoti
+hote hua hui gaya gayi gaye diya lena lete leti dena jata jaati jati rahta rahti agar lekin magar kyunki
+toh aaj kal subah shaam raat din baar waqt samay
+""".split())
+_ENGLISH_WORDS = frozenset("""
+the what how why when where which who whom whose have has had having am are was were been being do
+does did doing can could should would will shall may might must my mine your yours our their his her
+this that these those there here with without from about into over after before during because while
+very much many some any every each other than then also just only really please thank thanks feel
+feeling pain baby pregnant pregnancy week month doctor eat eating food take taking normal safe good
+bad sleep water and but for not you they she he it its we us them an
+""".split())
+# Romanized Hindi content words -> English keyword (symptom terms come from
+# the clinical lexicon); spelling variants share an entry.
+GLOSS: Dict[str, str] = {
+    **dict.fromkeys(("khana", "khaana", "bhojan", "aahar", "ahaar"), "food"),
+    **dict.fromkeys(("pani", "paani"), "water"),
+    **dict.fromkeys(("doodh", "dudh"), "milk"),
+    **dict.fromkeys(("dawai", "dawa", "dava", "davai", "goli", "tablet"), "medicine"),
+    **dict.fromkeys(("garbh", "garbhavastha", "pregnancy", "pet se"), "pregnancy"),
+    **dict.fromkeys(("bachcha", "baccha", "bacha", "bachche", "bacche", "shishu"), "baby"),
+    **dict.fromkeys(("neend", "nind", "sona"), "sleep"),
+    **dict.fromkeys(("vyayam", "kasrat", "exercise", "yoga"), "exercise"),
+    **dict.fromkeys(("phal", "fal"), "fruit"),
+    **dict.fromkeys(("sabzi", "sabji", "hari sabzi"), "vegetables"),
+    **dict.fromkeys(("aaram", "araam"), "rest"),
+    **dict.fromkeys(("chalna", "chalne", "tehelna", "tahalna"), "walking"),
+    **dict.fromkeys(("dard", "pida", "peeda"), "pain"),
+    **dict.fromkeys(("pet",), "stomach"),
+    **dict.fromkeys(("sar", "sir"), "head"),
+    **dict.fromkeys(("kamar",), "back"),
+    **dict.fromkeys(("pair", "paon", "paer"), "legs"),
+    **dict.fromkeys(("haath",), "hands"),
+    **dict.fromkeys(("aankh", "ankh", "aankhen"), "eyes"),
+    **dict.fromkeys(("khoon", "khun"), "blood"),
+    **dict.fromkeys(("peshab", "pishab"), "urine"),
+    **dict.fromkeys(("chai",), "tea"),
+    **dict.fromkeys(("mahina", "mahine", "maheena"), "month"),
+    **dict.fromkeys(("hafta", "hafte"), "week"),
+    **dict.fromkeys(("doctor", "daktar"), "doctor"),
+    **dict.fromkeys(("aspatal", "hospital"), "hospital"),
+    **dict.fromkeys(("janch", "jaanch", "test"), "test"),
+    **dict.fromkeys(("safai",), "hygiene"),
+    **dict.fromkeys(("garmi",), "heat"),
+    **dict.fromkeys(("thand", "sardi"), "cold"),
+    **dict.fromkeys(("khansi",), "cough"),
+    **dict.fromkeys(("wajan", "vajan", "vazan", "wazan"), "weight"),
+    **dict.fromkeys(("sambandh", "sex"), "intercourse"),
+    **dict.fromkeys(("delivery", "prasav"), "delivery"),
+    **dict.fromkeys(("surakshit", "safe"), "safe"),
+    **dict.fromkeys(("pi", "peena", "pina", "peene"), "drink"),
+    **dict.fromkeys(("kam", "kamm"), "less"),
+    **dict.fromkeys(("harkat", "hilna", "hil", "hilta", "hilti"), "movement"),
+}
+# Spelling variants normalized in the text handed to the RAG service
+_NORMALIZE = {"bohot": "bahut", "bahot": "bahut", "nhi": "nahi", "nahin": "nahi", "jyada": "zyada",
+              "kyon": "kyun", "chaiye": "chahiye", "rha": "raha", "rhi": "rahi", "mai": "main", "fir": "phir"}
+_HINDI_CUES = ("bh", "kh", "gh", "dh", "jh", "chh", "aa", "ee", "oo")
+_HINDI_ENDINGS = ("iye", "kar", "ega", "egi", "enge", "na", "ne", "ni")
+_ENGLISH_ENDINGS = ("ing", "tion", "ed", "ly", "ness", "ment", "ful", "ous", "ive", "ght")
+_UNKNOWN_WEIGHT = 0.3
+_LATIN = re.compile(r"[A-Za-z]")
+
+
+def detect_script(text: str) -> Tuple[str, str]:
+    """(dominant script, its default language code); ("latin", "en-IN") for
+    Latin text and ("unknown", "") when there are no letters."""
+    counts: Dict[Tuple[str, str], int] = {}
+    latin = len(_LATIN.findall(text))
+    for ch in text:
+        cp = ord(ch)
+        if cp < 0x0600:
+            continue
+        for lo, hi, script, code in _SCRIPTS:
+            if lo <= cp <= hi:
+                counts[(script, code)] = counts.get((script, code), 0) + 1
+                break
+    if counts:
+        (script, code), n = max(counts.items(), key=lambda kv: kv[1])
+        if n >= latin:
+            return script, code
+    return ("latin", "en-IN") if latin else ("unknown", "")
+
+
+def hindi_score(tokens: List[str]) -> float:
+    """P(romanized Hindi) for Latin-script word tokens, in [0, 1]."""
+    hindi = english = 0.0
+    for tok in tokens:
+        if tok in _HINDI_WORDS:
+            hindi += 1
+        elif tok in _ENGLISH_WORDS:
+            english += 1
+        elif tok in GLOSS and GLOSS[tok] != tok:
+            hindi += _UNKNOWN_WEIGHT
+        elif tok.endswith(_ENGLISH_ENDINGS):
+            english += _UNKNOWN_WEIGHT
+        elif tok.endswith(_HINDI_ENDINGS) or any(c in tok for c in _HINDI_CUES):
+            hindi += _UNKNOWN_WEIGHT
+    return hindi / (hindi + english) if hindi + english else 0.5
+
+
+def gloss_romanized(text: str) -> Tuple[str, float, bool]:
+    """(normalized text with English keywords appended, share of content
+    words covered, whether a red-flag term is negated). Negated terms are
+    glossed as "no <term>" ("bukhar nahi hai" -> "no fever")."""
+    tokens = tokenize(text)       # clause punctuation kept for negation scope
+    covered = [not t.isalnum() for t in tokens]
+    keywords = []
+    negated_red_flag = False
+    for start, end, name, is_negated in find_terms(tokens):
+        keywords.append(f"no {name}" if is_negated else name)
+        negated_red_flag = negated_red_flag or (is_negated and name in RED_FLAGS)
+        covered[start:end] = [True] * (end - start)
+    i = 0
+    while i < len(tokens):
+        width = 2 if i + 1 < len(tokens) and " ".join(tokens[i:i + 2]) in GLOSS else 1
+        word = " ".join(tokens[i:i + width])
+        if word in GLOSS and not covered[i]:
+            keywords.append(f"no {GLOSS[word]}" if negated(tokens, i, i + width) else GLOSS[word])
+            covered[i:i + width] = [True] * width
+        i += width
+    # English words in Hinglish ("movement") need no gloss
+    content = [c or t.endswith(_ENGLISH_ENDINGS) for t, c in zip(tokens, covered)
+               if t.isalnum() and t not in _HINDI_WORDS and t not in _ENGLISH_WORDS]
+    coverage = sum(content) / len(content) if content else 0.0
+    normalized = " ".join(_NORMALIZE.get(w, w) for w in text.split())
+    keywords = list(dict.fromkeys(keywords))
+    glossed = f"{normalized} (English keywords: {', '.join(keywords)})" if keywords else normalized
+    return glossed, coverage, negated_red_flag
+
+
+def route_query(text: str, language_code: str) -> Tuple[str, str, str]:
+    """Return (decision, script, value): value is the English text for
+    "english"/"romanized_local" and the source language code for "translate"."""
+    declared = (language_code or "").lower()
+    script, script_code = detect_script(text)
+    if script == "latin":
+        words = [t for t in tokenize(text) if t.isalpha()]
+        p_hindi = hindi_score(words)
+        if p_hindi <= 0.3:
+            return "english", script, text
+        if p_hindi >= 0.6 and (declared.startswith("hi") or declared.startswith("en")):
+            english, coverage, negated_red_flag = gloss_romanized(text)
+            # A negated red flag ("khoon nahi aa raha") is worth a real translation
+            if coverage >= ROMANIZED_MIN_COVERAGE and not negated_red_flag:
+                return "romanized_local", script, english
+            return "translate", script, "hi-IN"
+        if declared.startswith("en"):
+            return "english", script, text
+        return "translate", script, language_code
+    if script == "unknown":
+        return "english", script, text
+    if declared.split("-")[0] in _SCRIPT_LANGS.get(script, (script_code.split("-")[0],)):
+        return "translate", script, language_code
+    return "translate", script, script_code
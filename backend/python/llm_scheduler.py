@@ -0,0 +1,283 @@
+"""One scheduler for every Groq call: rate limits, priorities and 429s.
+
+The RAG model (llama-3.1-8b-instant) and the translator/clinical model
+(llama-3.3-70b-versatile) share one GROQ_API_KEY quota. Every call goes
+through `scheduler.run()` (one response) or `scheduler.stream()` (token
+stream), which:
+
+- keeps two token buckets per model, requests/min and tokens/min
+  (LLM_RATE_LIMITS), charging the prompt estimate plus LLM_OUTPUT_TOKENS up
+  front and settling against the real usage afterwards;
+- grants budget in priority order, voice > website > translation >
+  clinical > batch. A class may not dip into the LLM_RESERVE share of either
+  bucket, so background work is throttled first and leaves headroom for
+  live calls;
+- on a 429 blocks the model for the response's retry-after (the Groq
+  clients run with max_retries=0 so the scheduler sees it) and retries;
+- sheds a call, raising LLMRateLimited, when its class would wait longer
+  than LLM_MAX_WAIT for budget, or past the request's deadline (see
+  admission.py; no call starts once it has passed). Callers degrade:
+  translation falls back to Sarvam's answer or the source text, clinical
+  extraction to the local extractor, /ask to 503 with Retry-After.
+
+LLM_RATE_LIMITS is the quota of the key. The buckets are per process, so
+each process takes SERVE_WORKER_SHARE of it (serve.py sets 1 / workers).
+Shares are not rounded up: a worker whose share is under one request a
+minute refills more slowly, so the workers together never exceed the key.
+"""
+import os
+import time
+import heapq
+import asyncio
+import itertools
+from typing import AsyncIterator, Awaitable, Callable, Dict, Tuple
+
+from observability import get_logger, LLM_CALLS, LLM_QUEUE_SECONDS
+from admission import remaining as deadline_remaining, check as check_deadline
+
+log = get_logger("llm")
+
+# Priority classes, highest first
+VOICE = "voice"
+WEBSITE = "website"
+TRANSLATION = "translation"
+CLINICAL = "clinical"
+BATCH = "batch"
+_RANK = {VOICE: 0, WEBSITE: 1, TRANSLATION: 2, CLINICAL: 3, BATCH: 4}
+
+
+def _pairs(spec: str) -> Dict[str, str]:
+    """Parse "a=1,b=2" env settings."""
+    return {k.strip(): v.strip() for k, v in (p.split("=", 1) for p in spec.split(",") if "=" in p)}
+
+
+# ─── Configuration ───────────────────────────────────────────────────────────
+# requests/min and tokens/min per model, e.g. "llama-3.1-8b-instant=30/6000"
+LLM_RATE_LIMITS: Dict[str, Tuple[int, int]] = {
+    "llama-3.1-8b-instant": (30, 6000),
+    "llama-3.3-70b-versatile": (30, 12000),
+    **{m: tuple(int(x) for x in v.split("/")) for m, v in _pairs(os.getenv("LLM_RATE_LIMITS", "")).items()},
+}
+LLM_DEFAULT_LIMIT = (30, 6000)
+# This process's share of the quota; serve.py sets 1 / workers
+SERVE_WORKER_SHARE = float(os.getenv("SERVE_WORKER_SHARE", "1"))
+# Share of each bucket a class leaves for the classes above it
+LLM_RESERVE = {VOICE: 0.0, WEBSITE: 0.1, TRANSLATION: 0.3, CLINICAL: 0.5, BATCH: 0.5,
+               **{k: float(v) for k, v in _pairs(os.getenv("LLM_RESERVE", "")).items()}}
+# Longest a class waits for budget before it is shed (s); 0 = wait as long as it takes
+LLM_MAX_WAIT = {VOICE: 3.0, WEBSITE: 10.0, TRANSLATION: 2.0, CLINICAL: 120.0, BATCH: 0.0,
+                **{k: float(v) for k, v in _pairs(os.getenv("LLM_MAX_WAIT", "")).items()}}
+LLM_OUTPUT_TOKENS = int(os.getenv("LLM_OUTPUT_TOKENS", "400"))   # charged up front for the completion
+LLM_MAX_ATTEMPTS = int(os.getenv("LLM_MAX_ATTEMPTS", "3"))
+LLM_RETRY_AFTER_DEFAULT = float(os.getenv("LLM_RETRY_AFTER_DEFAULT", "2.0"))
+
+
+class LLMRateLimited(Exception):
+    """The call was shed: budget would not free up within its class's max wait."""
+
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+def estimate_tokens(text: str) -> int:
+    """~4 characters per token for the English prompts sent to Groq."""
+    return len(text) // 4 + 1
+
+
+class _Bucket:
+    def __init__(self, per_minute: float):
+        # Room for one whole request even when the share is below one a minute;
+        # the refill rate and starting level stay at the share itself
+        self.capacity = max(1.0, float(per_minute))
+        self.rate = per_minute / 60.0
+        self.level = float(per_minute)
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self, n: float, reserve: float) -> float:
+        """Seconds until `n` can be taken without going below the reserve.
+        A request larger than the usable share goes once that share is full."""
+        floor = reserve * self.capacity
+        need = min(n, self.capacity - floor) + floor - self.level
+        return max(0.0, need / self.rate)
+
+
+class _ModelState:
+    def __init__(self, rpm: float, tpm: float):
+        self.requests = _Bucket(rpm)
+        self.tokens = _Bucket(tpm)
+        self.blocked_until = 0.0            # set from retry-after on a 429
+        self.queue: list = []               # heap of (rank, seq) waiting for budget
+        self.changed = asyncio.Event()
+
+    def delay(self, tokens: int, reserve: float, now: float) -> float:
+        self.requests.refill(now)
+        self.tokens.refill(now)
+        return max(self.blocked_until - now, self.requests.wait(1, reserve), self.tokens.wait(tokens, reserve))
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+
+def _status(e: Exception):
+    return getattr(e, "status_code", None) or getattr(getattr(e, "response", None), "status_code", None)
+
+
+def _retry_after(e: Exception) -> float:
+    headers = getattr(getattr(e, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return LLM_RETRY_AFTER_DEFAULT
+
+
+def _share(limit: Tuple[int, int], share: float) -> Tuple[float, float]:
+    # Unrounded, so the shares of all workers add up to at most the limit
+    return tuple(x * share for x in limit)
+
+
+class LLMScheduler:
+    def __init__(self, limits: Dict[str, Tuple[int, int]] = None, share: float = SERVE_WORKER_SHARE):
+        self.share = share
+        self.limits = {m: _share(v, share) for m, v in (LLM_RATE_LIMITS if limits is None else limits).items()}
+        self._models: Dict[str, _ModelState] = {}
+        self._seq = itertools.count()
+
+    def _state(self, model: str) -> _ModelState:
+        state = self._models.get(model)
+        if state is None:
+            state = self._models[model] = _ModelState(*self.limits.get(model, _share(LLM_DEFAULT_LIMIT, self.share)))
+        return state
+
+    async def _acquire(self, model: str, priority: str, tokens: int):
+        """Wait for this call's turn and budget, or raise LLMRateLimited."""
+        check_deadline("llm")
+        state = self._state(model)
+        reserve, max_wait = LLM_RESERVE[priority], LLM_MAX_WAIT[priority] or None
+        left = deadline_remaining()
+        if left is not None:
+            max_wait = left if max_wait is None else min(max_wait, left)
+        entry = (_RANK[priority], next(self._seq))
+        started = time.monotonic()
+        delay = state.delay(tokens, reserve, started)
+        if max_wait is not None and delay > max_wait:
+            LLM_CALLS.inc(model=model, priority=priority, outcome="shed")
+            raise LLMRateLimited(f"{model} budget exhausted for {priority} calls", retry_after=delay)
+
+        heapq.heappush(state.queue, entry)
+        try:
+            while True:
+                now = time.monotonic()
+                delay = state.delay(tokens, reserve, now)
+                if state.queue[0] == entry and delay == 0:
+                    state.requests.level -= 1
+                    state.tokens.level -= tokens
+                    LLM_QUEUE_SECONDS.observe(now - started, priority=priority)
+                    return
+                remaining = started + max_wait - now if max_wait is not None else None
+                if remaining is not None and remaining <= 0:
+                    LLM_CALLS.inc(model=model, priority=priority, outcome="shed")
+                    raise LLMRateLimited(f"{model} budget not freed within {max_wait}s for {priority} calls",
+                                         retry_after=delay)
+                # The head sleeps until its budget refills; the rest wait for the head to move
+                timeout = delay if state.queue[0] == entry else None
+                if remaining is not None:
+                    timeout = remaining if timeout is None else min(timeout, remaining)
+                try:
+                    await asyncio.wait_for(state.changed.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            state.queue.remove(entry)
+            heapq.heapify(state.queue)
+            state.notify()
+
+    def _settle(self, model: str, charged: int, used: int):
+        """Refund (or charge) the difference between the estimate and real usage."""
+        self._state(model).tokens.level += charged - used
+
+    async def _retry_delay(self, model: str, priority: str, attempt: int, e: Exception):
+        """Handle a failed call: return to retry, or re-raise."""
+        status = _status(e)
+        if status == 429:
+            retry_after = _retry_after(e)
+            state = self._state(model)
+            state.blocked_until = max(state.blocked_until, time.monotonic() + retry_after)
+            LLM_CALLS.inc(model=model, priority=priority, outcome="rate_limited")
+            log.warning("llm.rate_limited", model=model, priority=priority, retry_after=retry_after,
+                        attempt=attempt)
+            if attempt < LLM_MAX_ATTEMPTS:
+                return      # the next _acquire waits out the block, or sheds
+        elif status is not None and status >= 500 and attempt < LLM_MAX_ATTEMPTS:
+            log.warning("llm.retry", model=model, priority=priority, status=status, attempt=attempt)
+            await asyncio.sleep(0.25 * 2 ** (attempt - 1))
+            return
+        else:
+            LLM_CALLS.inc(model=model, priority=priority, outcome="error")
+        raise e
+
+    async def run(self, model: str, priority: str, prompt_tokens: int, call: Callable[[], Awaitable]):
+        """Run `call()` (e.g. `lambda: llm.ainvoke(prompt)`) under the model's budget."""
+        charged = prompt_tokens + LLM_OUTPUT_TOKENS
+        for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+            await self._acquire(model, priority, charged)
+            try:
+                result = await call()
+            except asyncio.CancelledError:
+                self._settle(model, charged, prompt_tokens)
+                raise
+            except Exception as e:
+                self._settle(model, charged, prompt_tokens)
+                await self._retry_delay(model, priority, attempt, e)
+                continue
+            usage = getattr(result, "usage_metadata", None) or {}
+            self._settle(model, charged, usage.get("total_tokens") or charged)
+            LLM_CALLS.inc(model=model, priority=priority, outcome="ok")
+            return result
+
+    async def stream(self, model: str, priority: str, prompt_tokens: int,
+                     make_stream: Callable[[], AsyncIterator[str]]) -> AsyncIterator[str]:
+        """Yield from `make_stream()` under the model's budget. Retries only
+        before the first chunk, so callers never see a chunk twice."""
+        charged = prompt_tokens + LLM_OUTPUT_TOKENS
+        for attempt in range(1, LLM_MAX_ATTEMPTS + 1):
+            await self._acquire(model, priority, charged)
+            chars, failed = 0, None
+            try:
+                async for chunk in make_stream():
+                    chars += len(chunk)
+                    yield chunk
+            except Exception as e:
+                if chars:
+                    LLM_CALLS.inc(model=model, priority=priority, outcome="error")
+                    raise
+                failed = e
+            finally:
+                # Also when the consumer stops early (GeneratorExit) or is cancelled
+                self._settle(model, charged, prompt_tokens + chars // 4)
+            if failed is not None:
+                await self._retry_delay(model, priority, attempt, failed)
+                continue
+            LLM_CALLS.inc(model=model, priority=priority, outcome="ok")
+            return
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        out = {}
+        for model, state in self._models.items():
+            state.delay(0, 0.0, now)     # refill
+            out[model] = {
+                "requests_left": round(state.requests.level, 1),
+                "tokens_left": round(state.tokens.level),
+                "queued": len(state.queue),
+                "blocked_for_s": round(max(0.0, state.blocked_until - now), 2),
+            }
+        return out
+
+
+scheduler = LLMScheduler()
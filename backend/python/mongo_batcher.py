@@ -0,0 +1,180 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from datetime import datetime
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from health_buckets import BUCKET_COLLECTION, bucket_write_ops
+from observability import get_logger
+
+log = get_logger("mongo")
+
+# ─── Configuration ───────────────────────────────────────────────────────────
+MONGO_BATCH_MAX_OPS = int(os.getenv("MONGO_BATCH_MAX_OPS", "100"))
+MONGO_BATCH_WINDOW_MS = float(os.getenv("MONGO_BATCH_WINDOW_MS", "200"))
+# "buckets" (per-user/per-day documents, see health_buckets.py) or "legacy"
+# (one `history` array on the healthlogs document).
+HEALTHLOG_STORAGE = os.getenv("HEALTHLOG_STORAGE", "buckets")
+# Flushes in which a failed `healthlogs` parent update is retried on its own
+MONGO_PARENT_RETRIES = int(os.getenv("MONGO_PARENT_RETRIES", "3"))
+
+
+class HealthLogBatcher:
+    """Write-behind batcher for `healthlogs` interaction upserts.
+
+    Interactions are buffered per filter (one user) and flushed as unordered
+    `bulk_write`s when either MONGO_BATCH_MAX_OPS interactions are buffered or
+    MONGO_BATCH_WINDOW_MS has passed since the first one. Several interactions
+    for the same user in one window become one `$push: {$each: [...]}` —
+    into that user's day bucket, or into `history` in legacy mode.
+
+    `add()` resolves once the batch containing the interaction is written, so
+    callers (e.g. the background job queue) still see failures and can retry.
+    It fails only if the op holding the interaction failed: when the bucket
+    push succeeds but the `healthlogs` parent update does not, re-running the
+    caller would push the interaction twice, so the batcher retries just the
+    parent update in the next flushes instead.
+    """
+
+    def __init__(self, db, max_ops: int = MONGO_BATCH_MAX_OPS, window_ms: float = MONGO_BATCH_WINDOW_MS,
+                 storage: str = HEALTHLOG_STORAGE):
+        self.db = db
+        self.storage = storage
+        self.max_ops = max_ops
+        self.window = window_ms / 1000
+        self._pending: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._pending_ops = 0
+        self._parent_retries = []           # entries whose interactions are stored but parent update failed
+        self._flush_tasks = set()
+        self._timer = None
+        self._flush_lock = asyncio.Lock()
+        self.stats = {"batches": 0, "interactions": 0, "upserts": 0, "errors": 0,
+                      "parent_retries": 0, "parent_dropped": 0,
+                      "last_batch_size": 0, "last_batch_ms": 0.0, "max_batch_ms": 0.0}
+
+    async def add(self, filter_query: dict, interaction: dict, set_on_insert: dict):
+        key = tuple(sorted(filter_query.items()))
+        entry = self._pending.get(key)
+        if entry is None:
+            entry = self._pending[key] = {"filter": filter_query, "items": [], "waiters": [],
+                                          "set_on_insert": set_on_insert}
+        fut = asyncio.get_running_loop().create_future()
+        entry["items"].append(interaction)
+        entry["waiters"].append(fut)
+        self._pending_ops += 1
+
+        if self._pending_ops >= self.max_ops:
+            self._spawn_flush()
+        elif self._timer is None:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._spawn_flush)
+        await fut
+
+    def _spawn_flush(self):
+        task = asyncio.ensure_future(self.flush())
+        self._flush_tasks.add(task)
+        task.add_done_callback(self._flush_tasks.discard)
+
+    async def flush(self):
+        async with self._flush_lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+            if not self._pending and not self._parent_retries:
+                return
+            entries, n_items = list(self._pending.values()), self._pending_ops
+            retries = self._parent_retries
+            self._pending, self._pending_ops, self._parent_retries = OrderedDict(), 0, []
+            entries += retries
+
+            now = datetime.utcnow()
+            # (collection name, holds the interactions) -> (ops, owning entry index per op)
+            batches = {}
+            for i, e in enumerate(entries):
+                for coll, ops, stores_items in self._build_ops(e, now):
+                    if "attempts" in e and stores_items:
+                        continue            # a parent retry: its interactions are already stored
+                    b = batches.setdefault((coll, stores_items), ([], []))
+                    b[0].extend(ops)
+                    b[1].extend([i] * len(ops))
+            n_ops = sum(len(ops) for ops, _ in batches.values())
+
+            started = time.perf_counter()
+            # entry index -> exception, for the users whose interactions were not
+            # stored (`failed`) or whose parent update failed (`parent_failed`)
+            failed, parent_failed = {}, {}
+            results = await asyncio.gather(
+                *(self.db[coll].bulk_write(ops, ordered=False) for (coll, _), (ops, _) in batches.items()),
+                return_exceptions=True,
+            )
+            for ((_, stores_items), (ops, owners)), result in zip(batches.items(), results):
+                target = failed if stores_items else parent_failed
+                if isinstance(result, BulkWriteError):
+                    for err in result.details.get("writeErrors", []):
+                        target[owners[err["index"]]] = result
+                elif isinstance(result, Exception):
+                    for i in owners:
+                        target[i] = result
+            for i, error in parent_failed.items():
+                e = entries[i]
+                if i in failed:
+                    continue                # the caller retries the whole interaction
+                attempts = e.get("attempts", 0) + 1
+                if attempts > MONGO_PARENT_RETRIES:
+                    self.stats["parent_dropped"] += 1
+                    log.error("mongo.parent_dropped", filter=str(e["filter"]), interactions=len(e["items"]),
+                              error=repr(error))
+                    continue
+                self.stats["parent_retries"] += 1
+                self._parent_retries.append({**e, "waiters": [], "attempts": attempts})
+            if self._parent_retries and self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._spawn_flush)
+            elapsed_ms = (time.perf_counter() - started) * 1000
+
+            if failed:
+                self.stats["errors"] += len(failed)
+            self.stats["batches"] += 1
+            self.stats["interactions"] += n_items
+            self.stats["upserts"] += n_ops
+            self.stats["last_batch_size"] = n_items
+            self.stats["last_batch_ms"] = round(elapsed_ms, 1)
+            self.stats["max_batch_ms"] = round(max(self.stats["max_batch_ms"], elapsed_ms), 1)
+            (log.warning if failed or parent_failed else log.info)(
+                "mongo.bulk_write", interactions=n_items, users=len(entries), ops=n_ops,
+                ms=round(elapsed_ms), failed=len(failed), parent_failed=len(parent_failed))
+
+            # Only the users whose interactions were not stored see an error (and get retried).
+            for i, e in enumerate(entries):
+                for fut in e["waiters"]:
+                    if fut.done():
+                        continue
+                    if i in failed:
+                        fut.set_exception(failed[i])
+                    else:
+                        fut.set_result(None)
+
+    def _build_ops(self, entry: dict, now: datetime):
+        if self.storage == "buckets":
+            bucket_ops, parent_ops = bucket_write_ops(entry["filter"], entry["items"], entry["set_on_insert"], now)
+            return [(BUCKET_COLLECTION, bucket_ops, True), ("healthlogs", parent_ops, False)]
+        return [("healthlogs", [UpdateOne(
+            entry["filter"],
+            {
+                "$push": {"history": {"$each": entry["items"]}},
+                "$set": {"updated_at": now},
+                "$setOnInsert": {**entry["set_on_insert"], "created_at": now},
+            },
+            upsert=True,
+        )], True)]
+
+    async def close(self):
+        await self.flush()
+        while self._parent_retries:         # bounded by MONGO_PARENT_RETRIES
+            await self.flush()
+        if self._flush_tasks:
+            await asyncio.gather(*self._flush_tasks, return_exceptions=True)
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "pending": self._pending_ops, "parent_retry_pending": len(self._parent_retries)}
@@ -0,0 +1,310 @@
+"""Metrics and structured logging for the Python RAG API.
+
+Metrics are kept in-process and rendered in the Prometheus text exposition
+format on GET /metrics. They are per process: under serve.py each worker
+reports its own series, labelled with its pid, so a scraper that reaches
+workers through the shared port should aggregate with sum()/rate() across
+`pid`. Three primitives, all thread-safe (retrieval runs on executor threads):
+
+    Counter    monotonically increasing, .inc()
+    Gauge      .set()/.inc()/.dec(), or .set_function() evaluated at scrape
+    Histogram  cumulative buckets + sum + count, .observe() / .time()
+
+Logging goes through `get_logger(name)`, a thin wrapper over the stdlib
+logger that takes an event name plus key/value fields:
+
+    log.info("translate.fallback", src="hi-IN", tgt="en-IN", error=str(e))
+
+LOG_FORMAT=json writes one JSON object per line; the default ("text") writes
+`ts LEVEL logger event key=value ...`. LOG_LEVEL sets the threshold.
+"""
+import os
+import sys
+import json
+import time
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, Tuple
+
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO").upper()
+LOG_FORMAT = os.getenv("LOG_FORMAT", "text")
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+
+# ─── Metric primitives ───────────────────────────────────────────────────────
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, labelnames: Iterable[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        REGISTRY.append(self)
+
+    def _key(self, labels: dict) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[n]) for n in self.labelnames)
+
+    def _fmt(self, key: Tuple[str, ...], extra: Dict[str, str] = None) -> str:
+        pairs = list(zip(self.labelnames, key)) + list((extra or {}).items()) + [("pid", str(os.getpid()))]
+        inner = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+        return "{" + inner + "}"
+
+    def render(self) -> Iterable[str]:
+        yield f"# HELP {self.name} {self.help}"
+        yield f"# TYPE {self.name} {self.kind}"
+        yield from self._samples()
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._values: Dict[tuple, float] = {} if self.labelnames else {(): 0.0}
+
+    def inc(self, amount: float = 1.0, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def _samples(self):
+        with self._lock:
+            items = list(self._values.items())
+        for key, v in items:
+            yield f"{self.name}{self._fmt(key)} {_num(v)}"
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def __init__(self, name, help, labelnames=()):
+        super().__init__(name, help, labelnames)
+        self._fn = None
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = float(value)
+
+    def dec(self, amount: float = 1.0, **labels):
+        self.inc(-amount, **labels)
+
+    def set_function(self, fn: Callable[[], Dict[tuple, float]]):
+        """`fn()` returns {label_values_tuple: value} and is called at scrape time."""
+        self._fn = fn
+
+    def _samples(self):
+        if self._fn is not None:
+            try:
+                values = self._fn()
+            except Exception:
+                values = {}
+            for key, v in values.items():
+                yield f"{self.name}{self._fmt(tuple(map(str, key)))} {_num(v)}"
+            return
+        yield from super()._samples()
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[tuple, list] = {}    # key -> [bucket counts..., sum, count]
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            s = self._series.get(key)
+            if s is None:
+                s = self._series[key] = [0] * len(self.buckets) + [0.0, 0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    s[i] += 1
+            s[-2] += value
+            s[-1] += 1
+
+    @contextmanager
+    def time(self, **labels):
+        """Observe the wall time of the block in seconds (also on error)."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def _samples(self):
+        with self._lock:
+            items = [(k, list(s)) for k, s in self._series.items()]
+        for key, s in items:
+            for bound, n in zip(self.buckets, s):
+                yield f"{self.name}_bucket{self._fmt(key, {'le': _num(bound)})} {n}"
+            yield f"{self.name}_bucket{self._fmt(key, {'le': '+Inf'})} {s[-1]}"
+            yield f"{self.name}_sum{self._fmt(key)} {_num(s[-2])}"
+            yield f"{self.name}_count{self._fmt(key)} {s[-1]}"
+
+
+REGISTRY: list = []
+
+
+def _escape(v: str) -> str:
+    return str(v).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _num(v: float) -> str:
+    return repr(float(v)) if v != int(v) else str(int(v))
+
+
+def render_metrics() -> str:
+    return "\n".join(line for m in REGISTRY for line in m.render()) + "\n"
+
+
+# ─── Application metrics ─────────────────────────────────────────────────────
+STAGE_SECONDS = Histogram(
+    "janani_stage_seconds",
+    "Latency of one pipeline stage: translate_in, embed, retrieve (dense, sparse, fusion), "
+    "ttft, generate, translate_out, extract, extract_llm, save",
+    ["stage"])
+REQUEST_SECONDS = Histogram("janani_request_seconds", "HTTP request latency until the last body byte",
+                            ["route", "method"])
+REQUESTS = Counter("janani_requests_total", "HTTP requests by route and status", ["route", "method", "status"])
+IN_FLIGHT = Gauge("janani_in_flight_requests", "HTTP requests being processed")
+CACHE_LOOKUPS = Counter("janani_cache_lookups_total", "Cache lookups", ["cache", "result"])
+TRANSLATIONS = Counter("janani_translations_total",
+                       "Translations by provider (cache, sarvam, groq, passthrough)", ["provider"])
+FALLBACKS = Counter("janani_fallbacks_total",
+                    "Degraded or fallback paths taken (translate_sarvam_to_groq, translate_passthrough, "
+                    "clinical_llm, clinical_default)",
+                    ["kind"])
+ERRORS = Counter("janani_errors_total", "Errors by pipeline stage", ["stage"])
+JOBS_DROPPED = Counter("janani_jobs_dropped_total",
+                       "Background jobs dropped because the job queue was full", ["job"])
+LANGUAGE_ROUTES = Counter("janani_language_routes_total",
+                          "Inbound query routing by detected script and decision "
+                          "(english, romanized_local, translate)", ["script", "decision"])
+HEDGE_DELAY = Gauge("janani_hedge_delay_seconds", "Current adaptive hedge delay (see hedging.py)", ["call"])
+HEDGES = Counter("janani_hedges_total",
+                 "Hedged calls by outcome (primary, primary_won, backup_won, fallback, slow_unhedged)",
+                 ["call", "outcome"])
+LLM_CALLS = Counter("janani_llm_calls_total",
+                    "Groq calls by model, priority class and outcome (ok, error, rate_limited, shed)",
+                    ["model", "priority", "outcome"])
+LLM_QUEUE_SECONDS = Histogram("janani_llm_queue_seconds",
+                              "Time a Groq call waited for rate-limit budget (see llm_scheduler.py)",
+                              ["priority"])
+ADMISSIONS = Counter("janani_admissions_total",
+                     "/ask admission decisions (admitted, queued, rejected, timed_out)", ["outcome"])
+DEADLINES = Counter("janani_deadline_exceeded_total",
+                    "Stages skipped or cut short by the request deadline", ["stage"])
+COMPONENT_STATE = Gauge("janani_component_state",
+                        "Numeric component state sampled at scrape (queue depth, breaker state, ...)",
+                        ["component", "field"])
+
+
+class MetricsMiddleware:
+    """ASGI middleware: in-flight gauge, per-route request counts and latency.
+
+    Latency runs until the response body is complete, so streamed responses
+    (/ask/stream) are timed to their last sentence. Unmatched paths are
+    reported as route="other" to keep label cardinality bounded.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        started = time.perf_counter()
+        status = {"code": 500}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+            await send(message)
+
+        IN_FLIGHT.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            IN_FLIGHT.dec()
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "other"
+            REQUEST_SECONDS.observe(time.perf_counter() - started, route=path, method=scope["method"])
+            REQUESTS.inc(route=path, method=scope["method"], status=status["code"])
+
+
+# ─── Structured logging ──────────────────────────────────────────────────────
+class _JsonFormatter(logging.Formatter):
+    def format(self, record):
+        out = {"ts": self.formatTime(record, "%Y-%m-%dT%H:%M:%S") + f".{int(record.msecs):03d}",
+               "level": record.levelname, "logger": record.name, "event": record.getMessage(), "pid": os.getpid()}
+        out.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            out["exc"] = self.formatException(record.exc_info)
+        return json.dumps(out, ensure_ascii=False, default=str)
+
+
+class _TextFormatter(logging.Formatter):
+    def format(self, record):
+        fields = " ".join(f"{k}={v!r}" if isinstance(v, str) and " " in v else f"{k}={v}"
+                          for k, v in getattr(record, "fields", {}).items())
+        line = f"{self.formatTime(record, '%H:%M:%S')} {record.levelname:<7} {record.name}: {record.getMessage()}"
+        line = f"{line} {fields}" if fields else line
+        if record.exc_info:
+            line += "\n" + self.formatException(record.exc_info)
+        return line
+
+
+_configured = False
+
+
+def _configure():
+    global _configured
+    if _configured:
+        return
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(_JsonFormatter() if LOG_FORMAT == "json" else _TextFormatter())
+    root = logging.getLogger("janani")
+    root.handlers[:] = [handler]
+    root.setLevel(LOG_LEVEL)
+    root.propagate = False
+    _configured = True
+
+
+class StructLogger:
+    def __init__(self, name: str):
+        _configure()
+        self._log = logging.getLogger(f"janani.{name}")
+
+    def _emit(self, level: int, event: str, exc_info=None, **fields):
+        if self._log.isEnabledFor(level):
+            self._log.log(level, event, exc_info=exc_info, extra={"fields": fields})
+
+    def debug(self, event: str, **fields):
+        self._emit(logging.DEBUG, event, **fields)
+
+    def info(self, event: str, **fields):
+        self._emit(logging.INFO, event, **fields)
+
+    def warning(self, event: str, **fields):
+        self._emit(logging.WARNING, event, **fields)
+
+    def error(self, event: str, **fields):
+        self._emit(logging.ERROR, event, **fields)
+
+    def exception(self, event: str, **fields):
+        self._emit(logging.ERROR, event, exc_info=True, **fields)
+
+
+def get_logger(name: str) -> StructLogger:
+    return StructLogger(name)
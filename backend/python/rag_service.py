@@ -1,4 +1,8 @@
 import os
+import time
+import asyncio
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
 from typing import List, Dict, Any
 from dotenv import load_dotenv
 
@@ -8,43 +12,146 @@ from langchain_chroma import Chroma
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder
 from langchain_core.messages import HumanMessage, AIMessage
 from langchain_core.output_parsers import StrOutputParser
+from langchain_core.documents import Document
+
+from index_bundle import resolve_bundle, load_manifest, BundleError
+from bm25_index import BM25Index, reciprocal_rank_fusion
+from context_builder import build_context
+from vector_store import FlatVectorStore, VECTOR_BACKEND, FLAT_DIR
+from observability import get_logger, STAGE_SECONDS
+from llm_scheduler import scheduler, estimate_tokens, WEBSITE
 
 from pathlib import Path
+
+log = get_logger("rag")
 _env_path = Path(__file__).resolve().parent.parent / ".env"
 if _env_path.exists():
     load_dotenv(_env_path)
 else:
     load_dotenv()
 
+# Path to a prebuilt index bundle (or a bundles root with CURRENT); unset = dev mode
+RAG_INDEX_BUNDLE = os.getenv("RAG_INDEX_BUNDLE")
+
+# Retrieval (FastEmbed query embedding + Chroma search) is CPU/IO-bound and
+# synchronous, so async callers run it here instead of on the event loop.
+RAG_EXECUTOR_WORKERS = int(os.getenv("RAG_EXECUTOR_WORKERS", "4"))
+
+# "hybrid" fuses vector and BM25 rankings (RRF); "dense" is vector search only
+RAG_RETRIEVAL_MODE = os.getenv("RAG_RETRIEVAL_MODE", "hybrid")
+RAG_DENSE_K = int(os.getenv("RAG_DENSE_K", "10"))    # candidates from the vector index
+RAG_SPARSE_K = int(os.getenv("RAG_SPARSE_K", "10"))  # candidates from BM25
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "5"))         # chunks handed to the LLM
+RAG_RRF_K = int(os.getenv("RAG_RRF_K", "60"))
+
+# Dev mode: seconds between checks of the index directory for a rebuild
+INDEX_VERSION_CHECK = float(os.getenv("INDEX_VERSION_CHECK", "5"))
+
+# Threads per FastEmbed (ONNX) session. serve.py sets this to cores / workers
+# so worker processes don't oversubscribe the CPU; 0 = onnxruntime default.
+EMBED_THREADS = int(os.getenv("EMBED_THREADS", "0")) or None
+
+# Read-only index state loaded by preload_indexes() in serve.py's master
+# process; forked workers find it here instead of loading their own copy.
+_preloaded: Dict[tuple, Any] = {}
+
+
+def _shared(kind: str, path: str, loader):
+    key = (kind, os.path.abspath(path))
+    return _preloaded[key] if key in _preloaded else loader(path)
+
+
+def preload_indexes(persist_directory: str = "vectordb", bundle_dir: str = RAG_INDEX_BUNDLE) -> List[str]:
+    """Load the read-only parts of the index (bundle manifest, BM25 index,
+    flat vector index) before workers fork. Returns what was loaded.
+
+    Chroma clients and the ONNX embedding session are not fork-safe, so each
+    worker still creates its own; in bundle mode that is a local file load.
+    """
+    _preloaded.clear()
+    if bundle_dir:
+        bundle_dir = resolve_bundle(bundle_dir)
+        _preloaded[("manifest", os.path.abspath(bundle_dir))] = load_manifest(bundle_dir)
+        persist_directory = os.path.join(bundle_dir, "vectordb")
+    flat_dir = os.path.join(bundle_dir or persist_directory, FLAT_DIR)
+    if VECTOR_BACKEND == "flat" and FlatVectorStore.exists(flat_dir):
+        _preloaded[("flat", os.path.abspath(flat_dir))] = FlatVectorStore.load(flat_dir)
+    if RAG_RETRIEVAL_MODE == "hybrid" and BM25Index.exists(persist_directory):
+        _preloaded[("bm25", os.path.abspath(persist_directory))] = BM25Index.load(persist_directory)
+    return [kind for kind, _ in _preloaded]
+
+
 class PregnancyRAGService:
-    def __init__(self, persist_directory: str = "vectordb"):
+    def __init__(self, persist_directory: str = "vectordb", bundle_dir: str = None, phases=None):
+        """Build the service from a prebuilt index bundle (`bundle_dir`, see
+        index_bundle.py) or, for local development, from `persist_directory`,
+        ingesting health_book.txt there first if it is empty.
+
+        `phases`, if given, is a callable(name) returning a context manager;
+        each startup phase runs inside it so the caller can time it.
+        """
+        phase = phases or (lambda name: contextlib.nullcontext())
+        self.executor = ThreadPoolExecutor(max_workers=RAG_EXECUTOR_WORKERS, thread_name_prefix="rag")
+        self.manifest = None
+
         # 1. Initialize LLM (Llama 3 via Groq)
         self.llm = ChatGroq(
             temperature=0.1,
             model_name="llama-3.1-8b-instant",  # Higher rate limits than 70b; fast for voice
-            groq_api_key=os.getenv("GROQ_API_KEY")
+            groq_api_key=os.getenv("GROQ_API_KEY"),
+            max_retries=0,   # 429s and retries are handled by llm_scheduler
         )
 
-        # 2. Initialize Vector DB
-        embeddings = FastEmbedEmbeddings(model_name="BAAI/bge-small-en-v1.5")
-        
-        # Ensure vectordb exists and is populated from health_book.txt
-        index_exists = os.path.exists(persist_directory) and any(os.listdir(persist_directory))
-        if not index_exists:
-            print(f"⚠️ VectorDB at {persist_directory} not found or empty. Initializing from health_book.txt...")
-            from ingest import ingest_docs
-            health_file = "health_book.txt"
-            if os.path.exists(health_file):
-                ingest_docs(health_file, persist_directory)
-            else:
-                print(f"❌ Error: {health_file} not found. RAG service will have no medical context.")
+        if bundle_dir:
+            # Serving mode: load only, never download a model or ingest
+            with phase("bundle_manifest"):
+                bundle_dir = resolve_bundle(bundle_dir)
+                self.manifest = _shared("manifest", bundle_dir, load_manifest)
+                persist_directory = os.path.join(bundle_dir, "vectordb")
+                log.info("rag.bundle", version=self.manifest["version"], chunks=self.manifest["chunks"])
+            with phase("embedding_model"):
+                self.embeddings = FastEmbedEmbeddings(
+                    model_name=self.manifest["embedding_model"],
+                    cache_dir=os.path.join(bundle_dir, "model"),
+                    threads=EMBED_THREADS
+                )
+        else:
+            # 2. Initialize Vector DB
+            with phase("embedding_model"):
+                self.embeddings = FastEmbedEmbeddings(model_name="BAAI/bge-small-en-v1.5", threads=EMBED_THREADS)
 
-        self.vectordb = Chroma(
-            persist_directory=persist_directory,
-            embedding_function=embeddings,
-            collection_name="pregnancy_docs"
-        )
-        self.retriever = self.vectordb.as_retriever(search_kwargs={"k": 5})
+            # Ensure vectordb exists and is populated from health_book.txt
+            index_exists = os.path.exists(persist_directory) and any(os.listdir(persist_directory))
+            if not index_exists:
+                with phase("ingest"):
+                    log.warning("rag.ingest_on_start", persist_directory=persist_directory, source="health_book.txt")
+                    from ingest import ingest_docs
+                    health_file = "health_book.txt"
+                    if os.path.exists(health_file):
+                        ingest_docs(health_file, persist_directory)
+                    else:
+                        log.error("rag.no_source", path=health_file, detail="RAG service will have no medical context")
+
+        with phase("vector_index"):
+            if VECTOR_BACKEND == "flat":
+                # Dense backend: memory-mapped flat index (see vector_store.py)
+                self.vectordb = self._load_flat(os.path.join(bundle_dir or persist_directory, FLAT_DIR),
+                                                persist_directory, in_bundle=bundle_dir is not None)
+            else:
+                self.vectordb = Chroma(
+                    persist_directory=persist_directory,
+                    embedding_function=self.embeddings,
+                    collection_name="pregnancy_docs"
+                )
+        self.bm25 = None
+        if RAG_RETRIEVAL_MODE == "hybrid":
+            with phase("bm25_index"):
+                self.bm25 = self._load_bm25(persist_directory, save=bundle_dir is None)
+        # Changes whenever the index is rebuilt; answer caches key off it.
+        self._persist_directory = persist_directory
+        self._index_version = (self.manifest["version"] if self.manifest
+                               else self._compute_index_version(persist_directory))
+        self._version_checked = time.monotonic()
 
         # 3. Prompt - Expert Prenatal Care Evaluator
         self.rag_prompt = ChatPromptTemplate.from_messages([
@@ -76,42 +183,231 @@ USER QUESTION:
 JANANI RESPONSE:""")
         ])
 
-    def ask_stream(self, query: str, patient_data: str = "None provided", chat_history: list = None):
+    def _load_flat(self, flat_dir: str, persist_directory: str, in_bundle: bool) -> FlatVectorStore:
+        """Load the flat index; in dev mode export it from Chroma if missing."""
+        if not FlatVectorStore.exists(flat_dir):
+            if in_bundle:
+                raise BundleError(f"VECTOR_BACKEND=flat but the bundle has no {FLAT_DIR}/ index; rebuild it")
+            log.warning("rag.flat_export", path=flat_dir, detail="no flat index; exporting it from Chroma")
+            collection = Chroma(persist_directory=persist_directory, collection_name="pregnancy_docs")._collection
+            return FlatVectorStore.from_collection(collection, flat_dir)
+        return _shared("flat", flat_dir, FlatVectorStore.load)
+
+    def _load_bm25(self, persist_directory: str, save: bool):
+        """Load the BM25 index written by ingest.py; indexes built before it
+        existed get one built from the vector store (and saved, outside bundles)."""
+        if BM25Index.exists(persist_directory):
+            return _shared("bm25", persist_directory, BM25Index.load)
+        if isinstance(self.vectordb, FlatVectorStore):
+            bm25 = BM25Index.build(self.vectordb.ids, self.vectordb.texts, self.vectordb.metadatas)
+        else:
+            bm25 = BM25Index.from_collection(self.vectordb._collection)
+        if not bm25.n_docs:
+            log.warning("rag.bm25_disabled", detail="vector collection is empty")
+            return None
+        if save:
+            bm25.save(persist_directory)
+        return bm25
+
+    @property
+    def index_version(self) -> str:
+        """Version of the index being served; the answer cache is cleared when
+        it changes (see SemanticAnswerCache.sync_index_version).
+
+        A bundle never changes under a running service (a reload starts new
+        workers, with new caches). In dev mode ingest.py can rebuild the
+        directory in place, so it is re-stat'ed every INDEX_VERSION_CHECK s.
+        """
+        now = time.monotonic()
+        if self.manifest is None and now - self._version_checked >= INDEX_VERSION_CHECK:
+            self._version_checked = now
+            version = self._compute_index_version(self._persist_directory)
+            if version != self._index_version:
+                log.info("rag.index_changed", old=self._index_version, new=version)
+                self._index_version = version
+        return self._index_version
+
+    @staticmethod
+    def _compute_index_version(persist_directory: str) -> str:
+        sqlite_path = os.path.join(persist_directory, "chroma.sqlite3")
+        if os.path.exists(sqlite_path):
+            st = os.stat(sqlite_path)
+            return f"{st.st_mtime_ns}-{st.st_size}"
+        return "none"
+
+    async def aembed_query(self, query: str) -> list:
+        loop = asyncio.get_running_loop()
+        with STAGE_SECONDS.time(stage="embed"):
+            return await loop.run_in_executor(self.executor, self.embeddings.embed_query, query)
+
+    @staticmethod
+    def _timed(fn, timings: dict, stage: str):
+        """Wrap `fn` to record its wall time as timings[stage] (ms) and in the
+        janani_stage_seconds histogram (stage name without the _ms suffix)."""
+        def run(*args):
+            started = time.perf_counter()
+            try:
+                return fn(*args)
+            finally:
+                elapsed = time.perf_counter() - started
+                timings[stage] = round(elapsed * 1000, 2)
+                STAGE_SECONDS.observe(elapsed, stage=stage.removesuffix("_ms"))
+        return run
+
+    def embed_queries(self, queries: List[str]) -> List[list]:
+        """Embed several queries in one ONNX batch (FastEmbed's query_embed
+        takes an iterable); same vectors as embed_query one by one."""
+        model = getattr(self.embeddings, "_model", None)
+        if model is None:
+            return [self.embeddings.embed_query(q) for q in queries]
+        return [v.tolist() for v in model.query_embed(queries)]
+
+    def _dense_search_many(self, embeddings: List[list], k: int) -> List[List[Document]]:
+        if isinstance(self.vectordb, FlatVectorStore):
+            return self.vectordb.similarity_search_by_vectors(embeddings, k)
+        res = self.vectordb._collection.query(query_embeddings=embeddings, n_results=k,
+                                              include=["documents", "metadatas"])
+        return [[Document(page_content=text, metadata=meta or {}) for text, meta in zip(texts, metas)]
+                for texts, metas in zip(res["documents"], res["metadatas"])]
+
+    def retrieve_batch(self, queries: List[str], embeddings: List[list], timings: dict = None) -> List[List[Document]]:
+        """Hybrid retrieval for many already-embedded queries: one vectorized
+        dense pass for all of them, then BM25 and fusion per query. Stage
+        times (ms) are added to `timings`, so it can accumulate over calls."""
+        timings = {} if timings is None else timings
+
+        def add(stage, started):
+            timings[stage] = round(timings.get(stage, 0.0) + (time.perf_counter() - started) * 1000, 2)
+
+        if not queries:
+            return []
+        started = time.perf_counter()
+        dense = self._dense_search_many(embeddings, RAG_DENSE_K if self.bm25 is not None else RAG_TOP_K)
+        add("dense_ms", started)
+        if self.bm25 is None:
+            return dense
+        started = time.perf_counter()
+        sparse = [self._sparse_search(q) for q in queries]
+        add("sparse_ms", started)
+        started = time.perf_counter()
+        fused = [self._fuse(d, sp) for d, sp in zip(dense, sparse)]
+        add("fusion_ms", started)
+        return fused
+
+    def _sparse_search(self, query: str) -> List[Document]:
+        return [Document(page_content=self.bm25.texts[idx], metadata=self.bm25.metadatas[idx])
+                for idx, _ in self.bm25.search(query, RAG_SPARSE_K)]
+
+    def _fuse(self, dense: List[Document], sparse: List[Document]) -> List[Document]:
+        """Reciprocal rank fusion keyed by chunk text (Chroma results carry no IDs)."""
+        by_text = {}
+        for d in dense + sparse:
+            by_text.setdefault(d.page_content, d)
+        fused = reciprocal_rank_fusion(
+            [[d.page_content for d in dense], [d.page_content for d in sparse]], k=RAG_RRF_K
+        )
+        return [by_text[text] for text, _ in fused[:RAG_TOP_K]]
+
+    def retrieve(self, query: str, timings: dict = None) -> List[Document]:
+        """Synchronous hybrid retrieval (dense, then BM25, then fusion)."""
+        timings = {} if timings is None else timings
+        embedding = self._timed(self.embeddings.embed_query, timings, "embed_ms")(query)
+        if self.bm25 is None:
+            return self._timed(self.vectordb.similarity_search_by_vector, timings, "dense_ms")(embedding, RAG_TOP_K)
+        dense = self._timed(self.vectordb.similarity_search_by_vector, timings, "dense_ms")(embedding, RAG_DENSE_K)
+        sparse = self._timed(self._sparse_search, timings, "sparse_ms")(query)
+        return self._timed(self._fuse, timings, "fusion_ms")(dense, sparse)
+
+    async def aretrieve(self, query: str, query_embedding: list = None, timings: dict = None) -> list:
+        """Run retrieval on the bounded executor.
+
+        In hybrid mode the vector search and the BM25 search run concurrently
+        and are fused with RRF. If the caller already embedded the query (e.g.
+        for the answer cache), search by that vector instead of embedding it a
+        second time. Per-stage wall times (ms) are written into `timings`.
+        """
+        loop = asyncio.get_running_loop()
+        timings = {} if timings is None else timings
+        with STAGE_SECONDS.time(stage="retrieve"):
+            return await self._aretrieve(loop, query, query_embedding, timings)
+
+    async def _aretrieve(self, loop, query: str, query_embedding: list, timings: dict) -> list:
+        async def dense():
+            embedding = query_embedding
+            if embedding is None:
+                embedding = await loop.run_in_executor(
+                    self.executor, self._timed(self.embeddings.embed_query, timings, "embed_ms"), query
+                )
+            return await loop.run_in_executor(
+                self.executor, self._timed(self.vectordb.similarity_search_by_vector, timings, "dense_ms"),
+                embedding, RAG_DENSE_K if self.bm25 is not None else RAG_TOP_K
+            )
+
+        if self.bm25 is None:
+            return await dense()
+        dense_docs, sparse_docs = await asyncio.gather(
+            dense(),
+            loop.run_in_executor(self.executor, self._timed(self._sparse_search, timings, "sparse_ms"), query),
+        )
+        return self._timed(self._fuse, timings, "fusion_ms")(dense_docs, sparse_docs)
+
+    async def aask_stream(self, query: str, patient_data: str = "None provided", chat_history: list = None,
+                          query_embedding: list = None, timings: dict = None, context_stats: dict = None,
+                          priority: str = WEBSITE):
+        """Answer `query`: retrieval off-loop, generation via Groq's async stream.
+
+        The prompt context is token-budgeted (see context_builder.py); its
+        stats, including tokens_saved, are written into `context_stats`.
+        Generation is scheduled under `priority` (see llm_scheduler.py).
+        """
         if chat_history is None:
             chat_history = []
-            
+
         # 1. Retrieve
-        docs = self.retriever.invoke(query)
-        context = "\n\n".join([d.page_content for d in docs])
-        
+        docs = await self.aretrieve(query, query_embedding, timings)
+
         # 2. Streaming Generation
+        async for chunk in self.astream_answer(query, docs, patient_data, chat_history, context_stats, priority):
+            yield chunk
+
+    async def astream_answer(self, query: str, docs: List[Document], patient_data: str = "None provided",
+                             chat_history: list = None, context_stats: dict = None, priority: str = WEBSITE):
+        """Generate the answer from already-retrieved `docs` (see aask_stream)."""
+        context, stats = build_context(query, docs)
+        if context_stats is not None:
+            context_stats.update(stats)
+
         generation_chain = self.rag_prompt | self.llm | StrOutputParser()
-        
-        full_answer = ""
-        for chunk in generation_chain.stream({
-            "chat_history": chat_history,
+        inputs = {
+            "chat_history": chat_history or [],
             "context": context,
             "question": query,
             "patient_data": patient_data
-        }):
-            # VOICE-OPTIMIZATION: Strip asterisks and other markdown on the fly
-            clean_chunk = chunk.replace("*", "").replace("#", "").replace("- ", "")
-            full_answer += clean_chunk
-            yield clean_chunk
-
-        # Return sources after stream (not possible in generator easily, handle in main)
-        # We will expose a method to get sources for a query if needed, or just return them with the stream.
-        # Let's just return the answer chunks for now.
-
-    def get_context_and_sources(self, query: str):
-        docs = self.retriever.invoke(query)
-        context = "\n\n".join([d.page_content for d in docs])
-        sources = list(set([d.metadata.get("source", "Unknown") for d in docs]))
-        return context, sources
+        }
+        prompt_tokens = estimate_tokens(self.rag_prompt.format(**inputs))
+
+        started, first = time.perf_counter(), True
+        async for chunk in scheduler.stream(self.llm.model_name, priority, prompt_tokens,
+                                            lambda: generation_chain.astream(inputs)):
+            if first:
+                STAGE_SECONDS.observe(time.perf_counter() - started, stage="ttft")
+                first = False
+            yield chunk.replace("*", "").replace("#", "").replace("- ", "")
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="generate")
+
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
 
 if __name__ == "__main__":
     # Quick test (Requires API Key in .env)
-    service = PregnancyRAGService()
-    res = service.ask("What should I do about morning sickness?", "Patient is allergic to ginger.")
-    print(f"Answer: {res['answer']}")
-    print(f"Sources: {res['sources']}")
+    import asyncio
+
+    async def _main():
+        service = PregnancyRAGService()
+        async for chunk in service.aask_stream("What should I do about morning sickness?",
+                                               "Patient is allergic to ginger."):
+            print(chunk, end="", flush=True)
+        print()
+
+    asyncio.run(_main())
@@ -0,0 +1,126 @@
+import os
+import time
+import asyncio
+import importlib.util
+from typing import Optional
+
+import httpx
+
+# ─── Configuration ───────────────────────────────────────────────────────────
+SARVAM_BASE_URL = os.getenv("SARVAM_BASE_URL", "https://api.sarvam.ai")
+SARVAM_TIMEOUT = float(os.getenv("SARVAM_TIMEOUT", "15"))
+SARVAM_MAX_CONNECTIONS = int(os.getenv("SARVAM_MAX_CONNECTIONS", "20"))
+SARVAM_MAX_CONCURRENCY = int(os.getenv("SARVAM_MAX_CONCURRENCY", "10"))
+SARVAM_BREAKER_THRESHOLD = int(os.getenv("SARVAM_BREAKER_THRESHOLD", "5"))
+SARVAM_BREAKER_COOLDOWN = float(os.getenv("SARVAM_BREAKER_COOLDOWN", "30"))
+
+# HTTP/2 needs the optional `h2` package; fall back to HTTP/1.1 keep-alive without it.
+HTTP2_AVAILABLE = importlib.util.find_spec("h2") is not None
+
+
+class SarvamUnavailable(Exception):
+    """Raised when a Sarvam call fails or the circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker: closed → open → half-open → closed.
+
+    After `threshold` consecutive failures the breaker opens and rejects calls
+    for `cooldown` seconds. The first call after that is let through as a
+    probe; success closes the breaker, failure re-opens it.
+    """
+
+    def __init__(self, threshold: int = SARVAM_BREAKER_THRESHOLD, cooldown: float = SARVAM_BREAKER_COOLDOWN):
+        self.threshold = threshold
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened_at: Optional[float] = None
+        self._probe_in_flight = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half-open" and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+
+    def release(self):
+        """A call was cancelled before its outcome was known (e.g. it lost a
+        hedge): free the probe slot without counting a success or failure."""
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.opened_at is not None or self.failures >= self.threshold:
+            self.opened_at = time.monotonic()
+
+
+class SarvamClient:
+    """Application-lifetime pooled client for the Sarvam REST API."""
+
+    def __init__(self, api_key: Optional[str], base_url: str = SARVAM_BASE_URL):
+        self.api_key = api_key
+        self.breaker = CircuitBreaker()
+        self._semaphore = asyncio.Semaphore(SARVAM_MAX_CONCURRENCY)
+        self._client = httpx.AsyncClient(
+            base_url=base_url,
+            timeout=httpx.Timeout(SARVAM_TIMEOUT, connect=5.0),
+            limits=httpx.Limits(
+                max_connections=SARVAM_MAX_CONNECTIONS,
+                max_keepalive_connections=SARVAM_MAX_CONNECTIONS,
+                keepalive_expiry=60,
+            ),
+            http2=HTTP2_AVAILABLE,
+            headers={"api-subscription-key": api_key or "", "Content-Type": "application/json"},
+        )
+
+    async def translate(self, text: str, src_code: str, tgt_code: str) -> str:
+        """POST /translate. Raises SarvamUnavailable on any failure."""
+        if not self.breaker.allow():
+            raise SarvamUnavailable("circuit open")
+
+        try:
+            async with self._semaphore:
+                r = await self._client.post("/translate", json={
+                    "input": text,
+                    "source_language_code": src_code,
+                    "target_language_code": tgt_code,
+                    "speaker_gender": "Female",
+                    "mode": "formal"
+                })
+        except asyncio.CancelledError:
+            self.breaker.release()
+            raise
+        except Exception as e:
+            self.breaker.record_failure()
+            raise SarvamUnavailable(f"{type(e).__name__}: {e}") from e
+
+        # 4xx other than 429 means the request itself was bad, not that Sarvam is down.
+        if r.status_code >= 500 or r.status_code == 429:
+            self.breaker.record_failure()
+            raise SarvamUnavailable(f"HTTP {r.status_code}: {r.text[:120]}")
+        if r.status_code != 200:
+            self.breaker.record_success()
+            raise SarvamUnavailable(f"HTTP {r.status_code}: {r.text[:120]}")
+
+        self.breaker.record_success()
+        return r.json().get("translated_text", text)
+
+    async def aclose(self):
+        await self._client.aclose()
@@ -0,0 +1,244 @@
+"""Multi-process server for api.py.
+
+    python serve.py [--workers N] [--host 0.0.0.0] [--port 8000]
+
+The master process binds the listening socket, loads the read-only index
+state once (bundle manifest, BM25 index, flat vector index; see
+rag_service.preload_indexes) and forks SERVE_WORKERS uvicorn workers (default:
+the usable cores, at most SERVE_MAX_WORKERS) that all accept on the shared
+socket. Workers inherit the preloaded objects copy-on-write, and the flat
+index is an mmap, so its pages exist once in the page cache however many
+workers there are. Serve with VECTOR_BACKEND=flat to get that; a Chroma
+client cannot be shared and is opened per worker.
+
+Each worker imports api.py after the fork: the Mongo client, HTTP pools,
+thread pools and the ONNX embedding session are not fork-safe. The ONNX
+session gets EMBED_THREADS = cores / workers threads so N workers use N
+cores without oversubscribing them. Limits that are per process but meant
+for the whole server (the Groq quota in LLM_RATE_LIMITS, ASK_MAX_CONCURRENCY
+and ASK_QUEUE_SIZE) are scaled by SERVE_WORKER_SHARE = 1 / workers, so the
+workers together stay within them.
+
+Signals to the master:
+    SIGHUP          graceful reload: preload again (a new bundle CURRENT is
+                    picked up), start a new generation of workers, and stop
+                    the old one once every new worker reports ready
+    SIGTERM/SIGINT  graceful stop: workers finish in-flight requests and
+                    drain their job queues before exiting
+A worker that dies unexpectedly is replaced.
+"""
+import os
+import sys
+import gc
+import time
+import select
+import signal
+import socket
+import asyncio
+
+
+def _usable_cores() -> int:
+    """Cores this process may run on; os.cpu_count() is the host's, even in a container."""
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:                 # not available on macOS
+        return os.cpu_count() or 1
+
+
+# Every worker loads its own ONNX embedder, so the default stays small even on
+# big hosts (a container's CPU quota does not show in the affinity mask)
+SERVE_MAX_WORKERS = int(os.getenv("SERVE_MAX_WORKERS", "4"))
+SERVE_WORKERS = int(os.getenv("SERVE_WORKERS", "0")) or max(1, min(_usable_cores(), SERVE_MAX_WORKERS))
+SERVE_RELOAD_TIMEOUT = float(os.getenv("SERVE_RELOAD_TIMEOUT", "180"))
+SERVE_GRACEFUL_TIMEOUT = int(os.getenv("SERVE_GRACEFUL_TIMEOUT", "30"))
+# A worker exiting sooner than this after its fork counts as a crash loop
+_MIN_WORKER_LIFETIME = 5.0
+
+
+def _configure_threads(workers: int):
+    """Split the cores and the server-wide limits between workers. Must run
+    before numpy/onnxruntime (and llm_scheduler/admission) load."""
+    per_worker = str(max(1, _usable_cores() // workers))
+    os.environ.setdefault("EMBED_THREADS", per_worker)
+    os.environ.setdefault("SERVE_WORKER_SHARE", str(1.0 / workers))
+    for var in ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS"):
+        os.environ.setdefault(var, "1")
+
+
+def _run_worker(sock: socket.socket, ready_fd: int, host: str, port: int):
+    """Body of a forked worker; never returns."""
+    for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT, signal.SIGCHLD):
+        signal.signal(sig, signal.SIG_DFL)
+    import uvicorn
+
+    config = uvicorn.Config("api:app", host=host, port=port, lifespan="on",
+                            timeout_graceful_shutdown=SERVE_GRACEFUL_TIMEOUT)
+    server = uvicorn.Server(config)
+
+    async def report_ready():
+        import api
+        while api.startup_phases.ready_at is None:
+            await asyncio.sleep(0.2)
+        os.write(ready_fd, f"{os.getpid()}\n".encode())
+
+    async def main():
+        reporter = asyncio.create_task(report_ready())
+        try:
+            await server.serve(sockets=[sock])
+        finally:
+            reporter.cancel()
+
+    code = 0
+    try:
+        asyncio.run(main())
+    except Exception:
+        import traceback; traceback.print_exc()
+        code = 1
+    sys.stdout.flush()
+    os._exit(code)
+
+
+class Supervisor:
+    def __init__(self, workers: int, host: str, port: int):
+        self.workers = workers
+        self.host = host
+        self.port = port
+        self.children = {}        # pid -> (generation, started_at)
+        self.ready = set()        # pids that reported ready
+        self.generation = None    # generation serving traffic
+        self.pending = None       # generation being started by a reload
+        self._last_generation = 0
+        self.reload_started = None
+        self.stopping = False
+        self.pending_signals = []
+
+    # ─── Lifecycle ───────────────────────────────────────────────────────────
+    def _preload(self):
+        import rag_service
+        started = time.perf_counter()
+        gc.unfreeze()
+        loaded = rag_service.preload_indexes()
+        gc.collect()
+        gc.freeze()   # keep the preloaded objects out of the collector, so forks don't dirty their pages
+        print(f"📚 Preloaded {', '.join(loaded) or 'nothing'} in {time.perf_counter() - started:.1f}s")
+
+    def _spawn(self, generation: int):
+        pid = os.fork()
+        if pid == 0:
+            os.close(self.ready_r)
+            _run_worker(self.sock, self.ready_w, self.host, self.port)
+        self.children[pid] = (generation, time.monotonic())
+        return pid
+
+    def _start_generation(self) -> int:
+        self._last_generation += 1
+        for _ in range(self.workers):
+            self._spawn(self._last_generation)
+        print(f"👷 Generation {self._last_generation}: {self.workers} workers on {self.host}:{self.port}")
+        return self._last_generation
+
+    def _stop_generation(self, generation):
+        """SIGTERM the workers of `generation` (None = all workers)."""
+        for pid, (gen, _) in list(self.children.items()):
+            if generation is None or gen == generation:
+                _kill(pid, signal.SIGTERM)
+
+    def run(self):
+        if not hasattr(os, "fork"):
+            print("⚠️ os.fork is unavailable on this platform; serving with a single process.")
+            import uvicorn
+            uvicorn.run("api:app", host=self.host, port=self.port)
+            return
+
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.sock.bind((self.host, self.port))
+        self.sock.listen(2048)
+        self.sock.set_inheritable(True)
+        self.ready_r, self.ready_w = os.pipe()
+
+        for sig in (signal.SIGHUP, signal.SIGTERM, signal.SIGINT):
+            signal.signal(sig, lambda s, _f: self.pending_signals.append(s))
+
+        self._preload()
+        self.generation = self._start_generation()
+        buf = b""
+        while self.children or not self.stopping:
+            self._handle_signals()
+            readable, _, _ = select.select([self.ready_r], [], [], 0.5)
+            if readable:
+                buf += os.read(self.ready_r, 4096)
+                *lines, buf = buf.split(b"\n")
+                self.ready.update(int(line) for line in lines if line)
+            self._reap()
+            self._advance_reload()
+        self.sock.close()
+        print("👋 All workers stopped")
+
+    def _handle_signals(self):
+        while self.pending_signals:
+            sig = self.pending_signals.pop(0)
+            if sig == signal.SIGHUP and not self.stopping:
+                if self.pending is not None:
+                    print("⚠️ Reload already in progress")
+                    continue
+                print("🔄 Reloading: starting a new generation of workers...")
+                self._preload()
+                self.reload_started = time.monotonic()
+                self.pending = self._start_generation()
+            elif sig in (signal.SIGTERM, signal.SIGINT) and not self.stopping:
+                print(f"🛑 {signal.Signals(sig).name}: stopping workers gracefully...")
+                self.stopping = True
+                self.pending = None
+                self._stop_generation(None)
+
+    def _reap(self):
+        while True:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            gen, started = self.children.pop(pid, (None, None))
+            self.ready.discard(pid)
+            if gen is None or self.stopping or gen not in (self.generation, self.pending):
+                continue
+            code = os.waitstatus_to_exitcode(status)
+            print(f"⚠️ Worker {pid} exited ({code}); replacing it")
+            if time.monotonic() - started < _MIN_WORKER_LIFETIME:
+                time.sleep(1.0)    # don't fork-bomb on a worker that crashes at startup
+            self._spawn(gen)
+
+    def _advance_reload(self):
+        if self.pending is None:
+            return
+        new = [pid for pid, (gen, _) in self.children.items() if gen == self.pending]
+        if len(new) == self.workers and all(pid in self.ready for pid in new):
+            print(f"✅ Generation {self.pending} ready; stopping generation {self.generation}")
+            old, self.generation, self.pending = self.generation, self.pending, None
+            self._stop_generation(old)
+        elif time.monotonic() - self.reload_started > SERVE_RELOAD_TIMEOUT:
+            print(f"❌ Generation {self.pending} not ready after {SERVE_RELOAD_TIMEOUT:.0f}s; "
+                  f"keeping generation {self.generation}")
+            failed, self.pending = self.pending, None
+            self._stop_generation(failed)
+
+
+def _kill(pid: int, sig: int):
+    try:
+        os.kill(pid, sig)
+    except ProcessLookupError:
+        pass
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Serve api.py with multiple pre-forked workers.")
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=int(os.getenv("PYTHON_PORT", "8000")))
+    args = parser.parse_args()
+
+    _configure_threads(args.workers)
+    Supervisor(args.workers, args.host, args.port).run()
@@ -0,0 +1,223 @@
+"""Server-side conversation sessions.
+
+Clients used to send `history` with every /ask; the server now keeps it. A
+session is keyed like the health logs ("phone:..." / "email:...", see
+health_buckets.user_key_for) and holds the conversation in English, as it
+is sent to the LLM:
+
+    {_id: "phone:+9198...", summary: "...", turns: [{role, content}, ...], version, updated_at}
+
+Sessions live in an in-process LRU (SESSION_CACHE_SIZE) in front of the
+SESSION_COLLECTION in MongoDB. Under serve.py a user's requests land on any
+worker, so MongoDB is the source of truth: new turns are `$push`ed by a
+background job (never written back as a whole array), every write bumps
+`version`, and a cached session older than SESSION_RECHECK seconds is
+re-read when its version no longer matches. The prompt gets the rolling
+summary plus the newest turns that fit in SESSION_HISTORY_TOKENS. When the
+stored turns outgrow that budget, the oldest are folded into the summary
+(by the `summarize` callable, an LLM call off the request path, or locally
+if it fails) until they fit in half of it; that write only applies if no
+other worker has written the session since it was read. Sessions idle for
+SESSION_TTL start over.
+"""
+import os
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, List, Optional
+
+from pymongo import ASCENDING, ReturnDocument
+
+from observability import get_logger
+from llm_scheduler import estimate_tokens
+
+log = get_logger("sessions")
+
+# ─── Configuration ───────────────────────────────────────────────────────────
+SESSIONS = os.getenv("SESSIONS", "on") == "on"
+SESSION_COLLECTION = os.getenv("SESSION_COLLECTION", "sessions")
+SESSION_CACHE_SIZE = int(os.getenv("SESSION_CACHE_SIZE", "5000"))
+SESSION_TTL = float(os.getenv("SESSION_TTL", str(7 * 24 * 3600)))
+# Seconds a cached session is served without checking MongoDB for newer turns
+SESSION_RECHECK = float(os.getenv("SESSION_RECHECK", "2"))
+SESSION_HISTORY_TOKENS = int(os.getenv("SESSION_HISTORY_TOKENS", "600"))
+SESSION_SUMMARY_TOKENS = int(os.getenv("SESSION_SUMMARY_TOKENS", "150"))
+_FOLD_CHARS = 120   # per turn in the local fallback summary
+
+
+class Session:
+    __slots__ = ("key", "summary", "turns", "version", "pending", "compacting")
+
+    def __init__(self, key: str, summary: str = "", turns: list = None, version: int = 0):
+        self.key = key
+        self.summary = summary
+        self.turns = turns or []
+        self.version = version      # of the stored document this state reflects
+        self.pending = []           # turns appended here and not yet written
+        self.compacting = False
+
+    def refresh(self, doc: Optional[dict]):
+        """Adopt the stored state (another worker may have added turns); keep unwritten turns."""
+        doc = doc or {}
+        self.summary = doc.get("summary", "")
+        self.turns = doc.get("turns", []) + self.pending
+        self.version = doc.get("version", 0)
+
+
+def turn_tokens(turn: dict) -> int:
+    return estimate_tokens(turn["content"]) + 4   # role + message framing
+
+
+def recent_turns(turns: List[dict], budget: int = SESSION_HISTORY_TOKENS) -> List[dict]:
+    """The newest turns whose tokens fit in `budget`, oldest first."""
+    kept, used = [], 0
+    for turn in reversed(turns):
+        used += turn_tokens(turn)
+        if used > budget:
+            break
+        kept.append(turn)
+    return kept[::-1]
+
+
+def fold_locally(summary: str, turns: List[dict]) -> str:
+    """Fallback summary: the start of each folded user turn, trimmed to SESSION_SUMMARY_TOKENS."""
+    lines = [line for line in summary.split("\n") if line]
+    lines += [f"Asked: {t['content'][:_FOLD_CHARS].strip()}" for t in turns if t["role"] == "user"]
+    while len(lines) > 1 and estimate_tokens("\n".join(lines)) > SESSION_SUMMARY_TOKENS:
+        lines.pop(0)
+    return "\n".join(lines)
+
+
+async def ensure_indexes(db):
+    await db[SESSION_COLLECTION].create_index([("updated_at", ASCENDING)], expireAfterSeconds=int(SESSION_TTL))
+
+
+class SessionStore:
+    """Bounded in-process LRU of sessions in front of MongoDB."""
+
+    def __init__(self, db, max_size: int = SESSION_CACHE_SIZE, ttl: float = SESSION_TTL):
+        self.collection = db[SESSION_COLLECTION]
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()   # key -> (Session, expires_at, checked_at)
+        self.stats = {"memory_hits": 0, "rechecks": 0, "stale": 0, "db_hits": 0, "misses": 0,
+                      "evictions": 0, "compactions": 0, "local_compactions": 0, "compaction_conflicts": 0}
+
+    def _remember(self, session: Session, checked_at: float = None):
+        now = time.monotonic()
+        if checked_at is None:
+            entry = self._lru.get(session.key)
+            checked_at = entry[2] if entry is not None else now
+        self._lru[session.key] = (session, now + self.ttl, checked_at)
+        self._lru.move_to_end(session.key)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def get(self, key: str) -> Session:
+        """The session for `key`; a new, empty one if there is none (or MongoDB is down)."""
+        entry = self._lru.get(key)
+        now = time.monotonic()
+        cached = entry[0] if entry is not None and now <= entry[1] else None
+        if cached is not None:
+            session, checked_at = cached, entry[2]
+            if now - checked_at <= SESSION_RECHECK:
+                self.stats["memory_hits"] += 1
+                self._remember(session)
+                return session
+            try:
+                stored = await self.collection.find_one({"_id": key}, {"version": 1})
+            except Exception as e:
+                log.warning("session.recheck_failed", key=key, error=repr(e))
+                self._remember(session)
+                return session
+            self.stats["rechecks"] += 1
+            if (stored or {}).get("version", 0) == session.version:
+                self._remember(session, now)
+                return session
+            self.stats["stale"] += 1     # another worker wrote it; re-read below
+
+        doc = None
+        try:
+            doc = await self.collection.find_one({"_id": key})
+        except Exception as e:
+            log.warning("session.load_failed", key=key, error=repr(e))
+        if doc and doc.get("updated_at", datetime.min) < datetime.utcnow() - timedelta(seconds=self.ttl):
+            # Idle too long: start over rather than $push onto the old turns
+            try:
+                await self.collection.delete_one({"_id": key, "version": doc.get("version", 0)})
+            except Exception as e:
+                log.warning("session.expire_failed", key=key, error=repr(e))
+            doc = None
+        self.stats["db_hits" if doc else "misses"] += 1
+        session = cached or Session(key)
+        session.refresh(doc)
+        self._remember(session, time.monotonic())
+        return session
+
+    def append(self, session: Session, user_text: str, assistant_text: str):
+        """Record a turn in memory; the next request sees it at once. Persist with `save`."""
+        turns = [{"role": "user", "content": user_text}, {"role": "assistant", "content": assistant_text}]
+        session.turns.extend(turns)
+        session.pending.extend(turns)
+        self._remember(session)
+
+    async def save(self, session: Session, summarize: Callable[[str, list], Awaitable[str]] = None):
+        """Background job: append the unwritten turns, then compact if the session outgrew the budget."""
+        pending, session.pending = session.pending, []
+        if pending:
+            try:
+                doc = await self.collection.find_one_and_update(
+                    {"_id": session.key},
+                    {"$push": {"turns": {"$each": pending}}, "$inc": {"version": 1},
+                     "$set": {"updated_at": datetime.utcnow()}},
+                    upsert=True, return_document=ReturnDocument.AFTER,
+                )
+            except Exception:
+                session.pending[:0] = pending       # retried by the next save
+                raise
+            session.refresh(doc)
+            self._remember(session, time.monotonic())
+        await self._compact(session, summarize)
+
+    async def _compact(self, session: Session, summarize):
+        if session.compacting or sum(map(turn_tokens, session.turns)) <= SESSION_HISTORY_TOKENS:
+            return
+        stored = len(session.turns) - len(session.pending)    # compact only what is in MongoDB
+        folded = session.turns[:len(session.turns) - len(recent_turns(session.turns, SESSION_HISTORY_TOKENS // 2))]
+        folded = folded[:stored]
+        if not folded:
+            return
+        version = session.version
+        session.compacting = True
+        try:
+            summary: Optional[str] = None
+            if summarize is not None:
+                try:
+                    summary = (await summarize(session.summary, folded)).strip()
+                except Exception as e:
+                    log.warning("session.summarize_failed", key=session.key, error=repr(e))
+            if not summary:
+                summary = fold_locally(session.summary, folded)
+                self.stats["local_compactions"] += 1
+            # Drop the folded turns by keeping the last `stored - folded`, unless
+            # another worker has written the session since `version`
+            result = await self.collection.update_one(
+                {"_id": session.key, "version": version},
+                {"$set": {"summary": summary, "updated_at": datetime.utcnow()},
+                 "$push": {"turns": {"$each": [], "$slice": -(stored - len(folded))}},
+                 "$inc": {"version": 1}},
+            )
+            if not result.matched_count:
+                self.stats["compaction_conflicts"] += 1     # the next save compacts the fresh state
+                return
+            if session.version == version:
+                session.summary = summary
+                del session.turns[:len(folded)]     # turns appended meanwhile stay
+                session.version += 1
+            self.stats["compactions"] += 1
+        finally:
+            session.compacting = False
+
+    def snapshot(self) -> dict:
+        return {**self.stats, "size": len(self._lru)}
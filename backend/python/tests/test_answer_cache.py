@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from answer_cache import SemanticAnswerCache, is_follow_up, patient_context_key
+
+
+@pytest.mark.parametrize("query", [
+    "Is papaya safe in pregnancy?",
+    "Is it safe to eat papaya during pregnancy?",
+    "What foods are rich in iron?",
+    "Is it okay if I sleep on my back?",
+])
+def test_standalone_questions_are_not_follow_ups(query):
+    assert not is_follow_up(query)
+
+
+@pytest.mark.parametrize("query", [
+    "Is it normal?",
+    "Is that normal?",
+    "and at night?",
+    "What about the third trimester?",
+    "Can I take it with milk?",
+    "why?",
+])
+def test_follow_ups(query):
+    assert is_follow_up(query)
+
+
+def test_identified_caller_with_history_gets_a_cache_hit():
+    cache = SemanticAnswerCache(dim=4, capacity=8)
+    context = patient_context_key("20 weeks pregnant")
+    papaya = np.array([1.0, 0.2, 0.0, 0.0])
+    # A first-time caller's answer is cached...
+    cache.store(papaya, context, "Ripe papaya is safe in moderation.")
+    # ... and served to a returning caller (session history present) asking
+    # the same standalone question, not only to callers without history.
+    query, history = "Is papaya safe in pregnancy?", ["earlier turn"]
+    use_cache = not (history and is_follow_up(query))
+    assert use_cache
+    assert cache.lookup(papaya * 1.01, context) == "Ripe papaya is safe in moderation."
+    assert cache.snapshot()["hits"] == 1
+
+
+def test_answers_do_not_cross_patient_contexts():
+    cache = SemanticAnswerCache(dim=4, capacity=8)
+    v = np.array([0.0, 1.0, 0.0, 0.0])
+    cache.store(v, patient_context_key("10 weeks pregnant"), "first trimester answer")
+    assert cache.lookup(v, patient_context_key("30 weeks pregnant")) is None
+    assert cache.lookup(v, patient_context_key("10 weeks pregnant, diabetes")) is None
+    assert cache.lookup(v, patient_context_key("12 weeks pregnant")) == "first trimester answer"
@@ -0,0 +1,56 @@
+import asyncio
+
+from background_jobs import JobQueue
+
+
+def test_submit_drops_instead_of_waiting_when_the_queue_is_full():
+    async def scenario():
+        jobs = JobQueue(workers=1, maxsize=2)
+        release = asyncio.Event()
+        done = []
+
+        async def blocked():
+            await release.wait()
+
+        async def record(i):
+            done.append(i)
+
+        jobs.start()
+        assert jobs.submit("blocked", blocked)
+        await asyncio.sleep(0)                    # the worker takes it; the queue is empty
+        assert jobs.submit("record", record, 1)
+        assert jobs.submit("record", record, 2)
+        assert not jobs.submit("record", record, 3)
+        assert jobs.snapshot()["dropped"] == 1
+        release.set()
+        await jobs.stop(timeout=1)
+        return done
+
+    assert asyncio.run(scenario()) == [1, 2]
+
+
+def test_workers_submitting_into_a_full_queue_do_not_deadlock():
+    async def scenario():
+        jobs = JobQueue(workers=2, maxsize=2)
+        saved = []
+
+        async def save(i):
+            saved.append(i)
+
+        async def finalize(i):
+            # Like finalize_interaction handing a failed save back to the queue
+            jobs.submit("save", save, i)
+
+        jobs.start()
+        for i in range(20):
+            jobs.submit("finalize", finalize, i)
+            await asyncio.sleep(0)
+        await asyncio.wait_for(jobs.stop(timeout=1), 2)
+        stats = jobs.snapshot()
+        return saved, stats
+
+    saved, stats = asyncio.run(scenario())
+    assert stats["in_progress"] == 0 and stats["queue_depth"] == 0
+    assert stats["completed"] == stats["submitted"]
+    # Every turn was either saved or dropped (and counted), never stuck
+    assert len(saved) + stats["dropped"] == 20
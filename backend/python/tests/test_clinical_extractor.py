@@ -0,0 +1,75 @@
+import pytest
+
+from clinical_extractor import CLINICAL_LLM_MIN_CONFIDENCE, extract_clinical
+
+
+@pytest.mark.parametrize("turn", [
+    "Should I worry about spotting?",
+    "What are the signs of preeclampsia like blurred vision and swelling?",
+    "Is swelling normal in pregnancy?",
+    "mujhe bukhar hai kya",
+    "can i take paracetamol for headache?",
+])
+def test_questions_are_not_reported_symptoms(turn):
+    data, _ = extract_clinical(turn)
+    assert data["symptoms"] == []
+    assert data["medications"] == []
+    assert data["severity"] == 1
+
+
+def test_question_about_the_speaker_goes_to_the_llm():
+    _, confidence = extract_clinical("Should I worry about spotting?")
+    assert confidence < CLINICAL_LLM_MIN_CONFIDENCE
+    _, confidence = extract_clinical("Is swelling normal in pregnancy?")
+    assert confidence >= CLINICAL_LLM_MIN_CONFIDENCE
+
+
+def test_statement_next_to_a_question_is_kept():
+    data, _ = extract_clinical("I have bleeding, should I worry?")
+    assert data["symptoms"] == ["vaginal bleeding"]
+    data, _ = extract_clinical("I have a headache. Is it normal?")
+    assert data["symptoms"] == ["headache"]
+
+
+def test_relief_applies_across_the_sentence():
+    data, _ = extract_clinical("I had fever last week, it went away")
+    assert data["relief_noted"] is True
+    assert data["severity"] < 6
+    assert "relief from fever" in data["summary"]
+
+
+def test_relief_in_a_later_clause_stays_with_its_own_symptom():
+    data, _ = extract_clinical("I have fever, my headache went away")
+    assert data["severity"] == 6
+    assert "reports fever" in data["summary"]
+    assert "relief from headache" in data["summary"]
+
+
+def test_past_symptom_does_not_count_towards_severity():
+    data, _ = extract_clinical("I had fever last week")
+    assert data["severity"] < 6
+    assert "earlier fever" in data["summary"]
+
+
+def test_past_red_flag_goes_to_the_llm():
+    data, confidence = extract_clinical("I had bleeding yesterday")
+    assert data["symptoms"] == ["vaginal bleeding"]
+    assert confidence < CLINICAL_LLM_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("turn", ["I don't have any bleeding", "no fever", "sar dard nahi hai"])
+def test_negated_symptoms_are_dropped(turn):
+    data, _ = extract_clinical(turn)
+    assert data["symptoms"] == []
+
+
+def test_negated_relief_keeps_the_symptom_active():
+    data, _ = extract_clinical("the bleeding has not stopped")
+    assert data["relief_noted"] is False
+    assert data["severity"] == 9
+
+
+def test_reduced_fetal_movement():
+    data, _ = extract_clinical("baby is moving less since yesterday")
+    assert data["fetal_movement"] == "No"
+    assert data["severity"] >= 8
@@ -0,0 +1,146 @@
+import asyncio
+import copy
+from datetime import datetime
+
+from bson import ObjectId
+
+import health_buckets as hb
+
+T = datetime(2026, 10, 1, 9)
+
+
+def _matches(doc: dict, query: dict) -> bool:
+    for key, cond in query.items():
+        if key == "history.0":
+            key, value = "history", (doc.get("history") or [None])[0]
+        else:
+            value = doc.get(key)
+        if isinstance(cond, dict):
+            for op, arg in cond.items():
+                if op == "$exists" and (value is not None) != arg:
+                    return False
+                if op == "$in" and value not in arg:
+                    return False
+                if op == "$ne" and value == arg:
+                    return False
+                if op == "$lt" and not (value is not None and value < arg):
+                    return False
+        elif value != cond:
+            return False
+    return True
+
+
+class FakeCursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    async def _iter(self):
+        for doc in self.docs:
+            yield copy.deepcopy(doc)
+
+    def __aiter__(self):
+        return self._iter()
+
+
+class FakeCollection:
+    """The subset of a motor collection the migration and bucket writes use."""
+
+    def __init__(self, docs=None):
+        self.docs = docs or []
+
+    def find(self, query, projection=None):
+        return FakeCursor([d for d in self.docs if _matches(d, query)])
+
+    async def update_one(self, query, update, upsert=False):
+        doc = next((d for d in self.docs if _matches(d, query)), None)
+        if doc is None:
+            if not upsert:
+                return
+            doc = {k: v for k, v in query.items() if not isinstance(v, dict)}
+            doc.setdefault("_id", ObjectId())
+            self.docs.append(doc)
+            doc.update(update.get("$setOnInsert", {}))
+        doc.update(update.get("$set", {}))
+        for k, v in update.get("$inc", {}).items():
+            doc[k] = doc.get(k, 0) + v
+        for k in update.get("$unset", {}):
+            doc.pop(k, None)
+        for k, v in update.get("$push", {}).items():
+            doc.setdefault(k, []).extend(v["$each"])
+
+    async def bulk_write(self, ops, ordered=False):
+        for op in ops:
+            await self.update_one(op._filter, op._doc, op._upsert)
+
+    async def create_index(self, *args, **kwargs):
+        pass
+
+
+def make_db(history_len=3):
+    # Legacy documents only have the array; the migration adds interaction_count
+    logs = FakeCollection([{"_id": ObjectId(), "phone_number": "+91",
+                            "history": [{"q": i, "timestamp": T} for i in range(history_len)]}])
+    return {"healthlogs": logs, hb.BUCKET_COLLECTION: FakeCollection()}
+
+
+async def live_write(db, q):
+    bucket_ops, parent_ops = hb.bucket_write_ops({"phone_number": "+91"}, [{"q": q, "timestamp": T}], {}, T)
+    await db[hb.BUCKET_COLLECTION].bulk_write(bucket_ops)
+    await db["healthlogs"].bulk_write(parent_ops)
+
+
+def stored(db):
+    return sorted(str(i["q"]) for b in db[hb.BUCKET_COLLECTION].docs for i in b["interactions"])
+
+
+def test_rerunning_the_migration_does_not_duplicate_interactions():
+    async def scenario():
+        db = make_db()
+        await hb.migrate_legacy(db)
+        first = stored(db)
+        await hb.migrate_legacy(db)
+        return first, stored(db), db
+
+    first, second, db = asyncio.run(scenario())
+    assert first == second == ["0", "1", "2"]
+    assert db["healthlogs"].docs[0]["interaction_count"] == 3
+
+
+def test_live_writes_stay_out_of_migrated_buckets():
+    async def scenario():
+        db = make_db()
+        await hb.migrate_legacy(db)
+        await live_write(db, "live1")
+        await hb.migrate_legacy(db, drop_legacy=True)
+        await live_write(db, "live2")
+        return db
+
+    db = asyncio.run(scenario())
+    buckets = db[hb.BUCKET_COLLECTION].docs
+    migrated = [b for b in buckets if b.get("migrated")]
+    live = [b for b in buckets if not b.get("migrated")]
+    assert [i["q"] for b in migrated for i in b["interactions"]] == [0, 1, 2]
+    assert [i["q"] for b in live for i in b["interactions"]] == ["live1", "live2"]
+    parent = db["healthlogs"].docs[0]
+    assert "history" not in parent
+    assert parent["interaction_count"] == 5
+
+
+def test_bucket_from_an_earlier_run_is_only_marked():
+    async def scenario():
+        db = make_db()
+        # Written by a run before buckets were marked, with a live append after it;
+        # that run set interaction_count to 3 and the append raised it
+        db["healthlogs"].docs[0]["interaction_count"] = 4
+        db[hb.BUCKET_COLLECTION].docs.append({
+            "_id": "phone:+91|2026-10-01|m0", "user_key": "phone:+91", "day": "2026-10-01", "count": 4,
+            "interactions": [{"q": 0}, {"q": 1}, {"q": 2}, {"q": "live"}]})
+        await hb.migrate_legacy(db)
+        return db
+
+    db = asyncio.run(scenario())
+    (bucket,) = db[hb.BUCKET_COLLECTION].docs
+    assert bucket["migrated"] is True
+    assert [i["q"] for i in bucket["interactions"]] == [0, 1, 2, "live"]
+    assert db["healthlogs"].docs[0]["interaction_count"] == 4
+    assert db["healthlogs"].docs[0]["migrated_interactions"] == 3
@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from llm_scheduler import LLMScheduler
+
+
+@pytest.mark.parametrize("workers", [1, 3, 4, 32, 64])
+def test_worker_shares_never_exceed_the_key_limits(workers):
+    limits = {"m": (30, 6000)}
+    schedulers = [LLMScheduler(limits, share=1.0 / workers) for _ in range(workers)]
+    states = [s._state("m") for s in schedulers]
+    # Refill per minute and the budget available at start, summed over workers
+    assert sum(st.requests.rate * 60 for st in states) <= 30 + 1e-9
+    assert sum(st.tokens.rate * 60 for st in states) <= 6000 + 1e-9
+    assert sum(st.requests.level for st in states) <= 30 + 1e-9
+    assert sum(st.tokens.level for st in states) <= 6000 + 1e-9
+
+
+def test_a_share_below_one_request_still_fits_a_request():
+    state = LLMScheduler({"m": (30, 6000)}, share=1.0 / 64)._state("m")
+    assert state.requests.capacity >= 1
+    # It waits for its share to refill instead of being rounded up to one a minute
+    state.requests.level = 0
+    assert state.requests.wait(1, 0.0) > 60
+
+
+def test_stream_closed_early_refunds_its_charge():
+    async def scenario():
+        scheduler = LLMScheduler({"m": (30, 6000)})
+        tokens = scheduler._state("m").tokens
+
+        async def answer():
+            for word in ["one ", "two ", "three "]:
+                yield word
+
+        stream = scheduler.stream("m", "voice", 100, answer)
+        assert await stream.__anext__() == "one "
+        charged_level = tokens.level
+        await stream.aclose()              # the consumer hangs up
+        return charged_level, tokens.level
+
+    charged_level, settled_level = asyncio.run(scenario())
+    assert settled_level > charged_level + 300    # the unused output estimate came back
@@ -0,0 +1,94 @@
+import asyncio
+
+import pytest
+from pymongo.errors import BulkWriteError
+
+import mongo_batcher as mb
+
+
+class FakeCollection:
+    """Records bulk_write ops; fails the next `fails` calls with `error`."""
+
+    def __init__(self, fails: int = 0, error: Exception = None):
+        self.fails = fails
+        self.error = error or ConnectionError("down")
+        self.ops = []
+
+    async def bulk_write(self, ops, ordered):
+        if self.fails:
+            self.fails -= 1
+            raise self.error
+        self.ops += ops
+
+
+def make_db(buckets=None, healthlogs=None):
+    return {mb.BUCKET_COLLECTION: buckets or FakeCollection(), "healthlogs": healthlogs or FakeCollection()}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_interactions_in_one_window_share_a_batch():
+    async def scenario():
+        db = make_db()
+        batcher = mb.HealthLogBatcher(db, window_ms=10, storage="buckets")
+        await asyncio.gather(*(batcher.add({"phone_number": str(n % 2)}, {"q": n}, {}) for n in range(4)))
+        return db, batcher.snapshot()
+
+    db, stats = run(scenario())
+    assert stats["batches"] == 1 and stats["interactions"] == 4
+    assert len(db[mb.BUCKET_COLLECTION].ops) == 2        # one push per user
+
+
+def test_failed_parent_update_is_retried_without_failing_the_caller():
+    async def scenario():
+        db = make_db(healthlogs=FakeCollection(fails=2))
+        batcher = mb.HealthLogBatcher(db, window_ms=10, storage="buckets")
+        await batcher.add({"phone_number": "1"}, {"q": 1}, {})   # resolves: the interaction is stored
+        await batcher.close()
+        return db, batcher.snapshot()
+
+    db, stats = run(scenario())
+    assert len(db[mb.BUCKET_COLLECTION].ops) == 1          # pushed once, never again on retry
+    assert len(db["healthlogs"].ops) == 1
+    assert stats["parent_retries"] == 2 and stats["parent_dropped"] == 0
+
+
+def test_parent_update_is_dropped_after_its_retries():
+    async def scenario():
+        db = make_db(healthlogs=FakeCollection(fails=100))
+        batcher = mb.HealthLogBatcher(db, window_ms=10, storage="buckets")
+        await batcher.add({"phone_number": "1"}, {"q": 1}, {})
+        await batcher.close()
+        return batcher.snapshot()
+
+    stats = run(scenario())
+    assert stats["parent_retries"] == mb.MONGO_PARENT_RETRIES
+    assert stats["parent_dropped"] == 1 and stats["parent_retry_pending"] == 0
+
+
+def test_failed_bucket_write_fails_the_caller():
+    async def scenario():
+        db = make_db(buckets=FakeCollection(fails=1))
+        batcher = mb.HealthLogBatcher(db, window_ms=10, storage="buckets")
+        with pytest.raises(ConnectionError):
+            await batcher.add({"phone_number": "1"}, {"q": 1}, {})
+        return batcher.snapshot()
+
+    assert run(scenario())["errors"] == 1
+
+
+def test_partial_bulk_write_error_fails_only_the_affected_user():
+    error = BulkWriteError({"writeErrors": [{"index": 0, "code": 11000, "errmsg": "duplicate"}]})
+
+    async def scenario():
+        db = make_db(buckets=FakeCollection(fails=1, error=error))
+        batcher = mb.HealthLogBatcher(db, window_ms=10, storage="buckets")
+        return await asyncio.gather(batcher.add({"phone_number": "1"}, {"q": 1}, {}),
+                                    batcher.add({"phone_number": "2"}, {"q": 2}, {}),
+                                    return_exceptions=True)
+
+    first, second = run(scenario())
+    assert isinstance(first, BulkWriteError)
+    assert second is None
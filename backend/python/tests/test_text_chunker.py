@@ -0,0 +1,57 @@
+import pytest
+
+from text_chunker import _repair_lines, iter_chunks
+
+
+def repair(*lines):
+    return list(_repair_lines(line + "\n" for line in lines))
+
+
+@pytest.mark.parametrize("line", [
+    "18 to 21 weeks",
+    "If BP is 140 or so",
+    "• bleeding- 2 to 4 % in patients on anticoagulants",
+    "vitamins A, B and C",
+])
+def test_short_words_keep_their_spaces(line):
+    assert repair(line) == [line]
+
+
+@pytest.mark.parametrize("line, repaired", [
+    ("YO U R G U I D E T O", "YOURGUIDETO"),
+    ("1 2 t h e d i t i o n", "1 2 thedition"),
+])
+def test_letter_spaced_words_are_joined(line, repaired):
+    assert repair(line) == [repaired]
+
+
+def test_one_letter_lines_are_joined():
+    assert repair("P", "R", "E", "G", "N", "A", "N", "C", "Y", "Next line") == ["PREGNANCY", "Next line"]
+
+
+def test_chunks_carry_the_section_and_no_chapter(tmp_path):
+    book = tmp_path / "book.txt"
+    book.write_text("\n".join([
+        "CONTENTS",
+        "1.",
+        "ANAEMIA IN PREGNANCY",
+        "",
+        ("This guide was written for expecting mothers and for the people who look after them "
+         "during pregnancy and after birth."),
+        "",
+        "ANAEMIA IN PREGNANCY",
+        "",
+        "Anaemia is common in pregnancy. Iron tablets help most women.",
+        "",
+        "Starting your antenatal care",
+        "",
+        "You can refer yourself to a midwife as soon as you know you are pregnant.",
+        "",
+    ]), encoding="utf-8")
+    chunks = list(iter_chunks(str(book)))
+    assert "chapter" not in chunks[0]._fields
+    by_text = {c.text.split()[0]: c.section for c in chunks}
+    assert by_text["1."] == "Table of Contents"
+    assert by_text["This"] == ""
+    assert by_text["Anaemia"] == "Anaemia In Pregnancy"
+    assert by_text["You"] == "Starting your antenatal care"
@@ -0,0 +1,332 @@
+"""Structure-aware normalization and chunking for the health book corpus.
+
+`health_book.txt` is a PDF dump: headings are sometimes split one letter per
+line ("C\\nO\\nN\\nT..."), paragraphs are hard-wrapped, words are hyphenated
+across lines and page numbers / running headers are mixed into the text.
+This module repairs that line stream, tracks section headings and packs
+whole sentences into chunks of at most CHUNK_TOKEN_BUDGET tokens, each
+carrying its section as metadata.
+
+The dump is several documents back to back, so a section also ends where
+its document does: when the running header/footer seen in it stops
+recurring for DOCUMENT_FOOTER_GAP tokens, or another document's running
+line recurs in its place. Text outside a known section gets an empty one
+rather than the last one seen. Chapters are not labelled: which heading
+opens a chapter cannot be told reliably across the documents, and a wrong
+label ends up in the prompt. The file is streamed twice (once to find
+running headers); only the current section is held.
+"""
+import os
+import re
+from collections import Counter
+from typing import Iterator, List, NamedTuple
+
+from llm_scheduler import estimate_tokens
+
+# Bumped when the heading/metadata heuristics change, so ingest re-labels chunks
+CHUNKER_VERSION = 4
+CHUNK_TOKEN_BUDGET = int(os.getenv("CHUNK_TOKEN_BUDGET", "300"))
+CHUNK_OVERLAP_SENTENCES = int(os.getenv("CHUNK_OVERLAP_SENTENCES", "0"))
+# Tokens of text without the section's running header/footer after which
+# its document is taken to have ended (~4 pages of the health book)
+DOCUMENT_FOOTER_GAP = int(os.getenv("DOCUMENT_FOOTER_GAP", "4000"))
+# A short line repeated this often is a running header/footer, not content
+_NOISE_REPEATS = 5
+
+_PAGE_NUMBER = re.compile(r"^\d{1,3}$")
+_PUNCT_ONLY = re.compile(r"^[\W_]+$")
+# Dates and volume numbers used as running footers ("2009-10"); bare page
+# numbers are _PAGE_NUMBER
+_NUMERIC_FOOTER = re.compile(r"^\d+[-/.]\d+$")
+_NUMBERED = re.compile(r"^(\d{1,2})\.\s*(.*)$")
+_LIST_ITEM = re.compile(r"^(\s{2,}|[•●▪◦*-]\s+|\(?[a-z0-9]\)\s+)")
+_TERMINAL = (".", "?", "!", ":", ";", ",")
+_CLOSING_QUOTES = "\"'”’»)"
+# Footnote marks after a heading-like line ("Quitting smoking:5")
+_FOOTNOTED = re.compile(r"[:;,.]\s*\d+$")
+# Three or more one-letter words in a row are a letter-spaced word ("G U I D E"),
+# with a kerned pair before them ("YO U R") taken along
+_LETTER_SPACED = re.compile(r"(?<!\S)(?:[^\W\d_]{2} )?[^\W\d_](?: [^\W\d_]){2,}(?!\S)")
+# Split after . ! ? when followed by whitespace and an uppercase letter/digit,
+# but not after common abbreviations ("Dr.", "e.g.", "B. P.").
+_SENT_SPLIT = re.compile(r"(?<!\bDr)(?<!\bMr)(?<!\bMs)(?<!\bMrs)(?<!\bvs)(?<!\be\.g)(?<!\bi\.e)(?<!\b[A-Z])"
+                         r"(?<=[.!?])\s+(?=[A-Z0-9(\"'])")
+
+
+class Chunk(NamedTuple):
+    text: str
+    section: str
+    tokens: int
+
+
+def split_sentences(paragraph: str) -> List[str]:
+    return [s.strip() for s in _SENT_SPLIT.split(paragraph) if s.strip()]
+
+
+# A title does not end on these ("Additional research has looked at")
+_DANGLING = {"in", "and", "of", "the", "during", "with", "to", "a", "at", "or", "by", "from", "on", "as", "if",
+             "an", "that"}
+
+
+def _heading_shaped(line: str) -> bool:
+    """No sentence punctuation (even inside closing quotes), footnote mark or dangling last word."""
+    bare = line.rstrip(_CLOSING_QUOTES).rstrip()
+    words = re.findall(r"[A-Za-z']+", bare)
+    return (bool(words) and not bare.endswith(_TERMINAL) and not _FOOTNOTED.search(bare)
+            and words[-1].lower() not in _DANGLING)
+
+
+def _is_upper_heading(line: str) -> bool:
+    letters = [c for c in line if c.isalpha()]
+    # Digits mark author lines and figure labels ("SECRETARY GENERAL FOGSI 2004 - 2008")
+    if (len(letters) < 6 or len(line) > 80 or "(" in line or line.count(",") > 1
+            or any(c.isdigit() for c in line) or not _heading_shaped(line)):
+        return False
+    return sum(c.isupper() for c in letters) / len(letters) >= 0.85
+
+
+def _looks_like_title(line: str, next_line: str) -> bool:
+    """Mixed-case section title: short, heading-shaped, followed by a blank line."""
+    words = line.split()
+    return (
+        2 <= len(words) <= 9 and len(line) <= 70 and line[0].isupper()
+        and _heading_shaped(line) and not next_line.strip()
+    )
+
+def _repair_lines(lines: Iterator[str]) -> Iterator[str]:
+    """Join runs of one-letter lines and de-space letter-spaced headings."""
+    run, held = [], []
+    for raw in lines:
+        line = raw.rstrip("\n")
+        s = line.strip()
+        if len(s) == 1 and s.isalpha():
+            run.append(s)
+            continue
+        # Short numeric debris ("1.") interleaved in a letter run is held back
+        if run and len(s) <= 2:
+            held.append(line)
+            continue
+        if run:
+            yield "".join(run) if len(run) >= 3 else "\n".join(run)
+            yield from held
+            run, held = [], []
+        if _LETTER_SPACED.search(s):
+            line = _LETTER_SPACED.sub(lambda m: m.group(0).replace(" ", ""), s)
+        yield line
+    if run:
+        yield "".join(run) if len(run) >= 3 else "\n".join(run)
+    yield from held
+
+
+def _noise_key(line: str) -> str:
+    # Running headers differ only in their page number ("... PREGNANCY |4")
+    return re.sub(r"\d+", "#", line)[:30]
+
+
+def _count_noise(path: str) -> set:
+    """Keys of running headers/footers. Repeated short headings ("Overview")
+    and the tails of wrapped sentences ("during pregnancy.") are content."""
+    counts = Counter()
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            s = line.strip()
+            if _NUMERIC_FOOTER.match(s) or (
+                    len(s) <= 80 and sum(c.isalpha() for c in s) >= 6 and not s.endswith(_TERMINAL)
+                    and (len(s) >= 20 or any(c.isdigit() for c in s))):
+                counts[_noise_key(s)] += 1
+    return {k for k, n in counts.items() if n >= _NOISE_REPEATS}
+
+
+def _with_next(lines: Iterator[str]) -> Iterator[tuple]:
+    """(line, next_line) pairs; next_line is "" after the last line."""
+    line = next(lines, None)
+    while line is not None:
+        nxt = next(lines, None)
+        yield line, "" if nxt is None else nxt
+        line = nxt
+
+
+def iter_blocks(path: str) -> Iterator[tuple]:
+    """Yield ("toc", text), ("heading", title), ("para", text) and ("page", key)
+    blocks; "page" marks a dropped running header/footer."""
+    noise = _count_noise(path)
+    with open(path, "r", encoding="utf-8") as f:
+        yield from _blocks(_with_next(l for chunk in _repair_lines(f) for l in chunk.split("\n")), noise)
+
+
+def _blocks(lines: Iterator[tuple], noise: set) -> Iterator[tuple]:
+    para: List[str] = []
+    in_toc, toc_prev = False, ""
+    last_was_heading = False
+
+    def flush():
+        nonlocal para
+        if para:
+            text = " ".join(para)
+            para = []
+            return text
+        return None
+
+    for line, nxt in lines:
+        s = line.strip()
+
+        if not s:
+            text = flush()
+            if text:
+                yield ("para", text)
+            continue
+        if _PAGE_NUMBER.match(s) and not in_toc:
+            continue
+        if _PUNCT_ONLY.match(s):
+            continue
+        if len(s) <= 80 and _noise_key(s) in noise:
+            yield ("page", _noise_key(s))
+            continue
+
+        if s.upper().startswith("CONTENT") and len(s) <= 10:
+            in_toc, toc_prev = True, "1."
+            last_was_heading = False
+            yield ("heading", "Table of Contents")
+            continue
+        if in_toc:
+            # TOC entries are "N." / page-number lines and UPPERCASE titles that
+            # follow them. Prose, or a heading after a plain entry, ends the TOC.
+            ends_toc = len(s) > 100 or s.lower().startswith("disclaimer") or (
+                _is_upper_heading(s) and not (toc_prev and (_NUMBERED.match(toc_prev) or
+                                                             toc_prev.rstrip(".").isdigit() or
+                                                             _is_upper_heading(toc_prev))))
+            if ends_toc:
+                in_toc = False
+            else:
+                toc_prev = s
+                yield ("toc", s)
+                continue
+
+        numbered = _NUMBERED.match(s)
+        candidate = numbered.group(2) if numbered and numbered.group(2) else s
+        upper = _is_upper_heading(candidate)
+        if upper or (not para and _looks_like_title(s, nxt)):
+            text = flush()
+            if text:
+                yield ("para", text)
+            # Consecutive UPPERCASE heading lines are one wrapped heading
+            yield ("heading+" if last_was_heading and upper else "heading", candidate.strip())
+            last_was_heading = upper
+            continue
+        last_was_heading = False
+
+        if _LIST_ITEM.match(line):
+            text = flush()
+            if text:
+                yield ("para", text)
+            item = _LIST_ITEM.sub("", line).strip()
+            yield ("para", item if item.endswith(_TERMINAL) else item + ".")
+            continue
+
+        if para and para[-1].endswith("-") and s[:1].islower():
+            para[-1] = para[-1][:-1] + s      # de-hyphenate "pregnan-\ncy"
+        else:
+            para.append(s)
+        if s.endswith((".", "?", "!")) and len(s) < 60:
+            # A short line that ends a sentence usually ends a paragraph too
+            text = flush()
+            if text:
+                yield ("para", text)
+    text = flush()
+    if text:
+        yield ("para", text)
+
+
+def iter_chunks(path: str, token_budget: int = CHUNK_TOKEN_BUDGET,
+                overlap_sentences: int = CHUNK_OVERLAP_SENTENCES) -> Iterator[Chunk]:
+    """Sentence-aligned chunks of at most `token_budget` tokens.
+
+    A chunk never crosses a section boundary. Sentences longer than the
+    budget are split on word boundaries.
+    """
+    # The running header/footer key of the section's document, the tokens
+    # read since it last appeared and other running lines seen since then
+    footer, since_footer, others = None, 0, Counter()
+
+    section = ""
+    sentences: List[str] = []
+    used = 0
+
+    def emit():
+        nonlocal sentences, used
+        if not sentences:
+            return None
+        text = " ".join(sentences)
+        chunk = Chunk(text, section, estimate_tokens(text))
+        sentences = sentences[-overlap_sentences:] if overlap_sentences else []
+        used = sum(estimate_tokens(x) for x in sentences)
+        return chunk
+
+    def add(sentence: str):
+        nonlocal used
+        cost = estimate_tokens(sentence)
+        out = []
+        if used + cost > token_budget and sentences:
+            out.append(emit())
+        if cost > token_budget:
+            words, piece = sentence.split(), []
+            for w in words:
+                piece.append(w)
+                if estimate_tokens(" ".join(piece)) >= token_budget:
+                    sentences.append(" ".join(piece))
+                    out.append(emit())
+                    piece = []
+            sentence = " ".join(piece)
+            cost = estimate_tokens(sentence) if sentence else 0
+            if not sentence:
+                return out
+        sentences.append(sentence)
+        used += cost
+        return out
+
+    def display(title: str) -> str:
+        return title.title() if title.isupper() else title
+
+    pending_heading = None
+    for kind, text in iter_blocks(path):
+        if kind == "page":
+            if section and footer is None:
+                footer = text
+            if text == footer:
+                since_footer, others = 0, Counter()
+            else:
+                others[text] += 1
+            continue
+        if kind in ("heading", "heading+"):
+            if kind == "heading+" and pending_heading is not None:
+                pending_heading = f"{pending_heading} {text}"
+            else:
+                pending_heading = text
+            continue
+
+        new_section = None
+        if pending_heading is not None:
+            new_section, pending_heading = display(pending_heading), None
+        elif kind != "toc" and section == "Table of Contents":
+            new_section = ""                       # first prose after the TOC
+        elif section and (since_footer > DOCUMENT_FOOTER_GAP or any(n >= 2 for n in others.values())):
+            new_section = ""                       # the section's document has ended
+        if new_section is not None:
+            footer, since_footer, others = None, 0, Counter()
+        since_footer += estimate_tokens(text)
+
+        if new_section is not None:
+            chunk = emit()
+            if chunk:
+                yield chunk
+            sentences, used = [], 0           # overlap never crosses a section
+            section = new_section
+
+        units = [text] if kind == "toc" else split_sentences(text)
+        for unit in units:
+            for chunk in add(unit):
+                if chunk:
+                    yield chunk
+    chunk = emit()
+    if chunk:
+        yield chunk
@@ -0,0 +1,157 @@
+import os
+import re
+import time
+import sqlite3
+import hashlib
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from observability import get_logger
+
+log = get_logger("translation_cache")
+
+# ─── Configuration ───────────────────────────────────────────────────────────
+TRANSLATION_CACHE_SIZE = int(os.getenv("TRANSLATION_CACHE_SIZE", "5000"))
+TRANSLATION_CACHE_TTL = float(os.getenv("TRANSLATION_CACHE_TTL", str(7 * 24 * 3600)))
+# Empty string disables the on-disk tier.
+TRANSLATION_CACHE_DB = os.getenv("TRANSLATION_CACHE_DB", "translation_cache.sqlite3")
+TRANSLATION_CACHE_DB_MAX_ROWS = int(os.getenv("TRANSLATION_CACHE_DB_MAX_ROWS", "200000"))
+
+_WS = re.compile(r"\s+")
+
+
+def normalize_text(text: str) -> str:
+    """Cache-key normalization: collapse whitespace and casefold."""
+    return _WS.sub(" ", text).strip().casefold()
+
+
+def cache_key(text: str, src_code: str, tgt_code: str) -> str:
+    raw = f"{src_code.lower()}|{tgt_code.lower()}|{normalize_text(text)}"
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+class _SQLiteTier:
+    """Persistent key → translation store that survives restarts."""
+
+    def __init__(self, path: str, ttl: float, max_rows: int):
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_created ON translations(created_at)")
+        self._conn.commit()
+        self._writes = 0
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value, created_at FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return row[0]
+
+    def set(self, key: str, value: str):
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, value, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            self._writes += 1
+            # Evict expired + oldest rows every so often rather than on every write
+            if self._writes % 500 == 0:
+                self._evict_locked()
+            self._conn.commit()
+
+    def _evict_locked(self):
+        self._conn.execute("DELETE FROM translations WHERE created_at < ?", (time.time() - self.ttl,))
+        self._conn.execute(
+            "DELETE FROM translations WHERE key IN ("
+            " SELECT key FROM translations ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,),
+        )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class TranslationCache:
+    """Two-tier cache: bounded in-process LRU in front of an optional SQLite store."""
+
+    def __init__(self, max_size: int = TRANSLATION_CACHE_SIZE, ttl: float = TRANSLATION_CACHE_TTL,
+                 db_path: Optional[str] = TRANSLATION_CACHE_DB):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._lru: "OrderedDict[str, tuple]" = OrderedDict()
+        self.disk = None
+        if db_path:
+            try:
+                self.disk = _SQLiteTier(db_path, ttl, TRANSLATION_CACHE_DB_MAX_ROWS)
+            except Exception as e:
+                log.warning("translation_cache.disk_disabled", error=repr(e))
+        self.stats = {"memory_hits": 0, "disk_hits": 0, "misses": 0, "evictions": 0}
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        entry = self._lru.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if time.monotonic() > expires_at:
+            del self._lru[key]
+            return None
+        self._lru.move_to_end(key)
+        return value
+
+    def _set_memory(self, key: str, value: str):
+        self._lru[key] = (value, time.monotonic() + self.ttl)
+        self._lru.move_to_end(key)
+        while len(self._lru) > self.max_size:
+            self._lru.popitem(last=False)
+            self.stats["evictions"] += 1
+
+    async def get(self, text: str, src_code: str, tgt_code: str) -> Optional[str]:
+        key = cache_key(text, src_code, tgt_code)
+        value = self._get_memory(key)
+        if value is not None:
+            self.stats["memory_hits"] += 1
+            return value
+        if self.disk is not None:
+            value = await asyncio.to_thread(self.disk.get, key)
+            if value is not None:
+                self.stats["disk_hits"] += 1
+                self._set_memory(key, value)
+                return value
+        self.stats["misses"] += 1
+        return None
+
+    async def set(self, text: str, src_code: str, tgt_code: str, translated: str):
+        key = cache_key(text, src_code, tgt_code)
+        self._set_memory(key, translated)
+        if self.disk is not None:
+            try:
+                await asyncio.to_thread(self.disk.set, key, translated)
+            except Exception as e:
+                log.warning("translation_cache.disk_write_failed", error=repr(e))
+
+    def snapshot(self) -> dict:
+        lookups = self.stats["memory_hits"] + self.stats["disk_hits"] + self.stats["misses"]
+        hits = lookups - self.stats["misses"]
+        return {
+            **self.stats,
+            "size": len(self._lru),
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+            "disk_enabled": self.disk is not None,
+        }
+
+    def close(self):
+        if self.disk is not None:
+            self.disk.close()
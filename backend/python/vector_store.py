@@ -0,0 +1,227 @@
+"""In-process flat vector index: an alternative dense backend to Chroma.
+
+The corpus is a few thousand chunks, so exact search over a contiguous matrix
+beats Chroma's HNSW + SQLite + LangChain layers on both latency and memory.
+The index lives in a directory next to the Chroma collection (or inside an
+index bundle):
+
+    flat/
+        flat.json      # dtype, dim, count
+        vectors.npy    # [count, dim] float32 / float16 / int8, memory-mapped
+        scales.npy     # int8 only: per-row dequantization scale (float32)
+        chunks.jsonl   # {"id", "text", "metadata"} per line, row-aligned
+
+int8 (the default) stores each row as round(v / scale) with scale =
+max|v| / 127; a query is scored block by block (FLAT_BLOCK_ROWS rows are
+widened to float32 and multiplied by the query), then multiplied by the row
+scales. numpy's float16 -> float32 conversion is slow, so float16 halves the
+file but is several times slower per query than int8.
+
+Select it with VECTOR_BACKEND=flat (see rag_service.py / ingest.py);
+`python vector_store.py bench` compares it against Chroma.
+"""
+import os
+import json
+from typing import List, Tuple
+
+import numpy as np
+from langchain_core.documents import Document
+
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "chroma")   # "chroma" or "flat"
+FLAT_INDEX_DTYPE = os.getenv("FLAT_INDEX_DTYPE", "int8")  # "int8", "float16" or "float32"
+FLAT_DIR = "flat"
+FLAT_BLOCK_ROWS = 512
+_DTYPES = ("int8", "float16", "float32")
+
+
+class FlatVectorStore:
+    """Exact top-k cosine search over a memory-mapped embedding matrix.
+
+    Embeddings are L2-normalized at build time, so the dot product is the
+    cosine similarity. Exposes `similarity_search_by_vector` so it can stand
+    in for the Chroma store in the RAG service.
+    """
+
+    def __init__(self, directory: str, vectors, scales, ids: List[str], texts: List[str], metadatas: List[dict]):
+        self.directory = directory
+        self.vectors = vectors
+        self.scales = scales
+        self.ids = ids
+        self.texts = texts
+        self.metadatas = metadatas
+        self.dim = vectors.shape[1] if len(vectors) else 0
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ─── Build / load ────────────────────────────────────────────────────────
+    @classmethod
+    def build(cls, directory: str, ids: List[str], texts: List[str], metadatas: List[dict],
+              embeddings, dtype: str = FLAT_INDEX_DTYPE) -> "FlatVectorStore":
+        if dtype not in _DTYPES:
+            raise ValueError(f"FLAT_INDEX_DTYPE must be one of {_DTYPES}, got {dtype!r}")
+        os.makedirs(directory, exist_ok=True)
+        v = np.asarray(embeddings, dtype=np.float32).reshape(len(ids), -1)
+        norms = np.linalg.norm(v, axis=1, keepdims=True)
+        v = v / np.maximum(norms, 1e-12)
+
+        if dtype == "int8":
+            scales = (np.abs(v).max(axis=1) / 127).astype(np.float32)
+            stored = np.round(v / np.maximum(scales, 1e-12)[:, None]).astype(np.int8)
+            np.save(os.path.join(directory, "scales.npy"), scales)
+        else:
+            stored = v.astype(dtype)
+        np.save(os.path.join(directory, "vectors.npy"), stored)
+        with open(os.path.join(directory, "chunks.jsonl"), "w", encoding="utf-8") as f:
+            for cid, text, meta in zip(ids, texts, metadatas):
+                f.write(json.dumps({"id": cid, "text": text, "metadata": meta or {}}, ensure_ascii=False) + "\n")
+        # Written last: a directory without flat.json is an incomplete build
+        with open(os.path.join(directory, "flat.json"), "w", encoding="utf-8") as f:
+            json.dump({"dtype": dtype, "dim": int(v.shape[1]) if len(v) else 0, "count": len(ids)}, f)
+        return cls.load(directory)
+
+    @classmethod
+    def from_collection(cls, collection, directory: str, dtype: str = FLAT_INDEX_DTYPE) -> "FlatVectorStore":
+        data = collection.get(include=["documents", "metadatas", "embeddings"])
+        return cls.build(directory, data["ids"], data["documents"], data["metadatas"], data["embeddings"], dtype)
+
+    @classmethod
+    def load(cls, directory: str) -> "FlatVectorStore":
+        with open(os.path.join(directory, "flat.json"), "r", encoding="utf-8") as f:
+            info = json.load(f)
+        vectors = np.load(os.path.join(directory, "vectors.npy"), mmap_mode="r")
+        scales = None
+        if info["dtype"] == "int8":
+            scales = np.load(os.path.join(directory, "scales.npy"))
+        ids, texts, metadatas = [], [], []
+        with open(os.path.join(directory, "chunks.jsonl"), "r", encoding="utf-8") as f:
+            for line in f:
+                row = json.loads(line)
+                ids.append(row["id"])
+                texts.append(row["text"])
+                metadatas.append(row["metadata"])
+        return cls(directory, vectors, scales, ids, texts, metadatas)
+
+    @staticmethod
+    def exists(directory: str) -> bool:
+        return os.path.exists(os.path.join(directory, "flat.json"))
+
+    # ─── Search ──────────────────────────────────────────────────────────────
+    def scores(self, query_embedding) -> np.ndarray:
+        return self.scores_many(query_embedding)[0]
+
+    def scores_many(self, query_embeddings) -> np.ndarray:
+        """[n_queries, count] cosine scores from a single pass over the matrix."""
+        q = np.asarray(query_embeddings, dtype=np.float32).reshape(-1, self.dim)
+        q = q / np.maximum(np.linalg.norm(q, axis=1, keepdims=True), 1e-12)
+        out = np.empty((len(self.ids), len(q)), dtype=np.float32)
+        if self.vectors.dtype == np.float32:
+            np.matmul(self.vectors, q.T, out=out)
+        else:
+            # Widen one cache-sized block at a time instead of the whole matrix.
+            # The buffer is per call so concurrent searches don't share it.
+            buf = np.empty((FLAT_BLOCK_ROWS, self.dim), dtype=np.float32)
+            for start in range(0, len(self.ids), FLAT_BLOCK_ROWS):
+                block = self.vectors[start:start + FLAT_BLOCK_ROWS]
+                b = buf[:len(block)]
+                b[...] = block
+                np.matmul(b, q.T, out=out[start:start + len(block)])
+        if self.scales is not None:
+            out *= self.scales[:, None]
+        return out.T
+
+    def search(self, query_embedding, k: int = 5) -> List[Tuple[int, float]]:
+        """Top-k (row, cosine) pairs, best first."""
+        return self.search_many([query_embedding], k)[0]
+
+    def search_many(self, query_embeddings, k: int = 5) -> List[List[Tuple[int, float]]]:
+        """`search` for several queries at once (one matrix pass, see scores_many)."""
+        if not self.ids or not len(query_embeddings):
+            return [[] for _ in query_embeddings]
+        s = self.scores_many(query_embeddings)
+        k = min(k, s.shape[1])
+        top = np.argpartition(-s, k - 1, axis=1)[:, :k]
+        order = np.argsort(-np.take_along_axis(s, top, axis=1), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        return [[(int(i), float(row[i])) for i in ids] for row, ids in zip(s, top)]
+
+    def similarity_search_by_vector(self, embedding, k: int = 4) -> List[Document]:
+        return self.similarity_search_by_vectors([embedding], k)[0]
+
+    def similarity_search_by_vectors(self, embeddings, k: int = 4) -> List[List[Document]]:
+        return [[Document(page_content=self.texts[i], metadata=self.metadatas[i]) for i, _ in hits]
+                for hits in self.search_many(embeddings, k)]
+
+
+def bench(persist_directory: str = "vectordb", queries: int = 200, k: int = 10):
+    """Latency (p50/p99), recall@k vs. exact float32 and RSS growth for Chroma
+    and each flat dtype, using stored chunk embeddings as queries."""
+    import time
+    import resource
+    import tempfile
+    from langchain_chroma import Chroma
+    from ingest import COLLECTION_NAME
+
+    def rss_mb():
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+    def timed(fn, qs):
+        lat = []
+        for q in qs:
+            t0 = time.perf_counter()
+            fn(q)
+            lat.append((time.perf_counter() - t0) * 1000)
+        return np.percentile(lat, 50), np.percentile(lat, 99)
+
+    rss0 = rss_mb()
+    chroma = Chroma(persist_directory=persist_directory, collection_name=COLLECTION_NAME)
+    data = chroma._collection.get(include=["documents", "metadatas", "embeddings"])
+    rng = np.random.default_rng(0)
+    emb = np.asarray(data["embeddings"], dtype=np.float32)
+    qs = emb[rng.choice(len(emb), size=min(queries, len(emb)), replace=False)]
+    qs = qs + rng.normal(0, 0.02, qs.shape).astype(np.float32)   # near, not identical, to stored rows
+
+    exact = emb / np.linalg.norm(emb, axis=1, keepdims=True)
+    truth = [set(np.argsort(-(exact @ q))[:k]) for q in qs]
+    id_row = {cid: i for i, cid in enumerate(data["ids"])}
+
+    chroma_hits = []
+    p50, p99 = timed(lambda q: chroma_hits.append(
+        chroma._collection.query(query_embeddings=[q.tolist()], n_results=k, include=[])["ids"][0]), qs)
+    recall = np.mean([len(truth[i] & {id_row[c] for c in hits}) / k for i, hits in enumerate(chroma_hits)])
+    print(f"{'chroma':>8}: p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  recall@{k} {recall:.3f}  "
+          f"RSS +{rss_mb() - rss0:.0f} MB (collection load incl.)")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for dtype in _DTYPES:
+            d = os.path.join(tmp, dtype)
+            FlatVectorStore.build(d, data["ids"], data["documents"], data["metadatas"], emb, dtype)
+            store = FlatVectorStore.load(d)
+            p50, p99 = timed(lambda q: store.search(q, k), qs)
+            recall = np.mean([len(truth[i] & {r for r, _ in store.search(q, k)}) / k for i, q in enumerate(qs)])
+            size = os.path.getsize(os.path.join(d, "vectors.npy")) / 1024
+            print(f"{dtype:>8}: p50 {p50:7.3f} ms  p99 {p99:7.3f} ms  recall@{k} {recall:.3f}  "
+                  f"vectors.npy {size:.0f} KiB")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Build or benchmark the flat vector index.")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    b = sub.add_parser("build", help="export a Chroma collection to <persist-directory>/flat")
+    b.add_argument("--persist-directory", default="vectordb")
+    b.add_argument("--dtype", choices=_DTYPES, default=FLAT_INDEX_DTYPE)
+    r = sub.add_parser("bench", help="compare Chroma and the flat index")
+    r.add_argument("--persist-directory", default="vectordb")
+    r.add_argument("--queries", type=int, default=200)
+    r.add_argument("-k", type=int, default=10)
+    args = parser.parse_args()
+
+    if args.cmd == "build":
+        from langchain_chroma import Chroma
+        from ingest import COLLECTION_NAME
+        col = Chroma(persist_directory=args.persist_directory, collection_name=COLLECTION_NAME)._collection
+        store = FlatVectorStore.from_collection(col, os.path.join(args.persist_directory, FLAT_DIR), args.dtype)
+        print(f"🧮 Flat index: {len(store)} vectors ({args.dtype}) → {store.directory}")
+    else:
+        bench(args.persist_directory, args.queries, args.k)
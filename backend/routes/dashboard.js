@@ -1,6 +1,7 @@
 const express = require('express');
 const router = express.Router();
 const HealthLog = require('../models/HealthLog');
+const { getInteractions } = require('../services/healthLogStore');
 
 // ─── Helper: find user by phone or email ────────────────────────────────────
 async function findUserLog(identifier) {
@@ -33,7 +34,7 @@ router.get('/:identifier', async (req, res) => {
             });
         }
 
-        const history = log.history || [];
+        const history = await getInteractions(log);
 
         // ─── Aggregate Symptoms Timeline ────────────────────────────────
         const symptomMap = {};
@@ -135,12 +136,11 @@ router.get('/:identifier', async (req, res) => {
 router.get('/:identifier/summary/doctor', async (req, res) => {
     try {
         const log = await findUserLog(req.params.identifier);
-        if (!log || !log.history.length) {
+        const history = log ? await getInteractions(log) : [];
+        if (!history.length) {
             return res.json({ summary: 'No patient interactions recorded yet.' });
         }
 
-        const history = log.history;
-
         // High severity events
         const highSeverity = history.filter(h => h.severity_score >= 6);
 
@@ -208,11 +208,10 @@ router.get('/:identifier/summary/doctor', async (req, res) => {
 router.get('/:identifier/summary/family', async (req, res) => {
     try {
         const log = await findUserLog(req.params.identifier);
-        if (!log || !log.history.length) {
+        const history = log ? await getInteractions(log) : [];
+        if (!history.length) {
             return res.json({ summary: 'No health records available yet. Ask her to talk to Janani!' });
         }
-
-        const history = log.history;
         const recent = history.slice(-15);
 
         // General health indicators
@@ -275,7 +274,7 @@ router.get('/:identifier/history', async (req, res) => {
         const page = parseInt(req.query.page) || 1;
         const limit = parseInt(req.query.limit) || 20;
 
-        const allHistory = (log.history || []).slice().reverse();
+        const allHistory = (await getInteractions(log)).reverse();
         const paginated = allHistory.slice((page - 1) * limit, page * limit);
 
         const history = paginated.map(h => ({
@@ -6,7 +6,7 @@ const FormData = require('form-data');
 const fs = require('fs');
 const path = require('path');
 const VoiceResponse = twilio.twiml.VoiceResponse;
-const HealthLog = require('../models/HealthLog');
+const { appendInteraction } = require('../services/healthLogStore');
 
 // ─── Configuration ────────────────────────────────────────────────────────────
 const ACCOUNT_SID = process.env.TWILIO_ACCOUNT_SID;
@@ -254,7 +254,8 @@ router.post('/process-ai', async (req, res) => {
                     query: englishText,
                     language_code: 'en-IN', // Always send in English to RAG
                     patient_data: `Mother called via Janani AI voice service. Phone: ${callerPhone}. Detected language: ${detectedLangCode}.`,
-                    history: [],
+                    // The RAG API keeps the conversation per caller, so a repeat call resumes it
+                    session_id: callerPhone !== 'unknown' ? `phone:${callerPhone}` : undefined,
                     source: 'voice_call'
                 },
                 {
@@ -384,32 +385,21 @@ router.post('/process-ai', async (req, res) => {
         // ── STEP 7: Save to MongoDB ───────────────────────────────────────
         console.log('💾 Step 7: Saving to MongoDB...');
         try {
-            await HealthLog.findOneAndUpdate(
-                { phone_number: callerPhone },
-                {
-                    $push: {
-                        history: {
-                            timestamp: new Date(),
-                            user_message_native: rawTranscription,
-                            user_message_english: englishText,
-                            rag_reply_native: nativeAdvice,
-                            rag_reply_english: englishAdvice,
-                            symptoms: [],
-                            medications: [],
-                            relief_noted: false,
-                            relief_details: '',
-                            fetal_movement_status: 'Unknown',
-                            severity_score: 5,
-                            ai_summary: englishAdvice.substring(0, 200),
-                            _source: 'voice_call',
-                            _language: detectedLangCode
-                        }
-                    },
-                    $set: { updated_at: new Date() },
-                    $setOnInsert: { created_at: new Date() }
-                },
-                { upsert: true, new: true }
-            );
+            await appendInteraction(callerPhone, {
+                user_message_native: rawTranscription,
+                user_message_english: englishText,
+                rag_reply_native: nativeAdvice,
+                rag_reply_english: englishAdvice,
+                symptoms: [],
+                medications: [],
+                relief_noted: false,
+                relief_details: '',
+                fetal_movement_status: 'Unknown',
+                severity_score: 5,
+                ai_summary: englishAdvice.substring(0, 200),
+                _source: 'voice_call',
+                _language: detectedLangCode
+            });
             console.log(`💾 Saved! User: ${callerPhone} | Language: ${detectedLangCode}`);
         } catch (dbErr) {
             console.error(`⚠️ MongoDB save failed (non-fatal): ${dbErr.message}`);
@@ -433,24 +423,13 @@ router.post('/process-ai', async (req, res) => {
 
         // Save error log to MongoDB
         try {
-            await HealthLog.findOneAndUpdate(
-                { phone_number: callerPhone },
-                {
-                    $push: {
-                        history: {
-                            timestamp: new Date(),
-                            user_message_native: rawTranscription || `Error: ${error.message}`,
-                            user_message_english: englishText || `Error: ${error.message}`,
-                            fetal_movement_status: 'Invalid',
-                            severity_score: 0,
-                            _source: 'voice_call_error'
-                        }
-                    },
-                    $set: { updated_at: new Date() },
-                    $setOnInsert: { created_at: new Date() }
-                },
-                { upsert: true }
-            );
+            await appendInteraction(callerPhone, {
+                user_message_native: rawTranscription || `Error: ${error.message}`,
+                user_message_english: englishText || `Error: ${error.message}`,
+                fetal_movement_status: 'Invalid',
+                severity_score: 0,
+                _source: 'voice_call_error'
+            });
         } catch (dbErr) {
             console.error('❌ Failed to save error log:', dbErr.message);
         }
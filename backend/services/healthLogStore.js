@@ -0,0 +1,109 @@
+const mongoose = require('mongoose');
+const HealthLog = require('../models/HealthLog');
+const HealthLogBucket = require('../models/HealthLogBucket');
+
+const BUCKET_SIZE = parseInt(process.env.HEALTHLOG_BUCKET_SIZE || '200', 10);
+
+/**
+ * Bucket key for a HealthLog document (matches python/health_buckets.py).
+ */
+function userKeyFor(log) {
+    if (log.phone_number) return `phone:${log.phone_number}`;
+    if (log.user_email) return `email:${log.user_email}`;
+    return 'phone:anonymous';
+}
+
+/**
+ * Interactions for one user in [start, end], oldest first.
+ * Only buckets overlapping the window are loaded. Interactions still in the
+ * legacy `history` array are included if they predate the first bucket, so
+ * users that have not been migrated yet (or were only partly migrated) read
+ * correctly without duplicates.
+ */
+async function getInteractions(log, { start = null, end = null } = {}) {
+    const query = { user_key: userKeyFor(log) };
+    if (end) query.first_ts = { $lte: end };
+    if (start) query.last_ts = { $gte: start };
+
+    const buckets = await HealthLogBucket.find(query, { interactions: 1, first_ts: 1 })
+        .sort({ first_ts: 1 })
+        .lean();
+
+    const inWindow = (h) => {
+        const t = new Date(h.timestamp);
+        return (!start || t >= start) && (!end || t <= end);
+    };
+
+    let interactions = [];
+    buckets.forEach(b => (b.interactions || []).forEach(h => {
+        if (inWindow(h)) interactions.push(h);
+    }));
+
+    const legacy = log.history || [];
+    if (legacy.length) {
+        const firstBucket = await HealthLogBucket.findOne({ user_key: userKeyFor(log) }, { first_ts: 1 })
+            .sort({ first_ts: 1 })
+            .lean();
+        const cutoff = firstBucket && firstBucket.first_ts ? new Date(firstBucket.first_ts) : null;
+        interactions = legacy
+            .filter(h => (!cutoff || new Date(h.timestamp) < cutoff) && inWindow(h))
+            .concat(interactions);
+    }
+
+    return interactions.sort((a, b) => new Date(a.timestamp) - new Date(b.timestamp));
+}
+
+/**
+ * Identifiers of users with at least one interaction in [start, end].
+ */
+async function findActiveUsers(start, end) {
+    const keys = await HealthLogBucket.distinct('user_key', {
+        first_ts: { $lte: end },
+        last_ts: { $gte: start }
+    });
+    const phones = keys.filter(k => k.startsWith('phone:')).map(k => k.slice(6));
+    const emails = keys.filter(k => k.startsWith('email:')).map(k => k.slice(6));
+
+    return HealthLog.find({
+        $or: [
+            { phone_number: { $in: phones } },
+            { user_email: { $in: emails } },
+            { 'history.timestamp': { $gte: start, $lte: end } }
+        ]
+    });
+}
+
+/**
+ * Append one interaction for a phone user into today's bucket.
+ */
+async function appendInteraction(phoneNumber, interaction) {
+    const now = new Date();
+    const entry = { _id: new mongoose.Types.ObjectId(), timestamp: now, ...interaction };
+    const ts = new Date(entry.timestamp);
+    const userKey = userKeyFor({ phone_number: phoneNumber });
+
+    await Promise.all([
+        HealthLogBucket.updateOne(
+            // Migrated buckets are rewritten by the migration; never append to them
+            { user_key: userKey, day: ts.toISOString().slice(0, 10), migrated: { $ne: true }, count: { $lt: BUCKET_SIZE } },
+            {
+                $push: { interactions: entry },
+                $inc: { count: 1 },
+                $min: { first_ts: ts },
+                $max: { last_ts: ts }
+            },
+            { upsert: true }
+        ),
+        HealthLog.updateOne(
+            { phone_number: phoneNumber },
+            {
+                $set: { updated_at: now },
+                $inc: { interaction_count: 1 },
+                $setOnInsert: { created_at: now }
+            },
+            { upsert: true }
+        )
+    ]);
+}
+
+module.exports = { userKeyFor, getInteractions, findActiveUsers, appendInteraction };
@@ -1,6 +1,7 @@
 const cron = require('node-cron');
 const axios = require('axios');
 const HealthLog = require('../models/HealthLog');
+const { getInteractions, findActiveUsers } = require('./healthLogStore');
 
 const GROQ_API_KEY = process.env.GROQ_API_KEY;
 
@@ -9,11 +10,8 @@ const GROQ_API_KEY = process.env.GROQ_API_KEY;
  * Uses Groq Llama 3 to analyze the symptom/medication timeline.
  */
 async function generateSummary(user, periodStart, periodEnd, summaryType) {
-    // Filter interactions within the time range
-    const interactions = user.history.filter(h => {
-        const t = new Date(h.timestamp);
-        return t >= periodStart && t <= periodEnd;
-    });
+    // Load only the buckets overlapping the time range
+    const interactions = await getInteractions(user, { start: periodStart, end: periodEnd });
 
     if (interactions.length === 0) {
         console.log(`📋 No interactions for ${user.phone_number} in ${summaryType} period. Skipping.`);
@@ -154,9 +152,7 @@ async function runSummaryJob(summaryType) {
 
     try {
         // Find all users who have interactions in this period
-        const users = await HealthLog.find({
-            'history.timestamp': { $gte: periodStart, $lte: periodEnd }
-        });
+        const users = await findActiveUsers(periodStart, periodEnd);
 
         console.log(`📋 Found ${users.length} users with interactions in this period.`);
 
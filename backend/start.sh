@@ -7,17 +7,21 @@
 echo "📦 Installing Python dependencies..."
 pip install -r requirements.txt 2>/dev/null || echo "⚠️ pip install skipped (may already be installed)"
 
-# Start Python RAG API in the background (subshell so main shell stays in /app)
-echo "🚀 Starting Python AI Service on port 8000..."
-(cd python && python3 -u api.py 2>&1) &
+# Start Python RAG API in the background (subshell so main shell stays in /app).
+# serve.py forks SERVE_WORKERS (default: one per core) uvicorn workers that share
+# the preloaded index; `kill -HUP` it for a graceful reload.
+echo "🚀 Starting Python AI Service on port 8000 (${SERVE_WORKERS:-one per core} workers)..."
+(cd python && exec python3 -u serve.py 2>&1) &
 PYTHON_PID=$!
 
-# Wait for Python to be ready with retry loop (up to 120 seconds)
+# Wait for Python to be ready with retry loop (up to 120 seconds).
+# /health/ready returns 503 until the RAG service has loaded; with a prebuilt
+# index bundle (RAG_INDEX_BUNDLE) that takes seconds, so poll every second.
 echo "⏳ Waiting for Python service to be ready..."
-MAX_RETRIES=24
+MAX_RETRIES=120
 RETRY_COUNT=0
 while [ $RETRY_COUNT -lt $MAX_RETRIES ]; do
-    sleep 5
+    sleep 1
     RETRY_COUNT=$((RETRY_COUNT + 1))
     # Check if Python process is still alive
     if ! kill -0 $PYTHON_PID 2>/dev/null; then
@@ -26,24 +30,24 @@ while [ $RETRY_COUNT -lt $MAX_RETRIES ]; do
     fi
     # Try to reach the health endpoint
     if command -v curl >/dev/null 2>&1; then
-        if curl -s http://localhost:8000/health > /dev/null 2>&1; then
-            echo "✅ Python AI Service is ready! (took ~$((RETRY_COUNT * 5))s)"
+        if curl -sf http://localhost:8000/health/ready > /dev/null 2>&1; then
+            echo "✅ Python AI Service is ready! (took ~${RETRY_COUNT}s)"
             break
         fi
     elif command -v wget >/dev/null 2>&1; then
-        if wget -q -O /dev/null http://localhost:8000/health 2>/dev/null; then
-            echo "✅ Python AI Service is ready! (took ~$((RETRY_COUNT * 5))s)"
+        if wget -q -O /dev/null http://localhost:8000/health/ready 2>/dev/null; then
+            echo "✅ Python AI Service is ready! (took ~${RETRY_COUNT}s)"
             break
         fi
     else
         # No curl/wget available, just wait
-        echo "⏳ Waiting... ($((RETRY_COUNT * 5))s elapsed, no curl/wget to check)"
-        if [ $RETRY_COUNT -ge 12 ]; then
+        echo "⏳ Waiting... (${RETRY_COUNT}s elapsed, no curl/wget to check)"
+        if [ $RETRY_COUNT -ge 60 ]; then
             echo "⚠️ Waited 60s without health check, proceeding..."
             break
         fi
     fi
-    echo "⏳ Python not ready yet... ($((RETRY_COUNT * 5))s elapsed)"
+    [ $((RETRY_COUNT % 5)) -eq 0 ] && echo "⏳ Python not ready yet... (${RETRY_COUNT}s elapsed)"
 done
 
 if [ $RETRY_COUNT -ge $MAX_RETRIES ]; then